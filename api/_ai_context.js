@@ -0,0 +1,123 @@
+import { supabase } from './_utils.js';
+
+/**
+ * Prompt context and response cache for the AI routes.
+ *
+ * Context comes from the `ai_context` cards rendered from the stored
+ * document after each refresh (api/_ai_context.py), so a chat turn reads a
+ * few hundred bytes per ticker instead of the whole stock document. Tickers
+ * without a card yet (stored before cards existed, or whose rebuild failed)
+ * fall back to a narrow overview select formatted here.
+ *
+ * Responses are cached in `ai_responses` by a hash of the route, model,
+ * tickers with their stock_data.last_updated (which every store and patch
+ * bumps) and the question, so a repeated question costs neither the
+ * documents nor a model call until one of the stocks is refreshed.
+ */
+
+const CACHE_TTL_DAYS = 7;
+
+// Overview keys the fallback reads
+const FALLBACK_KEYS = [
+    'Name', 'Sector', 'Industry', 'TrailingPE', 'PERatio', 'ForwardPE', 'PEGRatio', 'MarketCapitalization',
+    'RevenueTTM', 'EPS', 'QuarterlyEarningsGrowthYOY', 'QuarterlyRevenueGrowthYOY', 'ProfitMargin',
+    'ReturnOnEquityTTM', '52WeekHigh', '52WeekLow', 'AnalystTargetPrice'
+];
+const FALLBACK_SELECT = [
+    'ticker', 'quote:data->quote',
+    ...FALLBACK_KEYS.map(key => `ov_${key}:data->overview->>${key}`)
+].join(', ');
+
+const text = val => (val === null || val === undefined || val === '' || val === 'None' ? 'N/A' : val);
+
+function toPercent(val) {
+    const num = parseFloat(val);
+    return Number.isFinite(num) ? `${(num * 100).toFixed(1)}%` : 'N/A';
+}
+
+function fallbackCard(row) {
+    const ov = key => row[`ov_${key}`];
+    return `STOCK DATA FOR ${row.ticker}:
+- Company: ${text(ov('Name'))}
+- Sector: ${text(ov('Sector'))} | Industry: ${text(ov('Industry'))}
+- Current Price: ${text(row.quote?.['Global Quote']?.['05. price'])} | Market Cap: ${text(ov('MarketCapitalization'))}
+- Trailing PE: ${text(ov('TrailingPE') || ov('PERatio'))} | Forward PE: ${text(ov('ForwardPE'))} | PEG Ratio: ${text(ov('PEGRatio'))}
+- Revenue TTM: ${text(ov('RevenueTTM'))} | EPS: ${text(ov('EPS'))}
+- EPS Growth (YoY): ${toPercent(ov('QuarterlyEarningsGrowthYOY'))} | Revenue Growth (YoY): ${toPercent(ov('QuarterlyRevenueGrowthYOY'))}
+- Profit Margin: ${toPercent(ov('ProfitMargin'))} | ROE: ${toPercent(ov('ReturnOnEquityTTM'))}
+- 52W High: ${text(ov('52WeekHigh'))} | 52W Low: ${text(ov('52WeekLow'))}
+- Analyst Target: ${text(ov('AnalystTargetPrice'))}`;
+}
+
+// [{ ticker, version, card }] for the stored tickers, in `tickers` order.
+// `version` is the stock_data.last_updated column, not the card's own
+// version, so a card that missed a rebuild can't pin stale responses.
+export async function loadContext(tickers) {
+    const [{ data: cards, error }, { data: stored, error: storedError }] = await Promise.all([
+        supabase.from('ai_context').select('ticker, card').in('ticker', tickers),
+        supabase.from('stock_data').select('ticker, row_updated:last_updated').in('ticker', tickers)
+    ]);
+    if (error) throw error;
+    if (storedError) throw storedError;
+
+    const cardFor = new Map((cards || []).map(row => [row.ticker, row.card]));
+    const versionFor = new Map((stored || []).map(row => [row.ticker, row.row_updated || '']));
+    const byTicker = new Map();
+    for (const [ticker, version] of versionFor) {
+        if (cardFor.has(ticker)) byTicker.set(ticker, { ticker, version, card: cardFor.get(ticker) });
+    }
+
+    const missing = [...versionFor.keys()].filter(t => !byTicker.has(t));
+    if (missing.length) {
+        const { data: rows, error: fallbackError } = await supabase
+            .from('stock_data')
+            .select(FALLBACK_SELECT)
+            .in('ticker', missing);
+        if (fallbackError) throw fallbackError;
+        for (const row of rows || []) {
+            byTicker.set(row.ticker, { ticker: row.ticker, version: versionFor.get(row.ticker), card: fallbackCard(row) });
+        }
+    }
+    return tickers.filter(t => byTicker.has(t)).map(t => byTicker.get(t));
+}
+
+// SHA-256 hex of the inputs that determine a response
+export async function responseCacheKey(route, model, context, question) {
+    const normalized = question.trim().replace(/\s+/g, ' ').toLowerCase();
+    const versions = context.map(c => [c.ticker, c.version]).sort(([a], [b]) => (a < b ? -1 : a > b ? 1 : 0));
+    const bytes = new TextEncoder().encode(JSON.stringify([route, model, versions, normalized]));
+    const digest = await crypto.subtle.digest('SHA-256', bytes);
+    return [...new Uint8Array(digest)].map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+export async function cachedResponse(key) {
+    const cutoff = new Date(Date.now() - CACHE_TTL_DAYS * 86400000).toISOString();
+    const { data, error } = await supabase
+        .from('ai_responses')
+        .select('response')
+        .eq('cache_key', key)
+        .gte('created_at', cutoff)
+        .maybeSingle();
+    if (error) {
+        console.error('AI cache read error:', error);
+        return null;
+    }
+    return data?.response || null;
+}
+
+// Store a response and drop expired ones without holding up the reply.
+// Without waitUntil the writes are still started, just not awaited.
+export function storeResponse(key, response, context) {
+    const cutoff = new Date(Date.now() - CACHE_TTL_DAYS * 86400000).toISOString();
+    const write = supabase
+        .from('ai_responses')
+        .upsert({ cache_key: key, response, created_at: new Date().toISOString() }, { onConflict: 'cache_key' })
+        .then(({ error }) => {
+            if (error) console.error('AI cache write error:', error);
+            return supabase.from('ai_responses').delete().lt('created_at', cutoff);
+        })
+        .then(({ error }) => {
+            if (error) console.error('AI cache prune error:', error);
+        });
+    if (context?.waitUntil) context.waitUntil(write);
+}
@@ -0,0 +1,184 @@
+"""
+Compact context cards for the AI routes.
+
+ai-chat and ai-compare used to read whole stock documents (decades of
+history included) on every turn, only to format a dozen overview fields
+into the prompt. A card is that context rendered once per refresh, when
+the data changes: key metrics, growth rates derived from the income
+reports and a price summary from the `indicators` row.
+
+Cards are rebuilt from the stored document after every write (the refresh
+routes and /api/rescore, which the queue calls after storeStockData) and kept
+in the `ai_context` table (see supabase-schema.sql); the AI routes read just
+the card (api/_ai_context.js).
+"""
+from datetime import datetime
+
+from _screener import parse
+
+# Overview keys a card reads
+OVERVIEW_KEYS = (
+    'Name', 'Sector', 'Industry', 'MarketCapitalization', 'TrailingPE', 'PERatio', 'ForwardPE',
+    'PEGRatio', 'PriceToBookRatio', 'RevenueTTM', 'EPS', 'ProfitMargin', 'OperatingMarginTTM',
+    'ReturnOnEquityTTM', 'QuarterlyRevenueGrowthYOY', 'QuarterlyEarningsGrowthYOY', 'DividendYield',
+    '52WeekHigh', '52WeekLow', 'AnalystTargetPrice',
+)
+
+# Annual reports back to the 3-year CAGR base, and the quarter a year before the latest
+ANNUAL_REPORTS = 4
+QUARTER_YOY = 4
+
+# PostgREST select for just what a card reads, so refreshes can rebuild
+# cards without reading whole documents
+CARD_SELECT = ', '.join(
+    ['ticker', 'last_updated:data->>last_updated', 'currency:data->>currency', 'quote:data->quote']
+    + [f'ov_{key}:data->overview->>{key}' for key in OVERVIEW_KEYS]
+    + [f'annual{i}:data->income->annualReports->{i}' for i in range(ANNUAL_REPORTS)]
+    + [f'quarterly{i}:data->income->quarterlyReports->{i}' for i in (0, QUARTER_YOY)]
+)
+
+INDICATOR_SELECT = 'ticker, as_of, price, sma_200, high_52w, low_52w, drawdown, vol_1y, returns'
+
+RETURN_LABELS = (('YTD', 'YTD'), ('1Y', '1Y'), ('3Y', '3Y CAGR'), ('5Y', '5Y CAGR'))
+
+
+def document_from_row(row):
+    """Rebuild the document shape `context_card` reads from a CARD_SELECT row."""
+    return {
+        'overview': {key: row.get(f'ov_{key}') for key in OVERVIEW_KEYS if row.get(f'ov_{key}') is not None},
+        'quote': row.get('quote') or {},
+        'income': {
+            'annualReports': [row[f'annual{i}'] for i in range(ANNUAL_REPORTS) if row.get(f'annual{i}')],
+            # Only the latest quarter and the one a year before are selected
+            'quarterlyReports': [row.get('quarterly0')] + [None] * (QUARTER_YOY - 1) + [row.get(f'quarterly{QUARTER_YOY}')],
+        },
+        'currency': row.get('currency'),
+        'last_updated': row.get('last_updated'),
+    }
+
+
+def _text(val):
+    return 'N/A' if val in (None, '', 'None', 'N/A') else str(val)
+
+
+def _percent(val, signed=False):
+    num = parse(val)
+    if num is None:
+        return 'N/A'
+    return f"{num * 100:+.1f}%" if signed else f"{num * 100:.1f}%"
+
+
+def _growth(latest, base, years=1):
+    """Growth from `base` to `latest` (annualized over `years`); None unless both are positive."""
+    latest, base = parse(latest), parse(base)
+    if not latest or not base or latest <= 0 or base <= 0:
+        return None
+    return (latest / base) ** (1 / years) - 1
+
+
+def growth_rates(income):
+    """Revenue and net income growth from the stored income reports."""
+    annual = (income or {}).get('annualReports') or []
+    quarterly = (income or {}).get('quarterlyReports') or []
+    rates = {}
+    for name, key in (('revenue', 'totalRevenue'), ('net_income', 'netIncome')):
+        values = [report.get(key) for report in annual]
+        if len(values) > 1:
+            rates[f'{name}_yoy'] = _growth(values[0], values[1])
+        if len(values) > 3:
+            rates[f'{name}_cagr_3y'] = _growth(values[0], values[3], 3)
+        if len(quarterly) > QUARTER_YOY and quarterly[0] and quarterly[QUARTER_YOY]:
+            rates[f'{name}_quarter_yoy'] = _growth(quarterly[0].get(key), quarterly[QUARTER_YOY].get(key))
+    if annual:
+        rates['fiscal_year'] = str(annual[0].get('fiscalDateEnding', ''))[:4] or None
+    return rates
+
+
+def price_summary(indicators):
+    """One line of range returns, 52-week range and trend from an indicators row."""
+    if not indicators:
+        return None
+    parts = []
+    returns = indicators.get('returns') or {}
+    ranges = [f"{label} {_percent(returns[key], signed=True)}" for key, label in RETURN_LABELS if key in returns]
+    if ranges:
+        parts.append(', '.join(ranges))
+    if indicators.get('high_52w') is not None and indicators.get('low_52w') is not None:
+        parts.append(f"52W range {indicators['low_52w']:.2f}-{indicators['high_52w']:.2f}")
+    drawdown = indicators.get('drawdown')
+    if drawdown is not None:
+        parts.append(f"{_percent(-drawdown)} below peak" if drawdown < -0.0005 else 'at its peak')
+    price, sma = indicators.get('price'), indicators.get('sma_200')
+    if price and sma:
+        parts.append(f"{'above' if price >= sma else 'below'} 200-day average ({sma:.2f})")
+    if indicators.get('vol_1y') is not None:
+        parts.append(f"1Y volatility {_percent(indicators['vol_1y'])}")
+    return '; '.join(parts) or None
+
+
+def context_card(ticker, data, indicators=None):
+    """The prompt block for one stock document (and its indicators row)."""
+    ov = data.get('overview') or {}
+    quote = (data.get('quote') or {}).get('Global Quote') or {}
+    growth = growth_rates(data.get('income'))
+    fy = f" (FY{growth['fiscal_year']})" if growth.get('fiscal_year') else ''
+
+    def rate(key, signed=True):
+        return _percent(growth.get(key), signed)
+
+    lines = [
+        f"STOCK DATA FOR {ticker} ({_text(data.get('currency'))}, as of {_text(data.get('last_updated'))[:10]}):",
+        f"- Company: {_text(ov.get('Name'))}",
+        f"- Sector: {_text(ov.get('Sector'))} | Industry: {_text(ov.get('Industry'))}",
+        f"- Current Price: {_text(quote.get('05. price'))} | Market Cap: {_text(ov.get('MarketCapitalization'))}",
+        f"- Trailing PE: {_text(ov.get('TrailingPE') or ov.get('PERatio'))} | Forward PE: {_text(ov.get('ForwardPE'))}"
+        f" | PEG Ratio: {_text(ov.get('PEGRatio'))} | P/B: {_text(ov.get('PriceToBookRatio'))}",
+        f"- Revenue TTM: {_text(ov.get('RevenueTTM'))} | EPS: {_text(ov.get('EPS'))}",
+        f"- Profit Margin: {_percent(ov.get('ProfitMargin'))} | Operating Margin: {_percent(ov.get('OperatingMarginTTM'))}"
+        f" | ROE: {_percent(ov.get('ReturnOnEquityTTM'))}",
+        f"- Growth (quarter YoY, provider): Revenue {_percent(ov.get('QuarterlyRevenueGrowthYOY'), True)}"
+        f" | EPS {_percent(ov.get('QuarterlyEarningsGrowthYOY'), True)}",
+        f"- Revenue Growth{fy}: {rate('revenue_yoy')} YoY | 3Y CAGR {rate('revenue_cagr_3y')}"
+        f" | latest quarter YoY {rate('revenue_quarter_yoy')}",
+        f"- Net Income Growth{fy}: {rate('net_income_yoy')} YoY | 3Y CAGR {rate('net_income_cagr_3y')}"
+        f" | latest quarter YoY {rate('net_income_quarter_yoy')}",
+        f"- Dividend Yield: {_text(ov.get('DividendYield'))} | Analyst Target: {_text(ov.get('AnalystTargetPrice'))}",
+    ]
+    summary = price_summary(indicators)
+    if summary:
+        lines.append(f"- Price Summary: {summary}")
+    else:
+        lines.append(f"- 52W High: {_text(ov.get('52WeekHigh'))} | 52W Low: {_text(ov.get('52WeekLow'))}")
+    return '\n'.join(lines)
+
+
+def card_row(ticker, data, indicators=None):
+    return {
+        'ticker': ticker,
+        'version': str(data.get('last_updated') or ''),
+        'card': context_card(ticker, data, indicators),
+        'updated_at': datetime.now().isoformat(),
+    }
+
+
+def load_indicators(supabase, tickers):
+    result = supabase.table('indicators').select(INDICATOR_SELECT).in_('ticker', list(tickers)).execute()
+    return {row['ticker']: row for row in result.data or []}
+
+
+def save_cards(supabase, rows):
+    if rows:
+        supabase.table('ai_context').upsert(rows, on_conflict='ticker').execute()
+    return len(rows)
+
+
+def refresh_cards(supabase, tickers):
+    """Rebuild cards for tickers already in stock_data, reading only the
+    fields a card needs (two selects, one upsert). Run after the refresh's
+    patches and indicators are written."""
+    if not tickers:
+        return 0
+    result = supabase.table('stock_data').select(CARD_SELECT).in_('ticker', list(tickers)).execute()
+    indicators = load_indicators(supabase, tickers)
+    return save_cards(supabase, [card_row(row['ticker'], document_from_row(row), indicators.get(row['ticker']))
+                                 for row in result.data or []])
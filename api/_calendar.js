@@ -0,0 +1,149 @@
+/**
+ * Trading calendars for NSE/BSE ('IN') and NYSE/Nasdaq ('US').
+ *
+ * Mirrors api/_calendar.py (the Python refresh routes use that one); keep
+ * the holiday lists and rules in sync. Days are handled as Dates at UTC
+ * midnight holding the exchange's local calendar date.
+ */
+
+const SESSIONS = {
+    IN: { open: [9, 15], close: [15, 30] },
+    US: { open: [9, 30], close: [16, 0] }
+};
+const US_EARLY_CLOSE = [13, 0];
+const IST_OFFSET_MIN = 330;
+
+// NSE/BSE trading holidays that fall on weekdays, from the exchange circulars
+const IN_HOLIDAYS = {
+    2024: ['01-22', '01-26', '03-08', '03-25', '03-29', '04-11', '04-17', '05-01', '05-20', '06-17',
+           '07-17', '08-15', '10-02', '11-01', '11-15', '11-20', '12-25'],
+    2025: ['02-26', '03-14', '03-31', '04-10', '04-14', '04-18', '05-01', '08-15', '08-27', '10-02',
+           '10-21', '10-22', '11-05', '12-25'],
+    2026: ['01-26', '03-03', '03-26', '03-31', '04-03', '04-14', '05-01', '05-28', '06-26', '09-14',
+           '10-02', '10-20', '11-10', '11-24', '12-25']
+};
+const IN_FIXED_HOLIDAYS = ['01-26', '05-01', '08-15', '10-02', '12-25'];
+
+const MAX_LOOKBACK_DAYS = 14;
+const DAY_MS = 86400000;
+
+const day = (y, m, d) => new Date(Date.UTC(y, m - 1, d));
+const iso = date => date.toISOString().slice(0, 10);
+const addDays = (date, n) => new Date(date.getTime() + n * DAY_MS);
+
+// n-th `weekday` (0 = Sunday) of the month; n = -1 for the last one
+function nthWeekday(year, month, weekday, n) {
+    if (n > 0) {
+        const first = day(year, month, 1);
+        return addDays(first, (weekday - first.getUTCDay() + 7) % 7 + 7 * (n - 1));
+    }
+    const last = day(year, month + 1, 0);
+    return addDays(last, -((last.getUTCDay() - weekday + 7) % 7));
+}
+
+// Anonymous Gregorian algorithm
+function easter(year) {
+    const a = year % 19, b = Math.floor(year / 100), c = year % 100;
+    const d = Math.floor(b / 4), e = b % 4;
+    const g = Math.floor((8 * b + 13) / 25);
+    const h = (19 * a + b - d - g + 15) % 30;
+    const i = Math.floor(c / 4), k = c % 4;
+    const l = (32 + 2 * e + 2 * i - h - k) % 7;
+    const m = Math.floor((a + 11 * h + 19 * l) / 433);
+    const month = Math.floor((h + l - 7 * m + 90) / 25);
+    return day(year, month, (h + l - 7 * m + 33 * month + 19) % 32);
+}
+
+// Saturday holidays close the Friday before, Sunday ones the Monday after
+function observed(date) {
+    const wd = date.getUTCDay();
+    return wd === 6 ? addDays(date, -1) : wd === 0 ? addDays(date, 1) : date;
+}
+
+const usHolidayCache = new Map();
+
+function usHolidays(year) {
+    if (usHolidayCache.has(year)) return usHolidayCache.get(year);
+    const days = [
+        nthWeekday(year, 1, 1, 3),      // Martin Luther King Jr. Day
+        nthWeekday(year, 2, 1, 3),      // Washington's Birthday
+        addDays(easter(year), -2),      // Good Friday
+        nthWeekday(year, 5, 1, -1),     // Memorial Day
+        observed(day(year, 7, 4)),
+        nthWeekday(year, 9, 1, 1),      // Labor Day
+        nthWeekday(year, 11, 4, 4),     // Thanksgiving
+        observed(day(year, 12, 25))
+    ];
+    // No Friday closure when New Year's Day falls on a Saturday
+    if (day(year, 1, 1).getUTCDay() !== 6) days.push(observed(day(year, 1, 1)));
+    if (year >= 2022) days.push(observed(day(year, 6, 19)));  // Juneteenth
+    const set = new Set(days.map(iso));
+    usHolidayCache.set(year, set);
+    return set;
+}
+
+function inHolidays(year) {
+    return new Set((IN_HOLIDAYS[year] || IN_FIXED_HOLIDAYS).map(md => `${year}-${md}`));
+}
+
+export function isTradingDay(market, date) {
+    const wd = date.getUTCDay();
+    if (wd === 0 || wd === 6) return false;
+    const year = date.getUTCFullYear();
+    return !(market === 'IN' ? inHolidays(year) : usHolidays(year)).has(iso(date));
+}
+
+// Eastern time: DST from the second Sunday in March to the first Sunday in November
+function offsetMinutes(market, date) {
+    if (market === 'IN') return IST_OFFSET_MIN;
+    const year = date.getUTCFullYear();
+    const dst = date >= nthWeekday(year, 3, 0, 2) && date < nthWeekday(year, 11, 0, 1);
+    return dst ? -240 : -300;
+}
+
+function usClose(date) {
+    const year = date.getUTCFullYear();
+    const md = iso(date).slice(5);
+    const dayAfterThanksgiving = iso(addDays(nthWeekday(year, 11, 4, 4), 1));
+    return md === '07-03' || md === '12-24' || iso(date) === dayAfterThanksgiving
+        ? US_EARLY_CLOSE
+        : SESSIONS.US.close;
+}
+
+// { open, close } of a local day's session as instants, or null when closed
+export function session(market, date) {
+    if (!isTradingDay(market, date)) return null;
+    const offset = offsetMinutes(market, date) * 60000;
+    const at = ([h, m]) => new Date(date.getTime() + (h * 60 + m) * 60000 - offset);
+    const close = market === 'US' ? usClose(date) : SESSIONS[market].close;
+    return { open: at(SESSIONS[market].open), close: at(close) };
+}
+
+function localDay(market, now) {
+    const utcDay = day(now.getUTCFullYear(), now.getUTCMonth() + 1, now.getUTCDate());
+    const local = new Date(now.getTime() + offsetMinutes(market, utcDay) * 60000);
+    return day(local.getUTCFullYear(), local.getUTCMonth() + 1, local.getUTCDate());
+}
+
+export function isOpen(market, now = new Date()) {
+    const hours = session(market, localDay(market, now));
+    return Boolean(hours) && hours.open <= now && now < hours.close;
+}
+
+// Close of the most recent session that has ended by `now`
+export function lastClose(market, now = new Date()) {
+    let date = localDay(market, now);
+    for (let i = 0; i < MAX_LOOKBACK_DAYS; i++) {
+        const hours = session(market, date);
+        if (hours && hours.close <= now) return hours.close;
+        date = addDays(date, -1);
+    }
+    return null;
+}
+
+// Whether a session has closed since `since` (a Date or ISO string; missing = never)
+export function closedSince(market, since, now = new Date()) {
+    if (!since) return true;
+    const close = lastClose(market, now);
+    return Boolean(close) && new Date(since) < close;
+}
@@ -0,0 +1,185 @@
+"""
+Trading calendars for NSE/BSE (market 'IN') and NYSE/Nasdaq ('US').
+
+Refreshes used to run whenever the cron fired and skip only tickers already
+updated that day, so weekends' catch-up runs, exchange holidays and repeated
+runs after the close all refetched prices that could not have moved. The
+question a refresh needs answered is "has a session closed (or is one open)
+since this ticker was last checked?", which `is_due` answers from the
+calendars below.
+
+US holidays follow the NYSE rules and are computed for any year. NSE and
+BSE publish their holiday list each December and share it; years missing
+from IN_HOLIDAYS fall back to the fixed-date national holidays, so an
+unlisted holiday costs a fetch (which change detection then keeps from
+being written) rather than a missed session.
+
+api/_calendar.js mirrors this module for the edge routes; keep the two in
+sync.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Local session hours
+SESSIONS = {
+    'IN': (time(9, 15), time(15, 30)),
+    'US': (time(9, 30), time(16, 0)),
+}
+US_EARLY_CLOSE = time(13, 0)
+
+# NSE/BSE trading holidays that fall on weekdays, from the exchange circulars
+IN_HOLIDAYS = {
+    2024: ('01-22', '01-26', '03-08', '03-25', '03-29', '04-11', '04-17', '05-01', '05-20', '06-17',
+           '07-17', '08-15', '10-02', '11-01', '11-15', '11-20', '12-25'),
+    2025: ('02-26', '03-14', '03-31', '04-10', '04-14', '04-18', '05-01', '08-15', '08-27', '10-02',
+           '10-21', '10-22', '11-05', '12-25'),
+    2026: ('01-26', '03-03', '03-26', '03-31', '04-03', '04-14', '05-01', '05-28', '06-26', '09-14',
+           '10-02', '10-20', '11-10', '11-24', '12-25'),
+}
+IN_FIXED_HOLIDAYS = ('01-26', '05-01', '08-15', '10-02', '12-25')
+
+IN_INDICES = ('^NSEI', '^BSESN', '^NSEBANK')
+
+# How far back to look for the previous session (covers Diwali weeks and long weekends)
+MAX_LOOKBACK_DAYS = 14
+
+
+def market_for(ticker):
+    ticker = ticker.upper()
+    return 'IN' if ticker.endswith(('.NS', '.BO')) or ticker in IN_INDICES else 'US'
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th `weekday` (0 = Monday) of the month; n = -1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    # Anonymous Gregorian algorithm
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def _observed(day):
+    # Saturday holidays close the Friday before, Sunday ones the Monday after
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def us_holidays(year):
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),   # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),   # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),   # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # No Friday closure when New Year's Day falls on a Saturday
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return holidays
+
+
+def in_holidays(year):
+    days = IN_HOLIDAYS.get(year, IN_FIXED_HOLIDAYS)
+    return {date(year, int(d[:2]), int(d[3:])) for d in days}
+
+
+def is_trading_day(market, day):
+    if day.weekday() >= 5:
+        return False
+    holidays = in_holidays(day.year) if market == 'IN' else us_holidays(day.year)
+    return day not in holidays
+
+
+def _us_offset(day):
+    # Eastern time: DST from the second Sunday in March to the first Sunday in November
+    dst = _nth_weekday(day.year, 3, 6, 2) <= day < _nth_weekday(day.year, 11, 6, 1)
+    return timezone(timedelta(hours=-4 if dst else -5))
+
+
+def _tz(market, day):
+    return IST if market == 'IN' else _us_offset(day)
+
+
+def _us_close(day):
+    thanksgiving = _nth_weekday(day.year, 11, 3, 4)
+    if day == thanksgiving + timedelta(days=1) or (day.month, day.day) in ((7, 3), (12, 24)):
+        return US_EARLY_CLOSE
+    return SESSIONS['US'][1]
+
+
+def session(market, day):
+    """(open, close) of `day`'s session as aware datetimes, or None when closed."""
+    if not is_trading_day(market, day):
+        return None
+    opens, closes = SESSIONS[market]
+    if market == 'US':
+        closes = _us_close(day)
+    tz = _tz(market, day)
+    return datetime.combine(day, opens, tz), datetime.combine(day, closes, tz)
+
+
+def _local_day(market, now):
+    # Close enough for the US offset: sessions never straddle the 2am switch
+    return now.astimezone(_tz(market, now.astimezone(timezone.utc).date())).date()
+
+
+def is_open(market, now=None):
+    now = now or datetime.now(timezone.utc)
+    hours = session(market, _local_day(market, now))
+    return bool(hours) and hours[0] <= now < hours[1]
+
+
+def last_close(market, now=None):
+    """Close of the most recent session that has ended by `now`."""
+    now = now or datetime.now(timezone.utc)
+    day = _local_day(market, now)
+    for _ in range(MAX_LOOKBACK_DAYS):
+        hours = session(market, day)
+        if hours and hours[1] <= now:
+            return hours[1]
+        day -= timedelta(days=1)
+    return None
+
+
+def parse_timestamp(value):
+    """An aware datetime from a stored ISO timestamp (naive values are UTC)."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        stamp = value
+    else:
+        stamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+
+def is_due(market, checked_at, now=None):
+    """Whether a refresh could see new prices: never checked, the session is
+    open, or a session has closed since `checked_at`."""
+    now = now or datetime.now(timezone.utc)
+    checked_at = parse_timestamp(checked_at)
+    if checked_at is None or is_open(market, now):
+        return True
+    closed = last_close(market, now)
+    return closed is not None and checked_at < closed
@@ -0,0 +1,60 @@
+"""
+Progress checkpoints for the sharded daily refresh cron.
+
+Each shard keeps one row in `refresh_checkpoints` recording the current run
+id, the last ticker written and the run status. An invocation picks up after
+that ticker, so a run that dies partway (timeout, rate limit) is continued
+by the next invocation instead of starting again from the top.
+"""
+import zlib
+from datetime import datetime
+
+PAGE_SIZE = 1000  # PostgREST default max rows per select
+
+
+def shard_key(shard, shards):
+    return f'{shard}/{shards}'
+
+
+def in_shard(ticker, shard, shards):
+    """Stable ticker -> shard assignment (independent of table order)."""
+    return shards <= 1 or zlib.crc32(ticker.encode()) % shards == shard
+
+
+def list_tickers(supabase):
+    """All stock_data tickers in order, paging past the 1000-row select cap."""
+    tickers = []
+    start = 0
+    while True:
+        result = supabase.table('stock_data').select('ticker').order('ticker') \
+            .range(start, start + PAGE_SIZE - 1).execute()
+        page = [row['ticker'] for row in (result.data or [])]
+        tickers.extend(page)
+        if len(page) < PAGE_SIZE:
+            return tickers
+        start += PAGE_SIZE
+
+
+def pending_tickers(tickers, shard, shards, cursor=None):
+    """Tickers in this shard that sort after the checkpoint cursor."""
+    return [t for t in tickers if in_shard(t, shard, shards) and (cursor is None or t > cursor)]
+
+
+def load_checkpoint(supabase, key):
+    result = supabase.table('refresh_checkpoints').select('*').eq('shard_key', key).execute()
+    return result.data[0] if result.data else None
+
+
+def save_checkpoint(supabase, key, run_id, cursor, status, processed, errors, started=False):
+    row = {
+        'shard_key': key,
+        'run_id': run_id,
+        'cursor': cursor,
+        'status': status,
+        'processed': processed,
+        'errors': errors,
+        'updated_at': datetime.now().isoformat(),
+    }
+    if started:
+        row['started_at'] = row['updated_at']
+    supabase.table('refresh_checkpoints').upsert(row, on_conflict='shard_key').execute()
@@ -0,0 +1,18 @@
+"""
+Supabase client for shared modules that run outside a route's own client.
+
+Routes create their client inside the handler; helpers that may be called
+without one (the info cache store, FX lookups, bar and indicator writes
+from fetch-indian-stock) use this instead.
+"""
+import os
+
+
+def client_from_env():
+    """A service-role client, or None when credentials aren't configured."""
+    supabase_url = os.environ.get('SUPABASE_URL', '')
+    supabase_key = os.environ.get('SUPABASE_SERVICE_KEY', os.environ.get('SUPABASE_KEY', ''))
+    if not supabase_url or not supabase_key:
+        return None
+    from supabase import create_client
+    return create_client(supabase_url, supabase_key)
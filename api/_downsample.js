@@ -0,0 +1,49 @@
+/**
+ * Largest-Triangle-Three-Buckets downsampling for line charts.
+ *
+ * Keeps the first and last points and, from each of `threshold - 2` equal
+ * buckets in between, the point forming the largest triangle with the point
+ * kept from the previous bucket and the average of the next bucket. Peaks,
+ * troughs and the overall shape survive at a fraction of the points, which a
+ * stride or bucket average would flatten.
+ */
+
+// Indices of the points to keep from `xs`/`ys` (same length, xs ascending)
+export function lttb(xs, ys, threshold) {
+    const n = xs.length;
+    if (threshold >= n || threshold < 3) {
+        return Array.from({ length: n }, (_, i) => i);
+    }
+
+    const kept = [0];
+    const every = (n - 2) / (threshold - 2);
+    let a = 0;
+    for (let bucket = 0; bucket < threshold - 2; bucket++) {
+        // Average of the next bucket (the last point for the final one)
+        const nextStart = Math.floor((bucket + 1) * every) + 1;
+        const nextEnd = Math.min(Math.floor((bucket + 2) * every) + 1, n);
+        let avgX = 0, avgY = 0;
+        for (let i = nextStart; i < nextEnd; i++) {
+            avgX += xs[i];
+            avgY += ys[i];
+        }
+        const count = nextEnd - nextStart;
+        avgX = count ? avgX / count : xs[n - 1];
+        avgY = count ? avgY / count : ys[n - 1];
+
+        const start = Math.floor(bucket * every) + 1;
+        const end = Math.floor((bucket + 1) * every) + 1;
+        let best = start, bestArea = -1;
+        for (let i = start; i < end; i++) {
+            const area = Math.abs((xs[a] - avgX) * (ys[i] - ys[a]) - (xs[a] - xs[i]) * (avgY - ys[a]));
+            if (area > bestArea) {
+                bestArea = area;
+                best = i;
+            }
+        }
+        kept.push(best);
+        a = best;
+    }
+    kept.push(n - 1);
+    return kept;
+}
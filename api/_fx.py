@@ -0,0 +1,86 @@
+"""
+USD/INR rates served from the `exchange_rates` table.
+
+Stock fetches used to call exchangerate-api.com inline, with no timeout, and
+stored 83.50 whenever that failed. Reads now come from an in-process TTL
+cache in front of `exchange_rates` (the table exchange-history.js backfills),
+so a fetch never waits on the FX provider. The daily refresh cron calls
+`refresh_rate` once per run to add the day's rate to the table.
+"""
+import json
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+from _db import client_from_env
+
+LATEST_URL = 'https://api.exchangerate-api.com/v4/latest/USD'
+DEFAULT_USD_INR = 83.50
+RATE_TTL = 3600
+REFRESH_TIMEOUT = 5
+
+_cached = None  # (stored_at, {'rate', 'date', 'source'})
+_lock = threading.Lock()
+
+
+def load_latest(supabase):
+    """Most recent stored rate as {'rate', 'date', 'source'}, or None."""
+    result = supabase.table('exchange_rates').select('date, rate, source') \
+        .order('date', desc=True).limit(1).execute()
+    if not result.data:
+        return None
+    row = result.data[0]
+    return {'rate': float(row['rate']), 'date': row['date'], 'source': row.get('source') or 'cached'}
+
+
+def usd_inr(supabase=None, max_age=RATE_TTL):
+    """Latest known USD/INR rate, from memory or the `exchange_rates` table.
+
+    Never calls the FX provider. Falls back to DEFAULT_USD_INR with a `None`
+    date when no rate is stored, so callers can tell a real rate from the
+    placeholder.
+    """
+    global _cached
+    with _lock:
+        if _cached and time.monotonic() - _cached[0] <= max_age:
+            return _cached[1]
+
+    latest = None
+    try:
+        supabase = supabase or client_from_env()
+        if supabase:
+            latest = load_latest(supabase)
+    except Exception as e:
+        print(f"[fx] Rate lookup failed: {e}")
+
+    if latest is None:
+        # Not cached, so the next call retries the table
+        return {'rate': DEFAULT_USD_INR, 'date': None, 'source': 'default'}
+
+    with _lock:
+        _cached = (time.monotonic(), latest)
+    return latest
+
+
+def fetch_live_rate(timeout=REFRESH_TIMEOUT):
+    with urllib.request.urlopen(LATEST_URL, timeout=timeout) as response:
+        data = json.loads(response.read().decode())
+    rate = (data.get('rates') or {}).get('INR')
+    if not rate:
+        raise ValueError('INR rate missing from provider response')
+    return float(rate)
+
+
+def refresh_rate(supabase, timeout=REFRESH_TIMEOUT):
+    """Store today's rate from the provider and prime the in-process cache."""
+    global _cached
+    entry = {
+        'rate': fetch_live_rate(timeout),
+        'date': datetime.now().strftime('%Y-%m-%d'),
+        'source': 'exchangerate-api',
+    }
+    supabase.table('exchange_rates').upsert(entry, on_conflict='date').execute()
+    with _lock:
+        _cached = (time.monotonic(), entry)
+    return entry
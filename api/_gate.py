@@ -0,0 +1,84 @@
+"""
+Skip refreshes that can't change anything.
+
+Both checks read the `refresh_state` table (see supabase-schema.sql), one
+row per ticker with when it was last checked and a hash of what was last
+written:
+
+    calendar  a ticker is due only while its market is open or once a
+              session has closed since it was last checked (_calendar.py);
+              tickers that aren't due get no upstream call at all
+    content   a fetched patch whose quote/overview/history hash matches the
+              last written one is not written (no patch, bars, rescore or
+              indicators); only its `checked_at` moves, so the calendar
+              check holds until the next close
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from _calendar import is_due, market_for
+
+STATE_PAGE = 200  # tickers per `in` filter, to keep request URLs short
+
+
+def load_refresh_state(supabase, tickers):
+    """{ticker: row} for tickers that have been checked before."""
+    tickers = list(tickers)
+    states = {}
+    for start in range(0, len(tickers), STATE_PAGE):
+        result = supabase.table('refresh_state').select('ticker, content_hash, checked_at, changed_at') \
+            .in_('ticker', tickers[start:start + STATE_PAGE]).execute()
+        states.update({row['ticker']: row for row in result.data or []})
+    return states
+
+
+def due_tickers(states, tickers, now=None, markets=None):
+    """Split `tickers` into (due, skipped) by their market's calendar.
+
+    `markets` maps ticker -> 'IN'/'US' where the stored market is known;
+    others are inferred from the symbol.
+    """
+    now = now or datetime.now(timezone.utc)
+    markets = markets or {}
+    due, skipped = [], []
+    for ticker in tickers:
+        state = states.get(ticker) or {}
+        market = markets.get(ticker) or market_for(ticker)
+        (due if is_due(market, state.get('checked_at'), now) else skipped).append(ticker)
+    return due, skipped
+
+
+def content_hash(patch):
+    """Hash of what a patch would write, ignoring its timestamp."""
+    content = {key: patch[key] for key in ('quote', 'overview', 'history') if patch.get(key)}
+    return hashlib.blake2b(json.dumps(content, sort_keys=True).encode(), digest_size=16).hexdigest()
+
+
+def changed_patches(states, patches):
+    """The patches whose content differs from the last written one."""
+    return [patch for patch in patches
+            if content_hash(patch) != (states.get(patch['ticker']) or {}).get('content_hash')]
+
+
+def record_checks(supabase, states, patches=(), checked=(), now=None):
+    """Mark tickers as checked now: `patches` with their content hash
+    (`changed_at` moves when it differs), `checked` tickers without one.
+    Updates `states` in place and returns the number of rows written."""
+    now = (now or datetime.now(timezone.utc)).isoformat()
+    rows = []
+    for ticker, digest in [(p['ticker'], content_hash(p)) for p in patches] + [(t, None) for t in checked]:
+        previous = states.get(ticker) or {}
+        digest = digest or previous.get('content_hash')
+        changed = digest != previous.get('content_hash') or not previous.get('changed_at')
+        row = {
+            'ticker': ticker,
+            'content_hash': digest,
+            'checked_at': now,
+            'changed_at': now if changed else previous['changed_at'],
+        }
+        states[ticker] = row
+        rows.append(row)
+    if rows:
+        supabase.table('refresh_state').upsert(rows, on_conflict='ticker').execute()
+    return len(rows)
@@ -0,0 +1,99 @@
+"""
+Writers for the columnar `price_history` table.
+
+Bars are stored one row per (ticker, interval, date) with numeric columns,
+so readers can fetch a date range as compact arrays instead of shipping and
+re-parsing the whole `data.history` map. Refresh routes upsert only the bars
+they just fetched; a re-fetched bar for the same date replaces the old one.
+
+Intervals:
+    1mo  the provider's monthly bars (written with the stock document)
+    1d   daily bars: the full series from fetch-indian-stock, then one bar
+         per refresh
+    1wk  rolled up from the daily bars by `rollup_weekly_bars` (see
+         supabase-schema.sql) whenever daily bars are written, so charts
+         over long ranges read a fifth of the rows; never fetched
+"""
+
+# Rows per upsert; a full daily series is ~250 bars a year
+BAR_CHUNK = 1000
+
+# Stored point key -> price_history column
+POINT_COLUMNS = {
+    '1. open': 'o',
+    '2. high': 'h',
+    '3. low': 'l',
+    '4. close': 'c',
+    '5. adjusted close': 'adj_c',
+    '6. volume': 'v',
+    '7. dividend amount': 'div',
+}
+
+
+def _number(val):
+    try:
+        num = float(val)
+    except (TypeError, ValueError):
+        return None
+    return num if num == num else None
+
+
+def history_rows(ticker, points, interval):
+    """Convert `{date: {'1. open': '...', ...}}` points into price_history rows."""
+    rows = []
+    for date_str, point in points.items():
+        row = {'ticker': ticker, 'date': date_str, 'interval': interval}
+        for key, column in POINT_COLUMNS.items():
+            row[column] = _number(point.get(key))
+        if row['v'] is not None:
+            row['v'] = int(row['v'])
+        rows.append(row)
+    return rows
+
+
+def frame_rows(ticker, hist, interval):
+    """Convert a yfinance history frame straight into price_history rows,
+    skipping the string points (a daily series is thousands of bars)."""
+    if hist is None or hist.empty:
+        return []
+    index = hist.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    dates = index.values.astype('datetime64[D]').astype(str).tolist()
+    columns = {}
+    for name, column in (('Open', 'o'), ('High', 'h'), ('Low', 'l'), ('Close', 'c'),
+                         ('Volume', 'v'), ('Dividends', 'div')):
+        values = hist[name].tolist() if name in hist.columns else [None] * len(dates)
+        columns[column] = [_number(val) for val in values]
+    rows = []
+    for i, date_str in enumerate(dates):
+        close = columns['c'][i]
+        if close is None:
+            continue
+        volume = columns['v'][i]
+        rows.append({
+            'ticker': ticker, 'date': date_str, 'interval': interval,
+            'o': columns['o'][i], 'h': columns['h'][i], 'l': columns['l'][i],
+            # Yahoo's bars are already adjusted (auto_adjust)
+            'c': close, 'adj_c': close,
+            'v': int(volume) if volume is not None else None,
+            'div': columns['div'][i],
+        })
+    return rows
+
+
+def append_bars(supabase, rows):
+    """Upsert bars, replacing any existing bar for the same (ticker, interval, date)."""
+    for start in range(0, len(rows), BAR_CHUNK):
+        supabase.table('price_history').upsert(rows[start:start + BAR_CHUNK],
+                                               on_conflict='ticker,interval,date').execute()
+    return len(rows)
+
+
+def rollup_weekly(supabase, tickers, since=None):
+    """Recompute the weekly bars of `tickers` from `since`'s week on (all
+    weeks without it) from their daily bars; returns the rows written."""
+    if not tickers:
+        return 0
+    result = supabase.rpc('rollup_weekly_bars', {'p_tickers': sorted(set(tickers)), 'p_since': since}).execute()
+    return result.data or 0
@@ -0,0 +1,333 @@
+"""
+Technical indicators and return statistics, precomputed at refresh time.
+
+The dashboard's volatility, moving-average and 52-week panels used to show
+whatever Beta / 50DayMovingAverage / 52WeekHigh strings the data provider
+returned, and range returns were worked out in the browser. Refresh routes
+now compute them from the price series with NumPy and keep one `indicators`
+row per ticker (see supabase-schema.sql), read by api/indicators.js.
+
+Each row carries a compact `state`: the last DAILY_WINDOW daily closes, the
+last MONTHLY_WINDOW month-end closes and the all-time peak and max drawdown.
+Appending bars updates the state and every indicator is recomputed from it,
+so a refresh never re-reads price_history; only a ticker's first update
+seeds the state from the table.
+
+State shape:
+    {
+        'd': [19905, ...],     # daily bar dates as days since 1970-01-01
+        'c': [101.2, ...],     # daily adjusted closes
+        'm': [202406, ...],    # months as YYYYMM
+        'mc': [99.8, ...],     # month-end (or latest in-month) adjusted closes
+        'peak': 120.5,         # highest close seen
+        'mdd': -0.42,          # deepest drawdown from a running peak
+    }
+"""
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+DAILY_WINDOW = 260
+MONTHLY_WINDOW = 121
+TRADING_DAYS = 252
+SMA_WINDOWS = (50, 200)
+EMA_SPANS = (20, 50)
+VOL_WINDOWS = {'vol_1m': 21, 'vol_3m': 63, 'vol_1y': 252}
+CAGR_YEARS = {'1Y': 1, '3Y': 3, '5Y': 5, '10Y': 10}
+MIN_BETA_DAYS = 60
+MIN_BETA_MONTHS = 24
+
+# Index each market's betas are measured against
+BENCHMARKS = {'US': '^GSPC', 'IN': '^NSEI'}
+
+EPOCH = date(1970, 1, 1)
+
+
+def benchmark_for(ticker):
+    return BENCHMARKS['IN'] if ticker.endswith(('.NS', '.BO')) else BENCHMARKS['US']
+
+
+def _day(date_str):
+    return (datetime.strptime(date_str[:10], '%Y-%m-%d').date() - EPOCH).days
+
+
+def _month(date_str):
+    return int(date_str[:4]) * 100 + int(date_str[5:7])
+
+
+def _iso(day):
+    return (EPOCH + timedelta(days=int(day))).isoformat()
+
+
+def empty_state():
+    return {'d': [], 'c': [], 'm': [], 'mc': [], 'peak': None, 'mdd': 0.0}
+
+
+def closes_from_points(points):
+    """`{date: {'5. adjusted close': '...'}}` history points -> {date: close}."""
+    closes = {}
+    for date_str, point in (points or {}).items():
+        try:
+            close = float(point.get('5. adjusted close') or point.get('4. close'))
+        except (TypeError, ValueError):
+            continue
+        if close == close and close > 0:
+            closes[date_str] = close
+    return closes
+
+
+def _merge(keys, values, new_keys, new_values, window):
+    """Merge new (key, value) pairs into sorted series; a new value for an
+    existing key replaces it. Keeps the last `window` entries."""
+    merged = dict(zip(keys, values))
+    # Four decimals keep the stored state small without moving any indicator
+    merged.update((k, round(float(v), 4)) for k, v in zip(new_keys, new_values))
+    ordered = sorted(merged.items())[-window:]
+    return [k for k, _ in ordered], [v for _, v in ordered]
+
+
+def _update_drawdown(state, closes):
+    """Carry the running peak and max drawdown over newly appended closes."""
+    if len(closes) == 0:
+        return
+    peak = state.get('peak')
+    running = np.maximum.accumulate(np.concatenate([[peak], closes]) if peak else closes)
+    if peak:
+        running = running[1:]
+    drawdowns = closes / running - 1
+    state['peak'] = float(running[-1])
+    state['mdd'] = float(min(state.get('mdd') or 0.0, drawdowns.min()))
+
+
+def append_daily(state, closes, full=False):
+    """Append `{date: close}` daily bars. Bars dated on or before the last
+    stored day only replace that day, so re-sent bars are harmless. With
+    `full`, `closes` is the whole downloaded series and replaces the daily
+    window."""
+    if not closes:
+        return state
+    dates = sorted(closes)
+    if full:
+        state['d'], state['c'] = [], []
+    last_day = state['d'][-1] if state['d'] else None
+    fresh = [d for d in dates if last_day is None or _day(d) > last_day]
+
+    state['d'], state['c'] = _merge(state['d'], state['c'], [_day(d) for d in dates],
+                                    [closes[d] for d in dates], DAILY_WINDOW)
+    # The latest daily close is also the month's close so far
+    months = {}
+    for d in dates:
+        months[_month(d)] = closes[d]
+    state['m'], state['mc'] = _merge(state['m'], state['mc'], list(months), list(months.values()), MONTHLY_WINDOW)
+    _update_drawdown(state, np.array([closes[d] for d in fresh], dtype=float))
+    return state
+
+
+def append_monthly(state, closes, full=False):
+    """Merge `{date: close}` monthly bars. With `full`, `closes` is the whole
+    series (e.g. re-fetched after a corporate action) and replaces the
+    monthly part of the state, peak and drawdown included."""
+    if not closes:
+        return state
+    dates = sorted(closes)
+    if full:
+        state['m'], state['mc'], state['peak'], state['mdd'] = [], [], None, 0.0
+        fresh = dates
+    else:
+        last_month = state['m'][-1] if state['m'] else None
+        fresh = [d for d in dates if last_month is None or _month(d) >= last_month]
+    state['m'], state['mc'] = _merge(state['m'], state['mc'], [_month(d) for d in dates],
+                                     [closes[d] for d in dates], MONTHLY_WINDOW)
+    _update_drawdown(state, np.array([closes[d] for d in fresh], dtype=float))
+    return state
+
+
+def _ema(closes, span):
+    """EMA of the whole window in one weighted sum (seeded with the first
+    close; after DAILY_WINDOW bars the seed's weight is negligible)."""
+    alpha = 2 / (span + 1)
+    n = len(closes)
+    weights = alpha * (1 - alpha) ** np.arange(n - 1, -1, -1)
+    weights[0] = (1 - alpha) ** (n - 1)
+    return float(weights @ closes)
+
+
+def _beta(days, closes, bench_days, bench_closes, min_points):
+    """Beta from log returns between consecutive dates both series share."""
+    _, idx, bench_idx = np.intersect1d(days, bench_days, return_indices=True)
+    if len(idx) < min_points + 1:
+        return None
+    returns = np.diff(np.log(closes[idx]))
+    bench_returns = np.diff(np.log(bench_closes[bench_idx]))
+    var = bench_returns.var(ddof=1)
+    if not var:
+        return None
+    return float(np.cov(returns, bench_returns, ddof=1)[0, 1] / var)
+
+
+def _finite(val):
+    # JSON has no inf/NaN; store them as NULL
+    return val if val is None or np.isfinite(val) else None
+
+
+def compute(state, bench_state=None):
+    """Indicator columns and range returns from a state.
+
+    Values that need more history than the state holds are None, so the
+    dashboard can fall back to the provider's figures.
+    """
+    days = np.array(state['d'], dtype=float)
+    daily = np.array(state['c'], dtype=float)
+    months = np.array(state['m'], dtype=float)
+    monthly = np.array(state['mc'], dtype=float)
+
+    # Latest close: the daily window's, unless a newer monthly bar arrived
+    out = {'as_of': None, 'price': None}
+    if len(daily):
+        out['as_of'], out['price'] = _iso(days[-1]), float(daily[-1])
+    if len(monthly) and (out['as_of'] is None or int(months[-1]) > _month(out['as_of'])):
+        m = int(months[-1])
+        out['as_of'], out['price'] = f'{m // 100:04d}-{m % 100:02d}-01', float(monthly[-1])
+    price = out['price']
+
+    for n in SMA_WINDOWS:
+        out[f'sma_{n}'] = float(daily[-n:].mean()) if len(daily) >= n else None
+    for span in EMA_SPANS:
+        out[f'ema_{span}'] = _ema(daily, span) if len(daily) >= span else None
+
+    log_returns = np.diff(np.log(daily)) if len(daily) > 1 else np.array([])
+    for column, n in VOL_WINDOWS.items():
+        out[column] = float(log_returns[-n:].std(ddof=1) * np.sqrt(TRADING_DAYS)) \
+            if len(log_returns) >= n else None
+    monthly_returns = np.diff(np.log(monthly)) if len(monthly) > 1 else np.array([])
+    out['vol_monthly'] = float(monthly_returns.std(ddof=1) * np.sqrt(12)) if len(monthly_returns) >= 12 else None
+
+    # 52-week range needs most of a year of daily bars
+    if len(daily) and days[-1] - days[0] >= 300:
+        year = daily[days > days[-1] - 365]
+        out['high_52w'], out['low_52w'] = float(year.max()), float(year.min())
+    else:
+        out['high_52w'] = out['low_52w'] = None
+
+    peak = state.get('peak')
+    out['drawdown'] = price / peak - 1 if price and peak else None
+    out['max_drawdown'] = state.get('mdd')
+
+    # Range returns: YTD is a simple return, longer ranges are annualized
+    returns = {}
+    if price and len(monthly):
+        last = int(months[-1])
+        for label, years in CAGR_YEARS.items():
+            anchor = monthly[months == last - years * 100]
+            if len(anchor) and anchor[0] > 0:
+                returns[label] = (price / anchor[0]) ** (1 / years) - 1
+        year_end = monthly[months == (last // 100 - 1) * 100 + 12]
+        if len(year_end) and year_end[0] > 0:
+            returns['YTD'] = price / year_end[0] - 1
+    out['returns'] = {k: round(float(v), 6) for k, v in returns.items() if np.isfinite(v)}
+
+    out['beta'] = None
+    if bench_state:
+        out['beta'] = _beta(days, daily, np.array(bench_state['d'], dtype=float),
+                            np.array(bench_state['c'], dtype=float), MIN_BETA_DAYS)
+        if out['beta'] is None:
+            out['beta'] = _beta(months, monthly, np.array(bench_state['m'], dtype=float),
+                                np.array(bench_state['mc'], dtype=float), MIN_BETA_MONTHS)
+
+    return {k: (_finite(v) if isinstance(v, float) else v) for k, v in out.items()}
+
+
+def indicator_row(ticker, state, bench_state=None, benchmark=None):
+    """`indicators` row for one ticker, state included."""
+    return {
+        'ticker': ticker,
+        **compute(state, bench_state),
+        'benchmark': benchmark if bench_state else None,
+        'state': state,
+        'updated_at': datetime.now().isoformat(),
+    }
+
+
+def load_states(supabase, tickers):
+    """{ticker: state} for tickers that already have an indicators row."""
+    if not tickers:
+        return {}
+    result = supabase.table('indicators').select('ticker, state').in_('ticker', list(tickers)).execute()
+    return {row['ticker']: row['state'] for row in result.data or [] if row.get('state')}
+
+
+def seed_state(supabase, ticker):
+    """Build a ticker's first state from price_history: the whole monthly
+    series (for the all-time peak) and the latest daily bars."""
+    state = empty_state()
+    monthly = supabase.table('price_history').select('date, adj_c, c') \
+        .eq('ticker', ticker).eq('interval', '1mo').order('date').execute()
+    append_monthly(state, {row['date']: row['adj_c'] or row['c'] for row in monthly.data or []
+                           if (row['adj_c'] or row['c'])}, full=True)
+    daily = supabase.table('price_history').select('date, adj_c, c') \
+        .eq('ticker', ticker).eq('interval', '1d').order('date', desc=True).limit(DAILY_WINDOW).execute()
+    append_daily(state, {row['date']: row['adj_c'] or row['c'] for row in daily.data or []
+                         if (row['adj_c'] or row['c'])})
+    return state
+
+
+def save_rows(supabase, rows):
+    if rows:
+        supabase.table('indicators').upsert(rows, on_conflict='ticker').execute()
+    return len(rows)
+
+
+def update_indicators(supabase, daily=None, monthly=None, full_monthly=(), full_daily=()):
+    """Append new bars and recompute indicators, one select and one upsert
+    for all tickers (plus a one-off seed for tickers without a row).
+
+    `daily` / `monthly` map ticker -> {date: close}; tickers in
+    `full_monthly` / `full_daily` sent their whole monthly / daily series.
+    """
+    daily, monthly = daily or {}, monthly or {}
+    tickers = set(daily) | set(monthly)
+    if not tickers:
+        return 0
+    benchmarks = {ticker: benchmark_for(ticker) for ticker in tickers}
+    states = load_states(supabase, tickers | set(benchmarks.values()))
+
+    rows = []
+    for ticker in sorted(tickers):
+        state = states.get(ticker)
+        if state is None:
+            state = empty_state() if ticker in full_monthly else seed_state(supabase, ticker)
+        append_monthly(state, monthly.get(ticker), full=ticker in full_monthly)
+        append_daily(state, daily.get(ticker), full=ticker in full_daily)
+        bench = benchmarks[ticker]
+        rows.append(indicator_row(ticker, state, states.get(bench), bench))
+    return save_rows(supabase, rows)
+
+
+def refresh_benchmarks(yf, supabase, symbols=None):
+    """Append the latest benchmark index bars (seeding a missing benchmark
+    with a year of daily and ten years of monthly bars). `symbols` limits
+    the update to some benchmarks. Returns the number of benchmarks updated."""
+    symbols = list(BENCHMARKS.values() if symbols is None else symbols)
+    if not symbols:
+        return 0
+    states = load_states(supabase, symbols)
+    rows = []
+    for symbol in symbols:
+        ticker = yf.Ticker(symbol)
+        state = states.get(symbol)
+        if state is None:
+            state = empty_state()
+            append_monthly(state, _frame_closes(ticker.history(period='10y', interval='1mo')), full=True)
+            append_daily(state, _frame_closes(ticker.history(period='2y', interval='1d')))
+        else:
+            append_daily(state, _frame_closes(ticker.history(period='5d', interval='1d')))
+        rows.append(indicator_row(symbol, state))
+    return save_rows(supabase, rows)
+
+
+def _frame_closes(frame):
+    if frame is None or frame.empty or 'Close' not in frame.columns:
+        return {}
+    closes = frame['Close'].dropna()
+    return {idx.strftime('%Y-%m-%d'): float(val) for idx, val in zip(closes.index, closes.to_numpy())
+            if val > 0}
@@ -0,0 +1,242 @@
+"""
+Shared cache for yfinance `Ticker.info` lookups.
+
+`info` is the slowest and most throttled Yahoo call we make, and a ticker is
+often validated, requested and refreshed within seconds. Lookups go through
+three tiers:
+
+1. an in-process TTL + LRU map (survives between warm invocations),
+2. the `info_cache` Supabase table (shared across instances), when Supabase
+   credentials are configured,
+3. Yahoo itself.
+
+Concurrent requests for the same symbol are coalesced into one upstream
+fetch, and hit/miss counters are kept per process.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from _db import client_from_env
+
+DEFAULT_TTL = 300
+DEFAULT_MAXSIZE = 512
+
+
+def _fetch_from_yahoo(symbol):
+    import yfinance as yf
+    return yf.Ticker(symbol).info
+
+
+def _cacheable(info):
+    """Only cache lookups that returned a price; misses for bad symbols are retried."""
+    return bool(info) and bool(info.get('currentPrice') or info.get('regularMarketPrice'))
+
+
+class SupabaseInfoStore:
+    """Persistent tier backed by the `info_cache` table."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def load(self, symbols, max_age):
+        result = self.client.table('info_cache').select('symbol, info, fetched_at') \
+            .in_('symbol', list(symbols)).execute()
+        now = datetime.now(timezone.utc)
+        found = {}
+        for row in result.data or []:
+            fetched_at = datetime.fromisoformat(row['fetched_at'])
+            if fetched_at.tzinfo is None:
+                fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+            age = (now - fetched_at).total_seconds()
+            if age <= max_age:
+                found[row['symbol']] = (row['info'], age)
+        return found
+
+    def save(self, infos):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [{'symbol': symbol, 'info': json.loads(json.dumps(info, default=str)), 'fetched_at': now}
+                for symbol, info in infos.items()]
+        if rows:
+            self.client.table('info_cache').upsert(rows, on_conflict='symbol').execute()
+
+
+def store_from_env():
+    client = client_from_env()
+    return SupabaseInfoStore(client) if client else None
+
+
+class InfoCache:
+    def __init__(self, ttl=DEFAULT_TTL, maxsize=DEFAULT_MAXSIZE, store=None, store_factory=store_from_env):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._store = store
+        self._store_factory = None if store else store_factory
+        self._memory = OrderedDict()  # symbol -> (stored_at, info)
+        self._inflight = {}           # symbol -> Future
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'store_hits': 0, 'misses': 0, 'coalesced': 0, 'errors': 0}
+
+    @property
+    def store(self):
+        # Created on first use so importing the cache doesn't pay for a Supabase client
+        if self._store_factory:
+            factory, self._store_factory = self._store_factory, None
+            try:
+                self._store = factory()
+            except Exception as e:
+                print(f"[info_cache] Store unavailable: {e}")
+        return self._store
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters, size=len(self._memory))
+        lookups = stats['memory_hits'] + stats['store_hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = round((lookups - stats['misses']) / lookups, 3) if lookups else None
+        return stats
+
+    def _memory_get(self, symbol, max_age):
+        entry = self._memory.get(symbol)
+        if entry is None:
+            return None
+        stored_at, info = entry
+        if time.monotonic() - stored_at > max_age:
+            del self._memory[symbol]
+            return None
+        self._memory.move_to_end(symbol)
+        return info
+
+    def _memory_put(self, symbol, info):
+        with self._lock:
+            self._memory[symbol] = (time.monotonic(), info)
+            self._memory.move_to_end(symbol)
+            while len(self._memory) > self.maxsize:
+                self._memory.popitem(last=False)
+
+    def get(self, symbol, fetch=None, max_age=None):
+        """Return `info` for one symbol from the nearest tier that has it."""
+        return self._resolve(symbol, fetch or _fetch_from_yahoo, max_age or self.ttl, use_store=True)
+
+    def get_many(self, symbols, fetch=None, max_age=None, max_workers=8):
+        """Bulk lookup; returns {symbol: (info, error)}. See `iter_many`."""
+        return {symbol: (info, error)
+                for symbol, info, error in self.iter_many(symbols, fetch, max_age, max_workers)}
+
+    def iter_many(self, symbols, fetch=None, max_age=None, max_workers=8):
+        """Yield (symbol, info, error) as each lookup resolves: memory hits
+        first, then one store query for all memory misses, then a bounded
+        pool of upstream fetches in completion order."""
+        fetch = fetch or _fetch_from_yahoo
+        max_age = max_age or self.ttl
+        missing = []
+
+        with self._lock:
+            hits = []
+            for symbol in symbols:
+                info = self._memory_get(symbol, max_age)
+                if info is not None:
+                    self.counters['memory_hits'] += 1
+                    hits.append((symbol, info))
+                else:
+                    missing.append(symbol)
+        for symbol, info in hits:
+            yield symbol, info, None
+
+        if missing and self.store:
+            try:
+                found = self.store.load(missing, max_age)
+            except Exception as e:
+                print(f"[info_cache] Store read failed: {e}")
+                found = {}
+            with self._lock:
+                self.counters['store_hits'] += len(found)
+            for symbol, (info, _age) in found.items():
+                self._memory_put(symbol, info)
+                yield symbol, info, None
+            missing = [symbol for symbol in missing if symbol not in found]
+
+        if not missing:
+            return
+
+        def resolve(symbol):
+            return self._resolve(symbol, fetch, max_age, use_store=False, persist=False)
+
+        fetched = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(missing)))) as pool:
+            futures = {pool.submit(resolve, symbol): symbol for symbol in missing}
+            try:
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        info = future.result()
+                    except Exception as e:
+                        yield symbol, None, str(e)
+                        continue
+                    if _cacheable(info):
+                        fetched[symbol] = info
+                    yield symbol, info, None
+            finally:
+                self._persist(fetched)
+
+    def _persist(self, infos):
+        if infos and self.store:
+            try:
+                self.store.save(infos)
+            except Exception as e:
+                print(f"[info_cache] Store write failed: {e}")
+
+    def _resolve(self, symbol, fetch, max_age, use_store, persist=True):
+        with self._lock:
+            info = self._memory_get(symbol, max_age)
+            if info is not None:
+                self.counters['memory_hits'] += 1
+                return info
+            future = self._inflight.get(symbol)
+            leader = future is None
+            if leader:
+                future = self._inflight[symbol] = Future()
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            info = None
+            if use_store and self.store:
+                try:
+                    found = self.store.load([symbol], max_age)
+                except Exception as e:
+                    print(f"[info_cache] Store read failed: {e}")
+                    found = {}
+                if symbol in found:
+                    info = found[symbol][0]
+                    with self._lock:
+                        self.counters['store_hits'] += 1
+
+            if info is None:
+                with self._lock:
+                    self.counters['misses'] += 1
+                info = fetch(symbol)
+                if _cacheable(info) and persist:
+                    self._persist({symbol: info})
+
+            if _cacheable(info):
+                self._memory_put(symbol, info)
+            future.set_result(info)
+            return info
+        except Exception as e:
+            with self._lock:
+                self.counters['errors'] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(symbol, None)
+
+
+# Process-wide cache shared by every route loaded in this interpreter
+info_cache = InfoCache()
@@ -0,0 +1,72 @@
+import { supabase } from './_utils.js';
+
+// Histogram bucket upper bounds (ms); keep in step with BUCKETS_MS in _metrics.py.
+// A final open bucket counts everything slower.
+export const BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 60000];
+
+const PAGE_SIZE = 1000;
+const PERCENTILES = { p50: 0.5, p95: 0.95, p99: 0.99 };
+
+// Percentile from bucket counts, interpolated linearly inside the bucket.
+// Samples in the open bucket report its lower bound.
+export function percentile(buckets, total, q) {
+    if (!total) return null;
+    const target = q * total;
+    let seen = 0;
+    for (let i = 0; i < buckets.length; i++) {
+        const count = buckets[i] || 0;
+        if (count && seen + count >= target) {
+            if (i >= BUCKETS_MS.length) return BUCKETS_MS[BUCKETS_MS.length - 1];
+            const lower = i === 0 ? 0 : BUCKETS_MS[i - 1];
+            return Math.round(lower + (BUCKETS_MS[i] - lower) * (target - seen) / count);
+        }
+        seen += count;
+    }
+    return BUCKETS_MS[BUCKETS_MS.length - 1];
+}
+
+// Latency and errors per route, phase and upstream call over the last
+// `hours` hourly windows: { route: { name: {count, errors, error_rate,
+// avg_ms, p50, p95, p99} }, phase: {...}, upstream: {...} }
+export async function metricsSummary(hours = 24) {
+    const since = new Date(Date.now() - hours * 3600 * 1000);
+    since.setUTCMinutes(0, 0, 0);
+
+    const merged = new Map();
+    for (let from = 0; ; from += PAGE_SIZE) {
+        const { data, error } = await supabase
+            .from('route_metrics')
+            .select('kind, name, count, errors, sum_ms, buckets')
+            .gte('window_start', since.toISOString())
+            .range(from, from + PAGE_SIZE - 1);
+        if (error) throw error;
+        for (const row of data || []) {
+            const key = `${row.kind}\u0000${row.name}`;
+            const acc = merged.get(key) || {
+                kind: row.kind, name: row.name, count: 0, errors: 0, sum_ms: 0,
+                buckets: new Array(BUCKETS_MS.length + 1).fill(0)
+            };
+            acc.count += row.count;
+            acc.errors += row.errors;
+            acc.sum_ms += row.sum_ms;
+            (row.buckets || []).forEach((n, i) => { acc.buckets[i] += n; });
+            merged.set(key, acc);
+        }
+        if (!data || data.length < PAGE_SIZE) break;
+    }
+
+    const summary = { window_hours: hours, route: {}, phase: {}, upstream: {} };
+    for (const acc of merged.values()) {
+        const stats = {
+            count: acc.count,
+            errors: acc.errors,
+            error_rate: acc.count ? acc.errors / acc.count : 0,
+            avg_ms: acc.count ? Math.round(acc.sum_ms / acc.count) : null
+        };
+        for (const [label, q] of Object.entries(PERCENTILES)) {
+            stats[label] = percentile(acc.buckets, acc.count, q);
+        }
+        (summary[acc.kind] ||= {})[acc.name] = stats;
+    }
+    return summary;
+}
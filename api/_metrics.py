@@ -0,0 +1,144 @@
+"""
+Latency and error instrumentation for the Python routes.
+
+Each request gets a `RequestMetrics` that times named phases (building the
+document, the Supabase write, ...) and upstream calls (`yahoo.info`,
+`exchangerate-api`, ...). The response carries them in a `Server-Timing`
+header. Once the body is written, `finish` folds every sample, plus the
+route's own latency, into rolling hourly histograms in the `route_metrics`
+table with one `record_metrics` call (see supabase-schema.sql);
+api/status.js reads them back as p50/p95/p99 and error counts. The call is
+a plain PostgREST request, so routes that never load the Supabase client
+(validate-ticker, light quick refreshes) don't import it just to report.
+
+Sample kinds:
+    route     one sample per request; an error when the status is >= 500
+    phase     '<route>:<phase>', a step inside one route
+    upstream  a call leaving the function, named '<provider>.<call>'
+"""
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Upper bounds (ms) of the histogram buckets; one more open bucket follows.
+# api/status.js reads percentiles back with the same bounds.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 60000)
+FLUSH_TIMEOUT = 2
+
+_TOKEN = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def bucket_index(ms):
+    return bisect_left(BUCKETS_MS, ms)
+
+
+def window_start(now=None):
+    """Start of the hourly window a sample is counted in."""
+    now = now or datetime.now(timezone.utc)
+    return now.replace(minute=0, second=0, microsecond=0).isoformat()
+
+
+class RequestMetrics:
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.timings = []  # (kind, name, ms, error)
+        self.finished = False
+        # Upstream calls may be recorded from thread-pool workers
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, ms, error=False):
+        if kind == 'phase':
+            name = f'{self.route}:{name}'
+        with self._lock:
+            self.timings.append((kind, name, float(ms), bool(error)))
+
+    @contextmanager
+    def _timed(self, kind, name):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(kind, name, (time.perf_counter() - start) * 1000, error)
+
+    def phase(self, name):
+        return self._timed('phase', name)
+
+    def upstream(self, name):
+        return self._timed('upstream', name)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """`Server-Timing` header value: time per phase and upstream call
+        (summed when a name repeats) and the total so far."""
+        totals = {}
+        with self._lock:
+            for kind, name, ms, _ in self.timings:
+                if kind == 'route':
+                    continue
+                key = _TOKEN.sub('_', name.split(':', 1)[-1])
+                if kind == 'upstream':
+                    key = f'up.{key}'
+                totals[key] = totals.get(key, 0.0) + ms
+        parts = [f'{key};dur={ms:.1f}' for key, ms in totals.items()]
+        parts.append(f'total;dur={self.elapsed_ms():.1f}')
+        return ', '.join(parts)
+
+    def samples(self):
+        """Timings aggregated per (kind, name) for `record_metrics`."""
+        rows = {}
+        with self._lock:
+            timings = list(self.timings)
+        for kind, name, ms, error in timings:
+            row = rows.get((kind, name))
+            if row is None:
+                row = rows[(kind, name)] = {
+                    'kind': kind, 'name': name, 'count': 0, 'errors': 0, 'sum_ms': 0.0,
+                    'buckets': [0] * (len(BUCKETS_MS) + 1),
+                }
+            row['count'] += 1
+            row['errors'] += int(error)
+            row['sum_ms'] = round(row['sum_ms'] + ms, 3)
+            row['buckets'][bucket_index(ms)] += 1
+        return list(rows.values())
+
+    def finish(self, status=200):
+        """Record the route latency and flush every sample. Runs once per
+        request, after the response is written; never raises."""
+        if self.finished:
+            return
+        self.finished = True
+        self.record('route', self.route, self.elapsed_ms(), status >= 500)
+        try:
+            flush(self.samples())
+        except Exception as e:
+            print(f"[metrics] Flush failed for {self.route}: {e}")
+
+
+def flush(samples, timeout=FLUSH_TIMEOUT):
+    """Add samples to the current window with the `record_metrics` RPC.
+    Skipped when Supabase credentials aren't configured."""
+    url = os.environ.get('SUPABASE_URL', '')
+    key = os.environ.get('SUPABASE_SERVICE_KEY', os.environ.get('SUPABASE_KEY', ''))
+    if not url or not key or not samples:
+        return
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/rest/v1/rpc/record_metrics",
+        data=json.dumps({'p_window': window_start(), 'p_samples': samples}).encode(),
+        headers={'apikey': key, 'Authorization': f'Bearer {key}', 'Content-Type': 'application/json'},
+        method='POST',
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        response.read()
@@ -0,0 +1,169 @@
+"""
+Delta updates for `stock_data.data`.
+
+Refresh routes used to read the whole JSONB document (overview, statements,
+decades of history), change a few fields and write it all back. A patch
+carries only the changed quote fields, overview metrics and new history
+points; the `patch_stock_data` Postgres function (see supabase-schema.sql)
+merges it into the stored document server-side, so neither side moves the
+full blob.
+
+Patch shape:
+    {
+        'ticker': 'TCS.NS',
+        'quote': {'05. price': '...', ...},           # merged into quote['Global Quote']
+        'overview': {'TrailingPE': '...', ...},       # merged into overview, if present
+        'history': {'2024-06-28': {'1. open': ...}},  # daily bars, rolled into the monthly series
+        'last_updated': '2024-06-28T09:00:00',
+    }
+
+History bars are daily; each is folded into its month's point (see
+`roll_monthly_point`) so the stored series stays one point per month.
+Daily bars themselves live in `price_history` (see _history.py).
+"""
+from datetime import datetime
+
+HISTORY_KEY = 'Monthly Adjusted Time Series'
+
+# yfinance info key -> overview key for metrics that move with the price
+OVERVIEW_METRICS = {
+    'TrailingPE': 'trailingPE',
+    'ForwardPE': 'forwardPE',
+    'MarketCapitalization': 'marketCap',
+    'EPS': 'trailingEps',
+    '52WeekHigh': 'fiftyTwoWeekHigh',
+    '52WeekLow': 'fiftyTwoWeekLow',
+    'DividendYield': 'dividendYield',
+    'Beta': 'beta',
+    'PriceToBookRatio': 'priceToBook',
+}
+
+
+def _bar_value(bar, key, default):
+    val = bar.get(key, default)
+    return default if val is None or val != val else val
+
+
+def history_point(bar, current_price):
+    """Format a daily OHLCV bar the way the monthly series stores points."""
+    return {
+        '1. open': str(_bar_value(bar, 'Open', current_price)),
+        '2. high': str(_bar_value(bar, 'High', current_price)),
+        '3. low': str(_bar_value(bar, 'Low', current_price)),
+        '4. close': str(_bar_value(bar, 'Close', current_price)),
+        '5. adjusted close': str(_bar_value(bar, 'Close', current_price)),
+        '6. volume': str(int(_bar_value(bar, 'Volume', 0))),
+    }
+
+
+def quote_fields(info, current_price, with_change=False):
+    prev_close = info.get('previousClose', current_price)
+    fields = {
+        '05. price': str(current_price),
+        '08. previous close': str(prev_close),
+    }
+    if with_change:
+        change = current_price - prev_close if current_price and prev_close else 0
+        change_pct = (change / prev_close * 100) if prev_close else 0
+        fields['09. change'] = f"{change:.4f}"
+        fields['10. change percent'] = f"{change_pct:.4f}%"
+    return fields
+
+
+def overview_fields(info):
+    """Price-dependent overview metrics that yfinance returned a value for."""
+    fields = {}
+    for key, info_key in OVERVIEW_METRICS.items():
+        val = info.get(info_key)
+        if val is not None:
+            fields[key] = str(val)
+    # Some UI reads PERatio rather than TrailingPE
+    if 'TrailingPE' in fields:
+        fields['PERatio'] = fields['TrailingPE']
+    return fields
+
+
+def _positive(val):
+    try:
+        num = float(val)
+    except (TypeError, ValueError):
+        return None
+    return num if num > 0 else None
+
+
+def derived_overview_fields(price, eps=None, shares=None, book_value=None):
+    """Price-dependent ratios recomputed from stored per-share figures, for
+    quote sources (like the chart endpoint) that don't return them."""
+    fields = {}
+    if _positive(eps):
+        fields['TrailingPE'] = fields['PERatio'] = str(round(price / float(eps), 6))
+    if _positive(shares):
+        fields['MarketCapitalization'] = str(int(price * float(shares)))
+    if _positive(book_value):
+        fields['PriceToBookRatio'] = str(round(price / float(book_value), 6))
+    return fields
+
+
+def build_patch(ticker, quote=None, overview=None, history=None):
+    patch = {'ticker': ticker, 'last_updated': datetime.now().isoformat()}
+    if quote:
+        patch['quote'] = quote
+    if overview:
+        patch['overview'] = overview
+    if history:
+        patch['history'] = history
+    return patch
+
+
+def _extreme(values, pick):
+    """The string among `values` whose number is the `pick` (min/max) one."""
+    numbers = {}
+    for val in values:
+        try:
+            numbers[val] = float(val)
+        except (TypeError, ValueError):
+            continue
+    return pick(numbers, key=numbers.get) if numbers else None
+
+
+def roll_monthly_point(series, date_str, bar):
+    """Fold a daily bar into its month's point, in place; mirrors the
+    `roll_monthly_point` Postgres function.
+
+    Open comes from the month's earliest point, high/low span its points and
+    the bar, close is the bar's. A month-start key (Yahoo's monthly bars) is
+    kept; otherwise the point moves to the bar's date, as Alpha Vantage dates
+    the month in progress. Volume is the larger of the two, since a day that
+    is refreshed twice can't be summed.
+    """
+    keys = sorted(key for key in series if key[:7] == date_str[:7])
+    points = [series.pop(key) for key in keys]
+    point = dict(bar)
+    if points:
+        point['1. open'] = points[0].get('1. open', bar.get('1. open'))
+        point['2. high'] = _extreme([p.get('2. high') for p in points] + [bar.get('2. high')], max)
+        point['3. low'] = _extreme([p.get('3. low') for p in points] + [bar.get('3. low')], min)
+        point['6. volume'] = _extreme([p.get('6. volume') for p in points] + [bar.get('6. volume')], max)
+        if points[0].get('7. dividend amount') is not None:
+            point['7. dividend amount'] = points[0]['7. dividend amount']
+    point = {key: val for key, val in point.items() if val is not None}
+    series[keys[0] if keys and keys[0].endswith('-01') else date_str] = point
+    return series
+
+
+def apply_patch(data, patch):
+    """Python mirror of `patch_stock_data`, for callers holding a full document."""
+    data.setdefault('quote', {}).setdefault('Global Quote', {}).update(patch.get('quote') or {})
+    series = data.setdefault('history', {}).setdefault(HISTORY_KEY, {})
+    for date_str, bar in sorted((patch.get('history') or {}).items()):
+        roll_monthly_point(series, date_str, bar)
+    if patch.get('overview') and 'overview' in data:
+        data['overview'].update(patch['overview'])
+    data['last_updated'] = patch['last_updated']
+    return data
+
+
+def write_patches(supabase, patches):
+    """Merge patches into stock_data server-side; returns the number of rows changed."""
+    result = supabase.rpc('patch_stock_data', {'patches': patches}).execute()
+    return result.data
@@ -0,0 +1,199 @@
+import { supabase, detectMarket, keepStoredSections, storeStockData } from './_utils.js';
+import { RateLimited, fetchUSStock, fetchIndianStock, providerFor } from './_upstream.js';
+
+// Refresh job queue (`refresh_jobs`). Routes enqueue tickers; workers claim
+// them highest priority first, then most recently viewed (access_log), and
+// fetch within the provider token buckets in _upstream.js. Jobs that hit the
+// quota are deferred until it refills without using up an attempt; failures
+// are retried with exponential backoff.
+
+export const PRIORITY = { user: 100, admin: 10, background: 0 };
+
+const MAX_ATTEMPTS = 5;
+const BACKOFF_BASE_S = 30;
+const BACKOFF_MAX_S = 3600;
+// Finished jobs are kept this long for /api/status progress
+const RETAIN_DAYS = 7;
+// Time a job usually takes per provider, fetch through store and rescore. A
+// worker only claims jobs whose provider fits in the time it has left.
+const JOB_COST_MS = { yahoo: 12000, alphavantage: 6000 };
+
+// Queue tickers (deduplicated; already-queued tickers keep one job at the
+// higher priority). Returns the job rows.
+export async function enqueueRefresh(tickers, { priority = PRIORITY.background, batchId = null } = {}) {
+    const unique = [...new Set(tickers.map(t => t.toUpperCase().trim()).filter(Boolean))];
+    if (unique.length === 0) return [];
+    const { data, error } = await supabase.rpc('enqueue_refresh_jobs', {
+        p_jobs: unique.map(ticker => ({ ticker, provider: providerFor(ticker) })),
+        p_priority: priority,
+        p_batch_id: batchId
+    });
+    if (error) throw error;
+    return data || [];
+}
+
+export async function claimJobs({ limit = 1, ticker = null, providers = null } = {}) {
+    const { data, error } = await supabase.rpc('claim_refresh_jobs', {
+        p_limit: limit,
+        p_ticker: ticker,
+        p_providers: providers
+    });
+    if (error) throw error;
+    return data || [];
+}
+
+async function updateJob(job, fields) {
+    const { error } = await supabase
+        .from('refresh_jobs')
+        .update({ ...fields, updated_at: new Date().toISOString() })
+        .eq('id', job.id);
+    if (error) throw error;
+}
+
+function backoffSeconds(attempts) {
+    const base = Math.min(BACKOFF_BASE_S * 2 ** (attempts - 1), BACKOFF_MAX_S);
+    return base * (0.75 + Math.random() * 0.5);
+}
+
+function secondsFromNow(seconds) {
+    return new Date(Date.now() + seconds * 1000).toISOString();
+}
+
+// Rescore the screener row and re-render the AI context card from the
+// document as stored (kept sections and merged history included) rather than
+// the raw fetch. The document is already
+// written, so a failure here is logged and doesn't fail the job.
+async function rescoreStored(ticker, origin) {
+    try {
+        const res = await fetch(`${origin}/api/rescore`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ tickers: [ticker] })
+        });
+        if (!res.ok) {
+            const err = await res.json().catch(() => ({}));
+            console.error(`Rescore failed for ${ticker}:`, err.error || res.status);
+        }
+    } catch (err) {
+        console.error(`Rescore failed for ${ticker}:`, err);
+    }
+}
+
+// Fetch and store one claimed job. Returns 'done', 'deferred' (quota) or
+// 'retry' / 'error' (failed, with or without attempts left).
+export async function runJob(job, { origin, deadline = Infinity, maxAttempts = MAX_ATTEMPTS }) {
+    const ticker = job.ticker;
+    try {
+        let stockData;
+        if (detectMarket(ticker) === 'IN') {
+            stockData = await fetchIndianStock(ticker, origin, { deadline });
+            stockData = await keepStoredSections(ticker, stockData);
+        } else {
+            stockData = await fetchUSStock(ticker, { deadline, partial: job.partial });
+        }
+
+        await storeStockData(ticker, stockData);
+        await rescoreStored(ticker, origin);
+        await supabase
+            .from('tickers')
+            .upsert({ symbol: ticker, market: detectMarket(ticker) }, { onConflict: 'symbol', ignoreDuplicates: true });
+
+        await updateJob(job, { status: 'done', partial: null, last_error: null, locked_at: null });
+        return 'done';
+    } catch (err) {
+        if (err instanceof RateLimited) {
+            await updateJob(job, {
+                status: 'queued',
+                attempts: job.attempts - 1,
+                partial: err.partial || job.partial || null,
+                run_after: secondsFromNow(err.retryAfter),
+                last_error: err.message,
+                locked_at: null
+            });
+            return 'deferred';
+        }
+        const retry = job.attempts < maxAttempts;
+        await updateJob(job, {
+            status: retry ? 'queued' : 'error',
+            run_after: retry ? secondsFromNow(backoffSeconds(job.attempts)) : job.run_after,
+            last_error: err.message,
+            locked_at: null
+        });
+        return retry ? 'retry' : 'error';
+    }
+}
+
+// Work the queue until it is empty or no provider's jobs fit in the time
+// left. A provider whose quota defers a job is skipped for the rest of the
+// run (its next job would wait on the same bucket); the others carry on.
+export async function processQueue({ origin, budgetMs = 20000 }) {
+    const deadline = Date.now() + budgetMs;
+    const summary = { done: 0, deferred: 0, retry: 0, error: 0 };
+    const deferred = new Set();
+    for (;;) {
+        const left = deadline - Date.now();
+        const providers = Object.keys(JOB_COST_MS).filter(p => !deferred.has(p) && JOB_COST_MS[p] <= left);
+        if (providers.length === 0) break;
+        const [job] = await claimJobs({ providers });
+        if (!job) break;
+        const outcome = await runJob(job, { origin, deadline });
+        summary[outcome]++;
+        if (outcome === 'deferred') deferred.add(job.provider);
+    }
+    return summary;
+}
+
+// Queue a ticker at user priority and run it inline when no other worker
+// holds it. Returns { status: 'done' | 'deferred' | 'retry' | 'error' | 'busy', job }.
+// maxAttempts: 1 reports a failure straight away instead of retrying it.
+export async function refreshNow(ticker, { origin, budgetMs = 20000, maxAttempts = MAX_ATTEMPTS }) {
+    const [queued] = await enqueueRefresh([ticker], { priority: PRIORITY.user });
+    const [job] = await claimJobs({ ticker: queued.ticker });
+    if (!job) return { status: 'busy', job: queued };
+    const status = await runJob(job, { origin, deadline: Date.now() + budgetMs, maxAttempts });
+    const { data } = await supabase.from('refresh_jobs').select('*').eq('id', job.id).maybeSingle();
+    return { status, job: data || job };
+}
+
+export async function purgeFinishedJobs() {
+    const cutoff = new Date(Date.now() - RETAIN_DAYS * 86400 * 1000).toISOString();
+    await supabase
+        .from('refresh_jobs')
+        .delete()
+        .in('status', ['done', 'error'])
+        .lt('updated_at', cutoff);
+}
+
+// Queue depth by status, progress of the latest batch and bucket levels
+export async function queueStatus() {
+    const countStatus = async (status) => {
+        const { count, error } = await supabase
+            .from('refresh_jobs')
+            .select('id', { count: 'exact', head: true })
+            .eq('status', status);
+        if (error) throw error;
+        return count || 0;
+    };
+    const [queued, running, errors, latest, next, buckets] = await Promise.all([
+        countStatus('queued'),
+        countStatus('running'),
+        countStatus('error'),
+        supabase.from('refresh_jobs').select('batch_id').not('batch_id', 'is', null)
+            .order('created_at', { ascending: false }).limit(1).maybeSingle(),
+        supabase.from('refresh_jobs').select('ticker, run_after').eq('status', 'queued')
+            .order('run_after', { ascending: true }).limit(1).maybeSingle(),
+        supabase.from('rate_buckets').select('provider, tokens, capacity, refill_per_sec, updated_at')
+    ]);
+
+    let batch = null;
+    if (latest.data?.batch_id) {
+        const { data: rows } = await supabase
+            .from('refresh_jobs')
+            .select('status')
+            .eq('batch_id', latest.data.batch_id);
+        batch = { id: latest.data.batch_id, total: rows?.length || 0, done: 0, queued: 0, running: 0, error: 0 };
+        for (const row of rows || []) batch[row.status]++;
+    }
+
+    return { queued, running, errors, batch, next_run_after: next.data?.run_after || null, buckets: buckets.data || [] };
+}
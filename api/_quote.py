@@ -0,0 +1,89 @@
+"""
+Lightweight Yahoo quote lookups (standard library only).
+
+Importing yfinance pulls in pandas and numpy, which costs seconds on a cold
+serverless start. Validation and quick refreshes only need the latest price,
+a few quote fields and the last daily bar, which the v8 chart endpoint
+returns in a couple of kilobytes, so those paths use this module instead.
+"""
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+from _info_cache import InfoCache
+
+CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?range={range}&interval={interval}'
+USER_AGENT = 'Mozilla/5.0 (compatible; LightchargeStockDash/1.0)'
+DEFAULT_TIMEOUT = 8
+
+
+def fetch_chart(symbol, range_='5d', interval='1d', timeout=DEFAULT_TIMEOUT):
+    """Return the chart result for `symbol`, or None if Yahoo has no data."""
+    url = CHART_URL.format(symbol=urllib.parse.quote(symbol, safe=''), range=range_, interval=interval)
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = json.loads(response.read().decode())
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+    results = (payload.get('chart') or {}).get('result') or []
+    return results[0] if results else None
+
+
+def chart_bars(chart):
+    """Daily bars from a chart result as [(date_str, {'Open', 'High', ...})], oldest first."""
+    timestamps = chart.get('timestamp') or []
+    quote = ((chart.get('indicators') or {}).get('quote') or [{}])[0]
+    offset = timedelta(seconds=(chart.get('meta') or {}).get('gmtoffset') or 0)
+    bars = []
+    for i, ts in enumerate(timestamps):
+        bar = {
+            'Open': (quote.get('open') or [None] * len(timestamps))[i],
+            'High': (quote.get('high') or [None] * len(timestamps))[i],
+            'Low': (quote.get('low') or [None] * len(timestamps))[i],
+            'Close': (quote.get('close') or [None] * len(timestamps))[i],
+            'Volume': (quote.get('volume') or [None] * len(timestamps))[i],
+        }
+        if bar['Close'] is None:
+            continue
+        date_str = (datetime.fromtimestamp(ts, timezone.utc) + offset).strftime('%Y-%m-%d')
+        bars.append((date_str, bar))
+    return bars
+
+
+def quote_info(symbol, chart=None):
+    """A `Ticker.info`-shaped dict with the quote fields the chart endpoint provides.
+
+    Returns {} for unknown symbols, like yfinance does.
+    """
+    chart = chart if chart is not None else fetch_chart(symbol)
+    if not chart:
+        return {}
+    meta = chart.get('meta') or {}
+    bars = chart_bars(chart)
+    price = meta.get('regularMarketPrice') or (bars[-1][1]['Close'] if bars else None)
+    previous_close = bars[-2][1]['Close'] if len(bars) >= 2 else meta.get('chartPreviousClose')
+
+    info = {
+        'symbol': meta.get('symbol', symbol),
+        'longName': meta.get('longName'),
+        'shortName': meta.get('shortName'),
+        'currency': meta.get('currency'),
+        'exchange': meta.get('exchangeName'),
+        'regularMarketPrice': price,
+        'previousClose': previous_close,
+        'fiftyTwoWeekHigh': meta.get('fiftyTwoWeekHigh'),
+        'fiftyTwoWeekLow': meta.get('fiftyTwoWeekLow'),
+        'regularMarketDayHigh': meta.get('regularMarketDayHigh'),
+        'regularMarketDayLow': meta.get('regularMarketDayLow'),
+        'regularMarketVolume': meta.get('regularMarketVolume'),
+    }
+    return {k: v for k, v in info.items() if v is not None}
+
+
+# Memory-only: light quotes must not stand in for full `info` in the shared store
+quote_cache = InfoCache(ttl=300, store_factory=None)
@@ -0,0 +1,197 @@
+"""
+Batched refresh engine shared by the Python refresh routes.
+
+Instead of one `info` + `history` + `update` round trip per ticker, a run
+downloads the latest daily bars for a whole chunk of symbols with a single
+`yf.download` call, looks up `info` through the shared info cache (misses
+are fetched on a bounded thread pool), and hands back delta patches (see
+_patch.py) so the caller can write each chunk with one bulk call without
+reading the stored documents at all.
+"""
+import time
+
+from _info_cache import info_cache
+from _patch import build_patch, history_point, quote_fields
+
+DEFAULT_CHUNK_SIZE = 100
+DEFAULT_MAX_WORKERS = 8
+
+
+def to_yf_symbol(ticker):
+    """Encode special characters for yfinance (e.g., M&M.NS -> M%26M.NS)."""
+    return ticker.replace('&', '%26')
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def download_latest_bars(yf, symbols):
+    """Fetch the last 5 daily bars for many symbols in one request.
+
+    Returns {symbol: (date_str, bar)} where `bar` is the latest row with a
+    close price. Symbols Yahoo returned nothing for are left out.
+    """
+    frame = yf.download(
+        symbols, period='5d', group_by='ticker', auto_adjust=True,
+        threads=True, progress=False
+    )
+    bars = {}
+    if frame is None or frame.empty:
+        return bars
+
+    multi = frame.columns.nlevels > 1
+    for symbol in symbols:
+        if multi and symbol not in frame.columns.get_level_values(0):
+            continue
+        sub = frame[symbol] if multi else frame
+        if 'Close' not in sub.columns:
+            continue
+        # Multi-symbol frames share one date index, so rows from other
+        # exchanges' sessions show up as NaN for this symbol.
+        sub = sub.dropna(subset=['Close'])
+        if sub.empty:
+            continue
+        bars[symbol] = (sub.index[-1].strftime('%Y-%m-%d'), sub.iloc[-1])
+    return bars
+
+
+def fetch_infos(yf, symbols, max_workers=DEFAULT_MAX_WORKERS, cache=None):
+    """Look up `Ticker.info` for each symbol through the shared info cache,
+    fetching misses on a bounded thread pool.
+
+    Returns {symbol: (info, error)}; exactly one of the pair is None.
+    """
+    cache = cache or info_cache
+    return cache.get_many(symbols, fetch=lambda symbol: yf.Ticker(symbol).info, max_workers=max_workers)
+
+
+def refresh_chunk(yf, stocks, max_workers=DEFAULT_MAX_WORKERS, cache=None):
+    """Refresh one chunk of `{'ticker'}` rows.
+
+    Returns (patches, updated, errors, timings) where `patches` are ready for
+    `write_patches`.
+    """
+    symbols = [to_yf_symbol(stock['ticker']) for stock in stocks]
+    errors = []
+
+    start = time.perf_counter()
+    try:
+        bars = download_latest_bars(yf, symbols)
+    except Exception as e:
+        bars = {}
+        errors.append(f"download: {str(e)}")
+    download_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    infos = fetch_infos(yf, symbols, max_workers, cache)
+    info_s = time.perf_counter() - start
+
+    rows = []
+    updated = []
+    for stock, symbol in zip(stocks, symbols):
+        ticker = stock['ticker']
+        info, error = infos.get(symbol, (None, 'No info returned'))
+        if error:
+            errors.append(f"{ticker}: {error}")
+            continue
+
+        current_price = info.get('currentPrice') or info.get('regularMarketPrice')
+        if not current_price:
+            errors.append(f"{ticker}: No price data")
+            continue
+
+        if symbol not in bars:
+            errors.append(f"{ticker}: No history data")
+            continue
+        date_str, bar = bars[symbol]
+
+        try:
+            patch = build_patch(
+                ticker,
+                quote=quote_fields(info, current_price),
+                history={date_str: history_point(bar, current_price)},
+            )
+        except Exception as e:
+            errors.append(f"{ticker}: {str(e)}")
+            continue
+
+        rows.append(patch)
+        updated.append({'ticker': ticker, 'price': current_price, 'date': date_str})
+
+    timings = {'download_s': round(download_s, 3), 'info_s': round(info_s, 3)}
+    return rows, updated, errors, timings
+
+
+def run_refresh(yf, stocks, write_rows, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=DEFAULT_MAX_WORKERS,
+                on_chunk=None, budget_s=None, cache=None):
+    """Refresh `stocks` chunk by chunk, writing each chunk's patches with `write_rows(rows)`.
+
+    `on_chunk(chunk, chunk_stats)` is called after each chunk is written, so
+    callers can checkpoint progress. No new chunk is started once `budget_s`
+    seconds have elapsed, and the run stops at the first failed write so the
+    unwritten chunk is retried next time.
+
+    Returns a summary with the updated tickers, errors, whether every chunk
+    was processed, and per-chunk timing/throughput stats.
+    """
+    run_start = time.perf_counter()
+    updated = []
+    errors = []
+    chunks = []
+    processed = 0
+    stopped = None
+
+    for index, chunk in enumerate(chunked(stocks, chunk_size)):
+        if budget_s is not None and time.perf_counter() - run_start >= budget_s:
+            stopped = 'budget'
+            break
+
+        chunk_start = time.perf_counter()
+        rows, chunk_updated, chunk_errors, timings = refresh_chunk(yf, chunk, max_workers, cache)
+
+        write_start = time.perf_counter()
+        if rows:
+            try:
+                write_rows(rows)
+            except Exception as e:
+                errors.append(f"write: {str(e)}")
+                stopped = 'write_failed'
+                break
+        timings['write_s'] = round(time.perf_counter() - write_start, 3)
+
+        elapsed = time.perf_counter() - chunk_start
+        chunk_stats = {
+            'chunk': index,
+            'tickers': len(chunk),
+            'updated': len(chunk_updated),
+            'errors': len(chunk_errors),
+            **timings,
+            'total_s': round(elapsed, 3),
+            'tickers_per_s': round(len(chunk) / elapsed, 2) if elapsed else None,
+        }
+        chunks.append(chunk_stats)
+        updated.extend(chunk_updated)
+        errors.extend(chunk_errors)
+        processed += len(chunk)
+
+        if on_chunk:
+            on_chunk(chunk, chunk_stats)
+
+    elapsed = time.perf_counter() - run_start
+    return {
+        'updated': updated,
+        'errors': errors,
+        'complete': processed == len(stocks),
+        'stopped': stopped,
+        'stats': {
+            'tickers': processed,
+            'chunk_size': chunk_size,
+            'max_workers': max_workers,
+            'info_cache': (cache or info_cache).stats(),
+            'elapsed_s': round(elapsed, 3),
+            'tickers_per_s': round(processed / elapsed, 2) if elapsed else None,
+            'chunks': chunks,
+        },
+    }
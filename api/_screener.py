@@ -0,0 +1,237 @@
+"""
+Snowflake scores and key ratios for the `screener` table.
+
+A Python port of `calculateSnowflakeScores` in public/index.html (same
+checks, same sector benchmarks), computed once per refresh so the screener
+endpoint can filter and rank the universe from typed, indexed columns
+instead of loading every stock_data document.
+
+Keep the checks here in step with the browser version.
+"""
+import re
+from datetime import datetime
+
+SECTOR_BENCHMARKS = {
+    'Technology': {'PE': 35, 'ROE': 0.15, 'GROWTH': 0.15, 'PB': 6, 'PS': 8},
+    'Communication Services': {'PE': 30, 'ROE': 0.15, 'GROWTH': 0.12, 'PB': 4, 'PS': 6},
+    'Consumer Defensive': {'PE': 22, 'ROE': 0.12, 'GROWTH': 0.05, 'PB': 4, 'PS': 2},
+    'Industrials': {'PE': 20, 'ROE': 0.12, 'GROWTH': 0.08, 'PB': 3, 'PS': 1.5},
+    'Financial Services': {'PE': 15, 'ROE': 0.10, 'GROWTH': 0.08, 'PB': 1.5, 'PS': 3},
+    'Energy': {'PE': 12, 'ROE': 0.12, 'GROWTH': 0.05, 'PB': 1.5, 'PS': 2},
+    'Healthcare': {'PE': 25, 'ROE': 0.12, 'GROWTH': 0.10, 'PB': 4, 'PS': 5},
+    'Consumer Cyclical': {'PE': 20, 'ROE': 0.15, 'GROWTH': 0.10, 'PB': 3, 'PS': 2.5},
+    'DEFAULT': {'PE': 20, 'ROE': 0.12, 'GROWTH': 0.10, 'PB': 3, 'PS': 4},
+}
+
+SAVINGS_RATE = 0.045
+INFLATION = 0.03
+DIVIDEND_YIELD_25TH = 0.01
+# The browser has no 75th percentile value, so that check never passes there
+DIVIDEND_YIELD_75TH = None
+
+# Overview keys the scores and ratio columns read
+OVERVIEW_KEYS = (
+    'Name', 'Sector', 'Industry', 'MarketCapitalization', 'BookValue', 'PriceToBookRatio', 'NetIncome',
+    'AnalystTargetPrice', 'TrailingPE', 'PERatio', 'PriceToSalesRatioTTM', 'PEGRatio',
+    'QuarterlyEarningsGrowthYOY', 'QuarterlyRevenueGrowthYOY', 'ReturnOnEquityTTM', 'EPS', 'DilutedEPSTTM',
+    'ProfitMargin', 'OperatingMarginTTM', 'ReturnOnAssetsTTM', 'Beta', 'EVToEBITDA', 'EVToRevenue',
+    'DividendYield', 'DividendPerShare',
+)
+
+# PostgREST select for just those fields, so refreshes can rescore without
+# reading whole documents
+SOURCE_SELECT = ', '.join(
+    ['ticker', 'market:data->>market', 'currency:data->>currency', 'quote:data->quote',
+     'income0:data->income->annualReports->0']
+    + [f'ov_{key}:data->overview->>{key}' for key in OVERVIEW_KEYS]
+)
+
+_NUMBER = re.compile(r'\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?|[+-]?Infinity)')
+
+
+def parse(val):
+    """JS parseFloat: the leading number in a string, or None."""
+    if isinstance(val, (int, float)) and not isinstance(val, bool):
+        return None if val != val else float(val)
+    match = _NUMBER.match(str(val)) if val is not None else None
+    return float(match.group(1).replace('Infinity', 'inf')) if match else None
+
+
+def document_from_row(row):
+    """Rebuild the document shape `snowflake_scores` reads from a SOURCE_SELECT row."""
+    return {
+        'overview': {key: row.get(f'ov_{key}') for key in OVERVIEW_KEYS if row.get(f'ov_{key}') is not None},
+        'quote': row.get('quote') or {},
+        'income': {'annualReports': [row['income0']] if row.get('income0') else []},
+        'market': row.get('market'),
+        'currency': row.get('currency'),
+    }
+
+
+def sector_benchmark(sector, industry):
+    for key, bench in SECTOR_BENCHMARKS.items():
+        if key != 'DEFAULT' and key.lower() in sector.lower():
+            return bench
+    if any(word in industry for word in ('Internet', 'Software', 'Interactive Media')):
+        return SECTOR_BENCHMARKS['Technology']
+    return SECTOR_BENCHMARKS['DEFAULT']
+
+
+def _gt(val, limit):
+    return val is not None and limit is not None and val > limit
+
+
+def _between(val, low, high):
+    """low < val < high, with None failing like JS comparisons against null."""
+    return val is not None and low < val < high
+
+
+def snowflake_scores(data):
+    """Value, future, past, health and dividend scores (0-6 each) and total."""
+    ov = data.get('overview') or {}
+    quote = (data.get('quote') or {}).get('Global Quote') or {}
+    income = (data.get('income') or {}).get('annualReports') or []
+    sector = ov.get('Sector') or 'DEFAULT'
+    industry = ov.get('Industry') or ''
+    bench = sector_benchmark(sector, industry)
+
+    price = parse(quote.get('05. price')) or \
+        (parse(ov.get('BookValue')) or 0) * (parse(ov.get('PriceToBookRatio')) or 0)
+    net_income = parse(ov.get('NetIncome')) or (parse(income[0].get('netIncome')) if income else 0)
+    unprofitable = net_income is not None and net_income < 0
+    bank = 'Financial' in sector or 'Bank' in sector
+
+    # Value
+    target = parse(ov.get('AnalystTargetPrice'))
+    discount = (target - price) / target if target and price else None
+    pe = parse(ov.get('TrailingPE')) or parse(ov.get('PERatio'))
+    pb = parse(ov.get('PriceToBookRatio'))
+    ps = parse(ov.get('PriceToSalesRatioTTM'))
+    peg = parse(ov.get('PEGRatio'))
+    if bank:
+        multiple, limit, strict = pb, bench['PB'], bench['PB'] * 0.8
+    elif unprofitable:
+        multiple, limit, strict = ps, bench['PS'], bench['PS'] * 0.7
+    else:
+        multiple, limit, strict = pe, bench['PE'], bench['PE'] * 0.8
+    value = [
+        discount is not None and discount >= 0.20,
+        discount is not None and discount >= 0.40,
+        _between(multiple, 0, limit),
+        _between(multiple, 0, strict),
+        (ps is not None and ps < 2) if unprofitable else (peg is not None and 0 < peg <= 1),
+        _between(pb, 0, 3),
+    ]
+
+    # Future
+    earnings_growth = parse(ov.get('QuarterlyEarningsGrowthYOY'))
+    revenue_growth = parse(ov.get('QuarterlyRevenueGrowthYOY'))
+    roe = parse(ov.get('ReturnOnEquityTTM'))
+    future = [
+        _gt(earnings_growth, SAVINGS_RATE + INFLATION),
+        _gt(earnings_growth, bench['GROWTH']),
+        _gt(revenue_growth, bench['GROWTH']),
+        _gt(earnings_growth, 0.20),
+        _gt(revenue_growth, 0.20),
+        _gt(roe, 0.20),
+    ]
+
+    # Past
+    eps = parse(ov.get('EPS')) or parse(ov.get('DilutedEPSTTM'))
+    past = [
+        _gt(eps, 0),
+        _gt(roe, 0.20),
+        _gt(roe, bench['ROE']),
+        _gt(parse(ov.get('ProfitMargin')), 0.10),
+        _gt(parse(ov.get('OperatingMarginTTM')), 0.15),
+        _gt(parse(ov.get('ReturnOnAssetsTTM')), 0.10),
+    ]
+
+    # Health
+    beta = parse(ov.get('Beta'))
+    latest = income[0] if income else {}
+    health = [
+        beta is not None and beta < 1.5,
+        _gt(beta, 0.5),
+        _between(parse(ov.get('EVToEBITDA')), 0, 20),
+        _between(parse(ov.get('EVToRevenue')), 0, 10),
+        _gt(parse(latest.get('grossProfit')), 0),
+        _gt(parse(latest.get('operatingIncome')), 0),
+    ]
+
+    # Dividend
+    dividend_yield = parse(ov.get('DividendYield'))
+    dividend_ps = parse(ov.get('DividendPerShare'))
+    payout = dividend_ps / eps if dividend_ps and eps and eps > 0 else None
+    dividend = [
+        _gt(dividend_yield, DIVIDEND_YIELD_25TH),
+        _gt(dividend_yield, DIVIDEND_YIELD_75TH),
+        _gt(dividend_ps, 0),
+        _between(payout, 0, 0.90),
+        _between(payout, 0, 0.70),
+        _gt(dividend_yield, 0),
+    ]
+
+    scores = {name: sum(checks) for name, checks in
+              (('value', value), ('future', future), ('past', past), ('health', health), ('dividend', dividend))}
+    scores['total'] = sum(scores.values())
+    return scores
+
+
+def screener_row(ticker, data):
+    """Typed `screener` row for one stock document."""
+    ov = data.get('overview') or {}
+    quote = (data.get('quote') or {}).get('Global Quote') or {}
+    scores = snowflake_scores(data)
+    return {
+        'ticker': ticker,
+        'name': ov.get('Name'),
+        'sector': ov.get('Sector') if ov.get('Sector') not in (None, 'N/A', 'None') else None,
+        'industry': ov.get('Industry') if ov.get('Industry') not in (None, 'N/A', 'None') else None,
+        'market': data.get('market'),
+        'currency': data.get('currency'),
+        'price': parse(quote.get('05. price')),
+        'market_cap': parse(ov.get('MarketCapitalization')),
+        'pe': parse(ov.get('TrailingPE')) or parse(ov.get('PERatio')),
+        'pb': parse(ov.get('PriceToBookRatio')),
+        'ps': parse(ov.get('PriceToSalesRatioTTM')),
+        'peg': parse(ov.get('PEGRatio')),
+        'eps': parse(ov.get('EPS')),
+        'roe': parse(ov.get('ReturnOnEquityTTM')),
+        'roa': parse(ov.get('ReturnOnAssetsTTM')),
+        'profit_margin': parse(ov.get('ProfitMargin')),
+        'operating_margin': parse(ov.get('OperatingMarginTTM')),
+        'revenue_growth': parse(ov.get('QuarterlyRevenueGrowthYOY')),
+        'earnings_growth': parse(ov.get('QuarterlyEarningsGrowthYOY')),
+        'dividend_yield': parse(ov.get('DividendYield')),
+        'beta': parse(ov.get('Beta')),
+        'score_value': scores['value'],
+        'score_future': scores['future'],
+        'score_past': scores['past'],
+        'score_health': scores['health'],
+        'score_dividend': scores['dividend'],
+        'score_total': scores['total'],
+        'updated_at': datetime.now().isoformat(),
+    }
+
+
+def _finite(row):
+    # JSON has no inf/NaN; store them as NULL
+    return {k: (None if isinstance(v, float) and (v != v or v in (float('inf'), float('-inf'))) else v)
+            for k, v in row.items()}
+
+
+def save_screener_rows(supabase, rows):
+    if rows:
+        supabase.table('screener').upsert([_finite(row) for row in rows], on_conflict='ticker').execute()
+    return len(rows)
+
+
+def rescore(supabase, tickers):
+    """Recompute screener rows for tickers already in stock_data, reading only
+    the fields the scores need (one select, one upsert)."""
+    if not tickers:
+        return 0
+    result = supabase.table('stock_data').select(SOURCE_SELECT).in_('ticker', list(tickers)).execute()
+    return save_screener_rows(supabase, [screener_row(row['ticker'], document_from_row(row))
+                                         for row in result.data or []])
@@ -0,0 +1,126 @@
+import { supabase, detectMarket, historyWatermark } from './_utils.js';
+
+// Upstream providers and their call budgets. Each is a token bucket kept in
+// `rate_buckets` (see take_tokens in supabase-schema.sql), so every route and
+// every concurrent invocation draws from the same quota; the per-minute
+// rates can be raised with the env vars on paid plans.
+export const PROVIDERS = {
+    alphavantage: { capacity: 5, perMinute: parseFloat(process.env.ALPHA_VANTAGE_CALLS_PER_MIN) || 5 },
+    yahoo: { capacity: 30, perMinute: parseFloat(process.env.YAHOO_CALLS_PER_MIN) || 60 },
+    fixer: { capacity: 5, perMinute: parseFloat(process.env.FIXER_CALLS_PER_MIN) || 30 }
+};
+
+// fetch-indian-stock makes seven Yahoo calls (info, four statements, monthly and daily history)
+export const YAHOO_CALLS_PER_TICKER = 7;
+
+const ALPHA_VANTAGE_KEY = process.env.ALPHA_VANTAGE_KEY;
+const ALPHA_VANTAGE_URL = 'https://www.alphavantage.co/query';
+
+// Alpha Vantage function per document section, in fetch order
+const US_SECTIONS = [
+    ['overview', 'OVERVIEW'],
+    ['quote', 'GLOBAL_QUOTE'],
+    ['income', 'INCOME_STATEMENT'],
+    ['balance_sheet', 'BALANCE_SHEET'],
+    ['cashflow', 'CASH_FLOW'],
+    ['history', 'TIME_SERIES_MONTHLY_ADJUSTED']
+];
+
+const delay = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Thrown when a provider's quota can't cover a call before the caller's
+// deadline. `partial` carries sections fetched so far so a queued job can
+// resume without spending those calls again.
+export class RateLimited extends Error {
+    constructor(provider, retryAfter, partial = null) {
+        super(`${provider} rate limit reached; retry in ${Math.ceil(retryAfter)}s`);
+        this.provider = provider;
+        this.retryAfter = retryAfter;
+        this.partial = partial;
+    }
+}
+
+// Take `count` tokens from a provider's bucket, waiting for the refill when
+// it fits before `deadline` (ms timestamp) and throwing RateLimited when not
+export async function acquire(provider, count = 1, deadline = Infinity) {
+    const { capacity, perMinute } = PROVIDERS[provider];
+    for (;;) {
+        const { data: wait, error } = await supabase.rpc('take_tokens', {
+            p_provider: provider,
+            p_count: count,
+            p_capacity: Math.max(capacity, count),
+            p_refill_per_sec: perMinute / 60
+        });
+        if (error) throw error;
+        if (!wait) return;
+        if (Date.now() + wait * 1000 > deadline) throw new RateLimited(provider, wait);
+        await delay(wait * 1000);
+    }
+}
+
+// Empty a bucket after the provider itself reports a rate limit, so other
+// callers back off instead of spending calls that will be refused
+export async function drain(provider) {
+    await supabase
+        .from('rate_buckets')
+        .update({ tokens: 0, updated_at: new Date().toISOString() })
+        .eq('provider', provider);
+}
+
+function alphaVantageLimited(response) {
+    const text = `${response.Note || ''} ${response.Information || ''}`.toLowerCase();
+    return text.includes('rate limit') || text.includes('call frequency') || text.includes('requests per');
+}
+
+// Fetch a US document from Alpha Vantage, one bucket token per call. With
+// `partial`, sections already fetched are reused.
+export async function fetchUSStock(ticker, { deadline = Infinity, partial = null } = {}) {
+    const sections = { ...(partial || {}) };
+    for (const [section, fn] of US_SECTIONS) {
+        if (sections[section]) continue;
+        try {
+            await acquire('alphavantage', 1, deadline);
+        } catch (err) {
+            if (err instanceof RateLimited) err.partial = sections;
+            throw err;
+        }
+        const response = await fetch(`${ALPHA_VANTAGE_URL}?function=${fn}&symbol=${ticker}&apikey=${ALPHA_VANTAGE_KEY}`)
+            .then(r => r.json());
+        if (alphaVantageLimited(response)) {
+            await drain('alphavantage');
+            throw new RateLimited('alphavantage', 60, sections);
+        }
+        sections[section] = response;
+    }
+
+    const { overview, quote, income, balance_sheet, cashflow, history } = sections;
+    return {
+        overview: overview.Information ? {} : overview,
+        quote,
+        income: income.Information ? { annualReports: [] } : income,
+        balance_sheet: balance_sheet.Information ? { annualReports: [] } : balance_sheet,
+        cashflow: cashflow.Information ? { annualReports: [] } : cashflow,
+        history: history.Information ? { 'Monthly Adjusted Time Series': {} } : history,
+        market: 'US',
+        currency: 'USD',
+        last_updated: new Date().toISOString()
+    };
+}
+
+// Fetch an Indian document through the Python yfinance route. Only the
+// history tail after the last stored bar is downloaded.
+export async function fetchIndianStock(ticker, origin, { deadline = Infinity } = {}) {
+    await acquire('yahoo', YAHOO_CALLS_PER_TICKER, deadline);
+    const since = await historyWatermark(ticker);
+    const sinceParam = since ? `&since=${since}` : '';
+    const res = await fetch(`${origin}/api/fetch-indian-stock?ticker=${ticker}${sinceParam}`);
+    if (!res.ok) {
+        const err = await res.json().catch(() => ({}));
+        throw new Error(err.error || `Failed to fetch ${ticker}`);
+    }
+    return res.json();
+}
+
+export function providerFor(ticker) {
+    return detectMarket(ticker) === 'IN' ? 'yahoo' : 'alphavantage';
+}
@@ -46,3 +46,109 @@ export function detectMarket(ticker) {
     }
     return 'US';
 }
+
+// Stored history point key -> price_history column
+const POINT_COLUMNS = {
+    '1. open': 'o',
+    '2. high': 'h',
+    '3. low': 'l',
+    '4. close': 'c',
+    '5. adjusted close': 'adj_c',
+    '6. volume': 'v',
+    '7. dividend amount': 'div'
+};
+
+// Convert a {date: {'1. open': '...'}} history map into price_history rows
+export function historyRows(ticker, points, interval = '1mo') {
+    return Object.entries(points || {}).map(([date, point]) => {
+        const row = { ticker, date, interval };
+        for (const [key, column] of Object.entries(POINT_COLUMNS)) {
+            const num = parseFloat(point[key]);
+            row[column] = Number.isFinite(num) ? num : null;
+        }
+        if (row.v !== null) row.v = Math.round(row.v);
+        return row;
+    });
+}
+
+// Write a freshly fetched monthly series into price_history. With `from`, the
+// series is only the tail from that date and replaces the stored bars from it on.
+export async function storePriceHistory(ticker, history, interval = '1mo', from = null) {
+    const rows = historyRows(ticker, history?.['Monthly Adjusted Time Series'], interval);
+    if (from) {
+        const { error } = await supabase
+            .from('price_history')
+            .delete()
+            .eq('ticker', ticker)
+            .eq('interval', interval)
+            .gte('date', from);
+        if (error) throw error;
+    }
+    for (let i = 0; i < rows.length; i += 500) {
+        const { error } = await supabase
+            .from('price_history')
+            .upsert(rows.slice(i, i + 500), { onConflict: 'ticker,interval,date' });
+        if (error) throw error;
+    }
+    return rows.length;
+}
+
+// Latest stored monthly bar, passed to fetch-indian-stock as `since` so it
+// only downloads the history tail
+export async function historyWatermark(ticker) {
+    const { data } = await supabase
+        .from('price_history')
+        .select('date')
+        .eq('ticker', ticker)
+        .eq('interval', '1mo')
+        .order('date', { ascending: false })
+        .limit(1)
+        .maybeSingle();
+    return data?.date || null;
+}
+
+// Store a fetched document and its price history. An incremental history
+// tail (history_from set by fetch-indian-stock) is merged into the stored
+// series server-side instead of replacing it. The fetch's transport fields
+// (timings, section status, history_from) are not stored.
+export async function storeStockData(ticker, stockData) {
+    const { timings_ms, fetch_status, history_from, ...data } = stockData;
+    if (history_from) {
+        const { error } = await supabase.rpc('store_stock_data', {
+            p_ticker: ticker,
+            p_data: data,
+            p_history_from: history_from
+        });
+        if (error) throw error;
+    } else {
+        const { error } = await supabase
+            .from('stock_data')
+            .upsert(
+                { ticker, data, last_updated: new Date().toISOString() },
+                { onConflict: 'ticker' }
+            );
+        if (error) throw error;
+    }
+    await storePriceHistory(ticker, data.history, '1mo', history_from);
+}
+
+// fetch-indian-stock returns sections whose Yahoo calls failed or timed out
+// empty (see fetch_status); fill those from the stored document so a refresh
+// never replaces good statements with nothing
+export async function keepStoredSections(ticker, stockData) {
+    const failed = Object.entries(stockData.fetch_status || {})
+        .filter(([, status]) => status !== 'ok')
+        .map(([section]) => section);
+    if (failed.length === 0) return stockData;
+
+    const { data: existing } = await supabase
+        .from('stock_data')
+        .select(failed.map(section => `${section}:data->${section}`).join(', '))
+        .eq('ticker', ticker)
+        .maybeSingle();
+
+    for (const section of failed) {
+        if (existing?.[section]) stockData[section] = existing[section];
+    }
+    return stockData;
+}
@@ -0,0 +1,170 @@
+"""
+Vectorized DCF and P/E projection engine.
+
+The browser's `calculateDCF` / `calculateProjections` value one set of
+inputs per slider move. Here every input is a NumPy array, so a whole
+sensitivity grid (growth x discount x terminal growth x years) or a batch of
+Monte Carlo draws is one broadcast expression. Rates are decimals (0.10 for
+10%); the route converts from the percentages the UI uses.
+
+The DCF matches `calculateDCF`: FCF compounds at `growth` for `years`, each
+year is discounted at `discount`, and a Gordon terminal value is added at
+the end. Inputs where discount <= terminal growth come back as NaN.
+"""
+import hashlib
+import json
+
+import numpy as np
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# PostgREST select for everything the engine reads from a stored document
+INPUT_SELECT = (
+    'ticker, last_updated, '
+    'fcf:data->overview->>freeCashflow, fcf_alt:data->overview->>FreeCashflow, '
+    'operating_cf:data->cashflow->annualReports->0->>operatingCashflow, '
+    'capex:data->cashflow->annualReports->0->>capitalExpenditures, '
+    'ov_operating_cf:data->overview->>operatingCashflow, ov_operating_cf_alt:data->overview->>OperatingCashflow, '
+    'shares:data->overview->>SharesOutstanding, '
+    'quote:data->quote, ov_price:data->overview->>currentPrice, '
+    'pat:data->income->annualReports->0->>netIncome'
+)
+
+
+def _num(val):
+    """parseFloat semantics: anything unparseable (None, 'N/A') is 0."""
+    try:
+        num = float(val)
+    except (TypeError, ValueError):
+        return 0.0
+    return num if np.isfinite(num) else 0.0
+
+
+def valuation_inputs(row):
+    """Base FCF, shares, price and PAT from an INPUT_SELECT row, with the
+    same FCF fallbacks as `calculateDCF`."""
+    fcf, source = _num(row.get('fcf')) or _num(row.get('fcf_alt')), 'overview.freeCashflow'
+    if fcf == 0:
+        fcf, source = _num(row.get('operating_cf')) - abs(_num(row.get('capex'))), 'cashflow'
+    if fcf == 0:
+        fcf = _num(row.get('ov_operating_cf')) or _num(row.get('ov_operating_cf_alt'))
+        source = 'overview.operatingCashflow'
+    quote = (row.get('quote') or {}).get('Global Quote') or {}
+    return {
+        'fcf': fcf,
+        'fcf_source': source if fcf else None,
+        'shares': _num(row.get('shares')),
+        'price': _num(quote.get('05. price')) or _num(row.get('ov_price')),
+        'pat': _num(row.get('pat')),
+    }
+
+
+def intrinsic_value(fcf, shares, growth, discount, terminal, years):
+    """DCF value per share; arguments broadcast against each other.
+
+    Sum of discounted FCFs is the geometric series sum(q^i, i=1..n) with
+    q = (1 + g) / (1 + r), so no per-year loop is needed.
+    """
+    growth, discount, terminal, years = np.broadcast_arrays(
+        *(np.asarray(a, dtype=float) for a in (growth, discount, terminal, years)))
+    q = (1 + growth) / (1 + discount)
+    q_n = q ** years
+    near_one = np.isclose(q, 1.0)
+    series = np.where(near_one, years, q * (1 - q_n) / np.where(near_one, 1.0, 1 - q))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terminal_value = q_n * (1 + terminal) / (discount - terminal)
+        value = fcf * (series + terminal_value) / shares
+    return np.where(discount > terminal, value, np.nan)
+
+
+def dcf_grid(inputs, growth, discount, terminal, years):
+    """Intrinsic value for every combination, shaped
+    (len(growth), len(discount), len(terminal), len(years))."""
+    return intrinsic_value(
+        inputs['fcf'], inputs['shares'],
+        np.asarray(growth)[:, None, None, None],
+        np.asarray(discount)[None, :, None, None],
+        np.asarray(terminal)[None, None, :, None],
+        np.asarray(years)[None, None, None, :],
+    )
+
+
+def monte_carlo(inputs, draws, growth, discount, terminal, years, seed=None):
+    """Percentile bands of intrinsic value over normally distributed inputs.
+
+    `growth`, `discount` and `terminal` are (mean, sd) pairs. Draws where the
+    discount rate doesn't exceed terminal growth are discarded.
+    """
+    rng = np.random.default_rng(seed)
+    values = intrinsic_value(
+        inputs['fcf'], inputs['shares'],
+        rng.normal(*growth, draws), rng.normal(*discount, draws), rng.normal(*terminal, draws), years,
+    )
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return {'draws': draws, 'valid': 0}
+    bands = np.percentile(values, PERCENTILES)
+    result = {
+        'draws': draws,
+        'valid': int(values.size),
+        'mean': float(values.mean()),
+        'percentiles': {f'p{p}': float(v) for p, v in zip(PERCENTILES, bands)},
+    }
+    if inputs['price'] > 0:
+        result['prob_above_price'] = float((values > inputs['price']).mean())
+    return result
+
+
+def projection_grid(inputs, pat_growth, exit_pe, years):
+    """Projected share price for P/E scenarios, shaped
+    (len(pat_growth), len(exit_pe), len(years)).
+
+    PAT evolves like `calculateProjections`: profits compound, while a loss
+    shrinks by |PAT| * growth each year (and can swing to profit).
+    """
+    growth = np.asarray(pat_growth, dtype=float)
+    pat = np.full(growth.shape, inputs['pat'])
+    by_year = {}
+    for year in range(1, int(max(years)) + 1):
+        pat = np.where(pat < 0, pat + np.abs(pat) * growth, pat * (1 + growth))
+        by_year[year] = pat
+    pats = np.stack([by_year[int(n)] for n in years], axis=-1)  # (growth, years)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pats[:, None, :] * np.asarray(exit_pe, dtype=float)[None, :, None] / inputs['shares']
+
+
+def to_json(array):
+    """Nested lists with NaN/inf as None."""
+    return np.where(np.isfinite(array), array, None).tolist()
+
+
+def input_hash(inputs, params):
+    """Cache key over the base inputs and every request parameter."""
+    payload = json.dumps({'inputs': inputs, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def value_ticker(inputs, params):
+    """Full valuation result for one ticker; `params` as built by the route."""
+    result = {'inputs': inputs}
+    if inputs['fcf'] > 0 and inputs['shares'] > 0:
+        axes = params['dcf']
+        result['dcf'] = {
+            'axes': axes,
+            'intrinsic': to_json(dcf_grid(inputs, axes['growth'], axes['discount'], axes['terminal'], axes['years'])),
+        }
+        mc = params['monte_carlo']
+        if mc['draws']:
+            result['monte_carlo'] = monte_carlo(
+                inputs, mc['draws'], mc['growth'], mc['discount'], mc['terminal'], mc['years'], mc['seed'])
+    else:
+        result['dcf'] = {'error': 'Negative or zero FCF - DCF not applicable'
+                         if inputs['fcf'] <= 0 else 'Shares outstanding not available'}
+
+    if inputs['shares'] > 0 and inputs['pat']:
+        axes = params['projection']
+        result['projection'] = {
+            'axes': axes,
+            'price': to_json(projection_grid(inputs, axes['pat_growth'], axes['exit_pe'], axes['years'])),
+        }
+    return result
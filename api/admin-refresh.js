@@ -1,11 +1,19 @@
 import { supabase, jsonResponse, corsHeaders, verifyAdmin, detectMarket } from './_utils.js';
+import { enqueueRefresh, PRIORITY } from './_queue.js';
+import { closedSince } from './_calendar.js';
 
 export const config = { runtime: 'edge' };
 
-const ALPHA_VANTAGE_KEY = process.env.ALPHA_VANTAGE_KEY;
-const delay = (ms) => new Promise(resolve => setTimeout(resolve, ms));
-
-export default async function handler(request) {
+/**
+ * Admin refresh
+ *
+ * POST /api/admin-refresh { tickers: [...], type: 'smart' | 'full' }
+ *   - Queues the tickers as one batch and starts a queue worker;
+ *     /api/status reports progress
+ *   - smart skips tickers fetched since their market's last close (weekends
+ *     and exchange holidays included; see _calendar.js)
+ */
+export default async function handler(request, context) {
     if (request.method === 'OPTIONS') {
         return new Response(null, { status: 204, headers: corsHeaders });
     }
@@ -21,7 +29,7 @@ export default async function handler(request) {
 
     try {
         const body = await request.json();
-        const tickers = body.tickers || [];
+        const tickers = (body.tickers || []).map(t => t.toUpperCase().trim()).filter(Boolean);
         const refreshType = body.type || 'smart';
 
         if (!tickers.length) {
@@ -29,89 +37,49 @@ export default async function handler(request) {
         }
 
         const results = [];
-
-        for (const ticker of tickers) {
-            try {
-                // For smart refresh, check if already updated today
-                if (refreshType === 'smart') {
-                    const { data: existing } = await supabase
-                        .from('stock_data')
-                        .select('last_updated')
-                        .eq('ticker', ticker.toUpperCase())
-                        .single();
-
-                    if (existing) {
-                        const lastUpdated = new Date(existing.last_updated);
-                        const today = new Date();
-                        today.setHours(0, 0, 0, 0);
-
-                        if (lastUpdated >= today) {
-                            results.push({ ticker, status: 'skipped', reason: 'Already up to date' });
-                            continue;
-                        }
-                    }
-                }
-
-                const market = detectMarket(ticker);
-                let stockData;
-
-                if (market === 'IN') {
-                    // Call Python function - use request URL origin
-                    const url = new URL(request.url);
-                    const baseUrl = url.origin;
-                    const res = await fetch(`${baseUrl}/api/fetch-indian-stock?ticker=${ticker}`);
-                    if (!res.ok) {
-                        const errData = await res.json().catch(() => ({}));
-                        throw new Error(errData.error || 'Python function failed');
-                    }
-                    stockData = await res.json();
-                } else {
-                    stockData = await fetchUSStock(ticker);
+        let pending = tickers;
+
+        // For smart refresh, skip tickers with no session closed since their last fetch
+        // (one query for the batch)
+        if (refreshType === 'smart') {
+            const { data: existing, error } = await supabase
+                .from('stock_data')
+                .select('ticker, last_updated')
+                .in('ticker', tickers);
+            if (error) throw error;
+
+            const now = new Date();
+            const fresh = new Set((existing || [])
+                .filter(row => !closedSince(detectMarket(row.ticker), row.last_updated, now))
+                .map(row => row.ticker));
+
+            pending = tickers.filter(ticker => !fresh.has(ticker));
+            for (const ticker of tickers) {
+                if (fresh.has(ticker)) {
+                    results.push({ ticker, status: 'skipped', reason: 'No session has closed since the last fetch' });
                 }
+            }
+        }
 
-                await supabase
-                    .from('stock_data')
-                    .upsert(
-                        { ticker: ticker.toUpperCase(), data: stockData, last_updated: new Date().toISOString() },
-                        { onConflict: 'ticker' }
-                    );
+        const batchId = `admin:${new Date().toISOString()}`;
+        const jobs = await enqueueRefresh(pending, { priority: PRIORITY.admin, batchId });
+        for (const job of jobs) {
+            results.push({ ticker: job.ticker, status: 'queued', job_id: job.id });
+        }
 
-                results.push({ ticker, status: 'success' });
-            } catch (err) {
-                results.push({ ticker, status: 'error', error: err.message });
-            }
+        // Start working the queue now instead of waiting for the next cron tick
+        if (jobs.length && context?.waitUntil) {
+            context.waitUntil(fetch(`${new URL(request.url).origin}/api/process-queue`).catch(() => {}));
         }
 
-        return jsonResponse({ success: true, results });
+        return jsonResponse({
+            success: true,
+            batch_id: batchId,
+            queued: jobs.length,
+            skipped: tickers.length - pending.length,
+            results
+        });
     } catch (error) {
         return jsonResponse({ error: error.message }, 500);
     }
 }
-
-async function fetchUSStock(ticker) {
-    const baseUrl = 'https://www.alphavantage.co/query';
-
-    const overview = await fetch(`${baseUrl}?function=OVERVIEW&symbol=${ticker}&apikey=${ALPHA_VANTAGE_KEY}`).then(r => r.json());
-    await delay(1500);
-    const quote = await fetch(`${baseUrl}?function=GLOBAL_QUOTE&symbol=${ticker}&apikey=${ALPHA_VANTAGE_KEY}`).then(r => r.json());
-    await delay(1500);
-    const income = await fetch(`${baseUrl}?function=INCOME_STATEMENT&symbol=${ticker}&apikey=${ALPHA_VANTAGE_KEY}`).then(r => r.json());
-    await delay(1500);
-    const balance_sheet = await fetch(`${baseUrl}?function=BALANCE_SHEET&symbol=${ticker}&apikey=${ALPHA_VANTAGE_KEY}`).then(r => r.json());
-    await delay(1500);
-    const cashflow = await fetch(`${baseUrl}?function=CASH_FLOW&symbol=${ticker}&apikey=${ALPHA_VANTAGE_KEY}`).then(r => r.json());
-    await delay(1500);
-    const history = await fetch(`${baseUrl}?function=TIME_SERIES_MONTHLY_ADJUSTED&symbol=${ticker}&apikey=${ALPHA_VANTAGE_KEY}`).then(r => r.json());
-
-    return {
-        overview: overview.Information ? {} : overview,
-        quote,
-        income: income.Information ? { annualReports: [] } : income,
-        balance_sheet: balance_sheet.Information ? { annualReports: [] } : balance_sheet,
-        cashflow: cashflow.Information ? { annualReports: [] } : cashflow,
-        history: history.Information ? { 'Monthly Adjusted Time Series': {} } : history,
-        market: 'US',
-        currency: 'USD',
-        last_updated: new Date().toISOString()
-    };
-}
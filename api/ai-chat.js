@@ -1,9 +1,11 @@
-import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+import { jsonResponse, corsHeaders } from './_utils.js';
 import { GoogleGenAI } from '@google/genai';
+import { loadContext, responseCacheKey, cachedResponse, storeResponse } from './_ai_context.js';
 
 export const config = { runtime: 'edge' };
 
 const ai = new GoogleGenAI({ apiKey: process.env.GEMINI_API_KEY });
+const MODEL = 'gemini-3.1-flash-lite';
 
 const AI_SYSTEM_PROMPT = `You are a stock analysis assistant for a financial dashboard. Your job is to:
 1. Answer questions about the company - use your general knowledge for industry info, competitors, business model, history, etc.
@@ -51,7 +53,7 @@ Keywords that indicate year-by-year: "year by year", "yearly", "complex", "detai
 
 For general questions, respond in markdown format with clear sections.`;
 
-export default async function handler(request) {
+export default async function handler(request, context) {
     if (request.method === 'OPTIONS') {
         return new Response(null, { status: 204, headers: corsHeaders });
     }
@@ -70,51 +72,22 @@ export default async function handler(request) {
             return jsonResponse({ error: 'Ticker and question required' }, 400);
         }
 
-        // Get stock data for context
-        const { data: stockRecord } = await supabase
-            .from('stock_data')
-            .select('data')
-            .eq('ticker', ticker)
-            .single();
-
-        let stockContext = 'No stock data available.';
-        if (stockRecord?.data) {
-            const d = stockRecord.data;
-            const ov = d.overview || {};
-            const quote = d.quote?.['Global Quote'] || {};
-
-            // Helper to format decimal as percentage
-            const toPercent = (val) => {
-                if (!val || val === 'None') return 'N/A';
-                const num = parseFloat(val);
-                if (isNaN(num)) return 'N/A';
-                return `${(num * 100).toFixed(1)}%`;
-            };
-
-            stockContext = `
-STOCK DATA FOR ${ticker}:
-- Company: ${ov.Name || 'N/A'}
-- Sector: ${ov.Sector || 'N/A'}
-- Industry: ${ov.Industry || 'N/A'}
-- Current Price: ${quote['05. price'] || 'N/A'}
-- Trailing PE: ${ov.TrailingPE || ov.PERatio || 'N/A'}
-- Forward PE: ${ov.ForwardPE || 'N/A'}
-- PEG Ratio: ${ov.PEGRatio || 'N/A'}
-- Market Cap: ${ov.MarketCapitalization || 'N/A'}
-- Revenue TTM: ${ov.RevenueTTM || 'N/A'}
-- EPS: ${ov.EPS || 'N/A'}
-- EPS Growth (YoY): ${toPercent(ov.QuarterlyEarningsGrowthYOY)}
-- Revenue Growth (YoY): ${toPercent(ov.QuarterlyRevenueGrowthYOY)}
-- Profit Margin: ${toPercent(ov.ProfitMargin)}
-- ROE: ${toPercent(ov.ReturnOnEquityTTM)}
-- 52W High: ${ov['52WeekHigh'] || 'N/A'}
-- 52W Low: ${ov['52WeekLow'] || 'N/A'}
-- Analyst Target: ${ov.AnalystTargetPrice || 'N/A'}
+        // Compact context card (no document read); identical turns are served from the cache
+        const [stock] = await loadContext([ticker]);
+        const cacheKey = await responseCacheKey('ai-chat', MODEL, stock ? [stock] : [], question);
+        const cached = await cachedResponse(cacheKey);
+        if (cached) {
+            return jsonResponse({ ...cached, cached: true });
+        }
+
+        const stockContext = stock
+            ? `
+${stock.card}
 
 
 USE THESE METRICS to suggest appropriate projections. If current PE is 80+, target PE should reflect this (e.g., 60-100 range). If PE is 15, target PE should be in 12-25 range.
-`;
-        }
+`
+            : 'No stock data available.';
 
         const prompt = `${AI_SYSTEM_PROMPT}
 
@@ -124,7 +97,7 @@ USER QUESTION: ${question}`;
 
         // Use the new @google/genai SDK with gemini-3.1-flash-lite model
         const response = await ai.models.generateContent({
-            model: 'gemini-3.1-flash-lite',
+            model: MODEL,
             contents: prompt
         });
 
@@ -143,10 +116,12 @@ USER QUESTION: ${question}`;
             // Not JSON, that's fine
         }
 
-        return jsonResponse({
+        const result = {
             response: responseText,
             projections: projections?.projections || null
-        });
+        };
+        if (responseText) storeResponse(cacheKey, result, context);
+        return jsonResponse({ ...result, cached: false });
     } catch (error) {
         console.error('AI chat error:', error);
         return jsonResponse({ error: `AI error: ${error.message}` }, 500);
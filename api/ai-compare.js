@@ -1,11 +1,13 @@
-import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+import { jsonResponse, corsHeaders } from './_utils.js';
 import { GoogleGenAI } from '@google/genai';
+import { loadContext, responseCacheKey, cachedResponse, storeResponse } from './_ai_context.js';
 
 export const config = { runtime: 'edge' };
 
 const ai = new GoogleGenAI({ apiKey: process.env.GEMINI_API_KEY });
+const MODEL = 'gemini-3.1-flash-lite';
 
-export default async function handler(request) {
+export default async function handler(request, context) {
     if (request.method === 'OPTIONS') {
         return new Response(null, { status: 204, headers: corsHeaders });
     }
@@ -16,48 +18,28 @@ export default async function handler(request) {
 
     try {
         const body = await request.json();
-        const tickers = body.tickers || [];
+        const tickers = [...new Set((body.tickers || []).map(t => String(t).toUpperCase().trim()).filter(Boolean))];
         const question = body.question || 'Which stock should I invest in?';
 
-        if (!tickers || tickers.length < 2) {
+        if (tickers.length < 2) {
             return jsonResponse({ error: 'At least 2 tickers required' }, 400);
         }
 
-        // Get stock data for all tickers
-        const { data: stockRecords } = await supabase
-            .from('stock_data')
-            .select('ticker, data')
-            .in('ticker', tickers);
+        // Compact context cards (no document reads); identical comparisons are served from the cache
+        const stocks = await loadContext(tickers);
 
-        if (!stockRecords || stockRecords.length < 2) {
+        if (stocks.length < 2) {
             return jsonResponse({ error: 'Could not fetch data for comparison' }, 404);
         }
 
-        // Build comparison context
-        let stocksContext = 'STOCKS TO COMPARE:\n\n';
-        for (const record of stockRecords) {
-            const d = record.data;
-            const ov = d?.overview || {};
-            const quote = d?.quote?.['Global Quote'] || {};
-
-            stocksContext += `--- ${record.ticker} ---
-Company: ${ov.Name || 'N/A'}
-Sector: ${ov.Sector || 'N/A'}
-Industry: ${ov.Industry || 'N/A'}
-Current Price: ${quote['05. price'] || 'N/A'}
-PE Ratio: ${ov.PERatio || ov.TrailingPE || 'N/A'}
-Forward PE: ${ov.ForwardPE || 'N/A'}
-Market Cap: ${ov.MarketCapitalization || 'N/A'}
-Revenue TTM: ${ov.RevenueTTM || 'N/A'}
-EPS: ${ov.EPS || 'N/A'}
-Profit Margin: ${ov.ProfitMargin || 'N/A'}
-Revenue Growth: ${ov.QuarterlyRevenueGrowthYOY || 'N/A'}
-52W High: ${ov['52WeekHigh'] || 'N/A'}
-52W Low: ${ov['52WeekLow'] || 'N/A'}
-
-`;
+        const cacheKey = await responseCacheKey('ai-compare', MODEL, stocks, question);
+        const cached = await cachedResponse(cacheKey);
+        if (cached) {
+            return jsonResponse({ ...cached, cached: true });
         }
 
+        const stocksContext = `STOCKS TO COMPARE:\n\n${stocks.map(s => s.card).join('\n\n')}\n`;
+
         const prompt = `You are a stock analysis assistant helping compare multiple stocks.
 
 ${stocksContext}
@@ -68,16 +50,18 @@ Provide a detailed comparison addressing the user's question. Use markdown forma
 
         // Use the new @google/genai SDK with gemini-3.1-flash-lite model
         const response = await ai.models.generateContent({
-            model: 'gemini-3.1-flash-lite',
+            model: MODEL,
             contents: prompt
         });
 
         let responseText = response.text || '';
 
-        return jsonResponse({
+        const result = {
             response: responseText,
             tickers: tickers
-        });
+        };
+        if (responseText) storeResponse(cacheKey, result, context);
+        return jsonResponse({ ...result, cached: false });
     } catch (error) {
         console.error('AI compare error:', error);
         return jsonResponse({ error: `AI error: ${error.message}` }, 500);
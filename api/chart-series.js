@@ -0,0 +1,141 @@
+import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+import { lttb } from './_downsample.js';
+
+export const config = { runtime: 'edge' };
+
+const PAGE_SIZE = 1000;
+const DEFAULT_WIDTH = 800;
+const MIN_WIDTH = 50;
+const MAX_WIDTH = 4000;
+// Finest interval whose bar count stays within this many per pixel
+const OVERSAMPLE = 4;
+const MAX_YEARS = 30;
+// Bars per calendar day, finest first; coarser ones fill in before the finer series starts
+const INTERVALS = [['1d', 252 / 365], ['1wk', 1 / 7], ['1mo', 12 / 365]];
+// A finer series starting this close to the range start needs no fill-in
+const GAP_DAYS = 10;
+const RANGE_MONTHS = { '1M': 1, '6M': 6, '1Y': 12, '3Y': 36, '5Y': 60 };
+const COLUMNS = { adj_close: 'adj_c', close: 'c' };
+const DAY_MS = 86400000;
+
+/**
+ * Chart Series API
+ *
+ * GET /api/chart-series?ticker=TCS.NS&range=5Y&width=800
+ *   - A price series sized for a chart `width` pixels wide:
+ *     { ticker, range, interval, count, source_count, dates: [...], adj_close: [...] }
+ *   - range: 1M, 6M, YTD, 1Y, 3Y, 5Y or MAX (default); or from/to dates
+ *   - Reads the finest stored interval (daily, then the weekly rollups, then
+ *     monthly) that keeps the range within OVERSAMPLE bars per pixel, fills
+ *     in coarser bars before the finer series starts, and downsamples to
+ *     `width` points with Largest-Triangle-Three-Buckets
+ *   - field=close returns unadjusted closes instead
+ *   - Cached at the edge for a few minutes; bars only change on refresh
+ */
+export default async function handler(request) {
+    if (request.method === 'OPTIONS') {
+        return new Response(null, { status: 204, headers: corsHeaders });
+    }
+
+    if (request.method !== 'GET') {
+        return jsonResponse({ error: 'Method not allowed' }, 405);
+    }
+
+    const url = new URL(request.url);
+    const ticker = (url.searchParams.get('ticker') || '').toUpperCase().trim();
+    const range = (url.searchParams.get('range') || 'MAX').toUpperCase();
+    const field = COLUMNS[url.searchParams.get('field')] ? url.searchParams.get('field') : 'adj_close';
+    const width = Math.min(Math.max(parseInt(url.searchParams.get('width')) || DEFAULT_WIDTH, MIN_WIDTH), MAX_WIDTH);
+
+    if (!ticker) {
+        return jsonResponse({ error: 'Ticker parameter required' }, 400);
+    }
+
+    const now = new Date();
+    const from = url.searchParams.get('from') || rangeStart(range, now);
+    const to = url.searchParams.get('to') || null;
+    if (from === undefined) {
+        return jsonResponse({ error: `Unknown range ${range}` }, 400);
+    }
+
+    try {
+        const spanDays = ((to ? Date.parse(to) : now.getTime()) -
+            (from ? Date.parse(from) : now.getTime() - MAX_YEARS * 365 * DAY_MS)) / DAY_MS;
+        const start = Math.max(INTERVALS.findIndex(([, perDay]) => spanDays * perDay <= width * OVERSAMPLE), 0);
+        const interval = INTERVALS[start][0];
+
+        // Finest first; each coarser interval only fills in before the previous one's first bar
+        let rows = [];
+        let before = to ? nextDay(to) : null;
+        for (const [name] of INTERVALS.slice(start)) {
+            const part = await selectRange(ticker, name, from, before);
+            rows = part.concat(rows);
+            if (rows.length && from && Date.parse(rows[0].date) - Date.parse(from) <= GAP_DAYS * DAY_MS) break;
+            if (rows.length) before = rows[0].date;
+        }
+
+        const dates = [], values = [];
+        for (const row of rows) {
+            const value = field === 'adj_close' ? row.adj_c ?? row.c : row.c;
+            if (value === null || value === undefined) continue;
+            dates.push(row.date);
+            values.push(value);
+        }
+        const keep = lttb(dates.map(d => Date.parse(d)), values, width);
+
+        return new Response(JSON.stringify({
+            ticker,
+            range: url.searchParams.get('from') ? null : range,
+            interval,
+            count: keep.length,
+            source_count: dates.length,
+            dates: keep.map(i => dates[i]),
+            [field]: keep.map(i => values[i])
+        }), {
+            status: 200,
+            headers: {
+                'Content-Type': 'application/json',
+                'Cache-Control': 'public, s-maxage=300, stale-while-revalidate=3600',
+                ...corsHeaders
+            }
+        });
+    } catch (error) {
+        console.error('Chart series error:', error);
+        return jsonResponse({ error: error.message }, 500);
+    }
+}
+
+// First date of a named range (null for MAX, undefined when unknown)
+function rangeStart(range, now) {
+    if (range === 'MAX') return null;
+    if (range === 'YTD') return `${now.getUTCFullYear()}-01-01`;
+    const months = RANGE_MONTHS[range];
+    if (!months) return undefined;
+    const start = new Date(Date.UTC(now.getUTCFullYear(), now.getUTCMonth() - months, now.getUTCDate()));
+    return start.toISOString().slice(0, 10);
+}
+
+function nextDay(date) {
+    return new Date(Date.parse(date) + DAY_MS).toISOString().slice(0, 10);
+}
+
+// Bars in [from, before), paged past the 1000-row select cap
+async function selectRange(ticker, interval, from, before) {
+    const rows = [];
+    for (let start = 0; ; start += PAGE_SIZE) {
+        let query = supabase
+            .from('price_history')
+            .select('date, c, adj_c')
+            .eq('ticker', ticker)
+            .eq('interval', interval)
+            .order('date', { ascending: true })
+            .range(start, start + PAGE_SIZE - 1);
+        if (from) query = query.gte('date', from);
+        if (before) query = query.lt('date', before);
+
+        const { data, error } = await query;
+        if (error) throw error;
+        rows.push(...data);
+        if (data.length < PAGE_SIZE) return rows;
+    }
+}
@@ -1,14 +1,64 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import sys
 from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _refresh import run_refresh, DEFAULT_CHUNK_SIZE, DEFAULT_MAX_WORKERS
+from _patch import write_patches
+from _history import history_rows, append_bars, rollup_weekly
+from _checkpoint import shard_key, list_tickers, pending_tickers, load_checkpoint, save_checkpoint
+from _fx import refresh_rate
+from _screener import rescore
+from _ai_context import refresh_cards
+from _gate import load_refresh_state, due_tickers, changed_patches, record_checks
+from _metrics import RequestMetrics
+
+# Per-invocation limits. The budget is only checked between chunks, so it
+# leaves room under the function's maxDuration (60s in vercel.json) for one
+# more chunk plus the writes and checkpoint after it
+DEFAULT_LIMIT = 300
+DEFAULT_BUDGET_S = 40
+
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
-        """Daily refresh endpoint - updates prices and chart data for all stocks."""
+        """Daily refresh endpoint - updates prices and chart data for all stocks.
+
+        Work is split into shards (`?shard=0&shards=2`) and checkpointed per
+        shard, so repeated invocations continue the day's run where the last
+        one stopped. `?cursor=TICKER` overrides the stored position and
+        `?reset=1` starts a fresh run.
+
+        Tickers whose market hasn't had a session since they were last
+        checked are skipped without an upstream call, and fetched quotes that
+        match the last written ones aren't written (see _gate.py); `?force=1`
+        fetches and writes everything.
+        """
+        self.metrics = RequestMetrics('daily-refresh')
         try:
-            import yfinance as yf
-            from supabase import create_client
+            with self.metrics.phase('import'):
+                import yfinance as yf
+                from supabase import create_client
+                from _indicators import update_indicators, refresh_benchmarks, closes_from_points, BENCHMARKS
+
+            query = parse_qs(urlparse(self.path).query)
+            chunk_size = int(query.get('chunk_size', [DEFAULT_CHUNK_SIZE])[0])
+            max_workers = int(query.get('workers', [DEFAULT_MAX_WORKERS])[0])
+            shard = int(query.get('shard', [0])[0])
+            shards = int(query.get('shards', [1])[0])
+            limit = int(query.get('limit', [DEFAULT_LIMIT])[0])
+            budget_s = float(query.get('budget', [DEFAULT_BUDGET_S])[0])
+            reset = query.get('reset', ['0'])[0] in ('1', 'true')
+            force = query.get('force', ['0'])[0] in ('1', 'true')
+
+            if shards < 1 or not 0 <= shard < shards:
+                return self.send_json({'error': 'shard must be between 0 and shards - 1'}, 400)
+            for name, value in (('chunk_size', chunk_size), ('workers', max_workers), ('limit', limit)):
+                if value < 1:
+                    return self.send_json({'error': f'{name} must be at least 1'}, 400)
             
             # Initialize Supabase inside handler
             supabase_url = os.environ.get('SUPABASE_URL', '')
@@ -18,91 +68,143 @@ class handler(BaseHTTPRequestHandler):
                 return self.send_json({'error': 'Supabase credentials not configured'}, 500)
             
             supabase = create_client(supabase_url, supabase_key)
-            
-            # Get all tickers from database
-            result = supabase.table('stock_data').select('ticker, data').execute()
-            stocks = result.data if result.data else []
-            
-            if not stocks:
-                return self.send_json({'message': 'No stocks to update', 'updated': 0})
-            
-            updated = []
-            errors = []
-            today = datetime.now().strftime('%Y-%m-%d')
-            
-            for stock in stocks:
-                ticker = stock['ticker']
-                existing_data = stock['data']
-                
-                try:
-                    # Encode special characters for yfinance (e.g., M&M.NS -> M%26M.NS)
-                    yf_ticker_symbol = ticker.replace('&', '%26')
-                    
-                    # Fetch latest data from yfinance
-                    yf_ticker = yf.Ticker(yf_ticker_symbol)
-                    info = yf_ticker.info
-                    
-                    # Get current price
-                    current_price = info.get('currentPrice') or info.get('regularMarketPrice')
-                    if not current_price:
-                        errors.append(f"{ticker}: No price data")
-                        continue
-                    
-                    # Get today's OHLC for chart
-                    hist = yf_ticker.history(period='5d')  # Last 5 days to ensure we get latest
-                    if hist.empty:
-                        errors.append(f"{ticker}: No history data")
-                        continue
-                    
-                    latest = hist.iloc[-1]
-                    latest_date = hist.index[-1].strftime('%Y-%m-%d')
-                    
-                    # Update quote price
-                    if 'quote' not in existing_data:
-                        existing_data['quote'] = {'Global Quote': {}}
-                    existing_data['quote']['Global Quote']['05. price'] = str(current_price)
-                    existing_data['quote']['Global Quote']['08. previous close'] = str(info.get('previousClose', current_price))
-                    
-                    # Update chart history
-                    history_key = 'Monthly Adjusted Time Series'
-                    if 'history' not in existing_data:
-                        existing_data['history'] = {history_key: {}}
-                    
-                    if history_key not in existing_data['history']:
-                        existing_data['history'][history_key] = {}
-                    
-                    # Add/update today's data point
-                    existing_data['history'][history_key][latest_date] = {
-                        '1. open': str(latest.get('Open', current_price)),
-                        '2. high': str(latest.get('High', current_price)),
-                        '3. low': str(latest.get('Low', current_price)),
-                        '4. close': str(latest.get('Close', current_price)),
-                        '5. adjusted close': str(latest.get('Close', current_price)),
-                        '6. volume': str(int(latest.get('Volume', 0))),
-                    }
-                    
-                    # Update last_updated timestamp
-                    existing_data['last_updated'] = datetime.now().isoformat()
-                    
-                    # Save to Supabase (only update the data column)
-                    supabase.table('stock_data').update({
-                        'data': existing_data
-                    }).eq('ticker', ticker).execute()
-                    
-                    updated.append({
-                        'ticker': ticker,
-                        'price': current_price,
-                        'date': latest_date
+
+            # Resume today's run for this shard, or start a new one
+            key = shard_key(shard, shards)
+            run_id = f"{datetime.now().strftime('%Y-%m-%d')}:{key}"
+            with self.metrics.phase('checkpoint'):
+                checkpoint = load_checkpoint(supabase, key)
+            fx = None
+
+            if checkpoint and checkpoint['run_id'] == run_id and not reset:
+                if checkpoint['status'] == 'complete':
+                    return self.send_json({
+                        'message': f'Daily refresh already complete for shard {key}',
+                        'run_id': run_id,
+                        'updated': 0,
+                        'processed': checkpoint['processed'],
                     })
-                    
+                cursor = checkpoint['cursor']
+                processed = checkpoint['processed'] or 0
+                error_count = checkpoint['errors'] or 0
+            else:
+                cursor = None
+                processed = 0
+                error_count = 0
+                save_checkpoint(supabase, key, run_id, None, 'running', 0, 0, started=True)
+
+                # Store today's USD/INR rate once per run; a failure keeps the last stored rate
+                if shard == 0:
+                    try:
+                        with self.metrics.upstream('exchangerate-api'):
+                            fx = refresh_rate(supabase)
+                    except Exception as e:
+                        fx = {'error': str(e)}
+                    # Benchmark index bars the betas below are measured against
+                    try:
+                        with self.metrics.phase('benchmarks'):
+                            bench_states = load_refresh_state(supabase, BENCHMARKS.values())
+                            bench_due = list(BENCHMARKS.values()) if force \
+                                else due_tickers(bench_states, BENCHMARKS.values())[0]
+                            refresh_benchmarks(yf, supabase, symbols=bench_due)
+                            record_checks(supabase, bench_states, checked=bench_due)
+                    except Exception as e:
+                        print(f"[indicators] Benchmark refresh failed: {e}")
+
+            if 'cursor' in query:
+                cursor = query['cursor'][0].upper().strip() or None
+
+            # Only ticker names are read; the stored documents are patched server-side.
+            # Sorting happens here so the cursor comparison doesn't depend on the DB collation.
+            with self.metrics.phase('list'):
+                pending = pending_tickers(sorted(list_tickers(supabase)), shard, shards, cursor)
+            batch = pending[:limit]
+
+            # No session since the last check: nothing upstream can have changed
+            with self.metrics.phase('gate'):
+                states = load_refresh_state(supabase, batch)
+            due, closed = (batch, []) if force else due_tickers(states, batch)
+            stocks = [{'ticker': ticker} for ticker in due]
+            unchanged = []
+
+            # One patch_stock_data call, one price_history upsert, one screener rescore,
+            # one indicators update, one AI context rebuild and one refresh_state upsert
+            # per chunk. Patches matching the last written content only mark the ticker
+            # as checked.
+            def write_rows(rows):
+                changed = rows if force else changed_patches(states, rows)
+                changed_tickers = {patch['ticker'] for patch in changed}
+                unchanged.extend(patch['ticker'] for patch in rows if patch['ticker'] not in changed_tickers)
+                with self.metrics.phase('write'):
+                    if changed:
+                        write_patches(supabase, changed)
+                        bars = [bar for patch in changed
+                                for bar in history_rows(patch['ticker'], patch.get('history', {}), '1d')]
+                        if bars:
+                            append_bars(supabase, bars)
+                            rollup_weekly(supabase, [bar['ticker'] for bar in bars], min(bar['date'] for bar in bars))
+                    record_checks(supabase, states, rows)
+                if not changed:
+                    return
+                try:
+                    with self.metrics.phase('rescore'):
+                        rescore(supabase, [patch['ticker'] for patch in changed])
+                except Exception as e:
+                    print(f"[screener] Rescore failed: {e}")  # prices are written; scores catch up next run
+                try:
+                    with self.metrics.phase('indicators'):
+                        update_indicators(supabase, daily={patch['ticker']: closes_from_points(patch.get('history'))
+                                                           for patch in changed})
+                except Exception as e:
+                    print(f"[indicators] Update failed: {e}")  # the next bar's update catches up
+                try:
+                    with self.metrics.phase('context'):
+                        refresh_cards(supabase, [patch['ticker'] for patch in changed])
                 except Exception as e:
-                    errors.append(f"{ticker}: {str(e)}")
+                    print(f"[ai_context] Card refresh failed: {e}")
+
+            def on_chunk(chunk, chunk_stats):
+                nonlocal cursor, processed, error_count
+                cursor = chunk[-1]['ticker']
+                processed += len(chunk)
+                error_count += chunk_stats['errors']
+                # The chunk's batched Yahoo calls, as timed by run_refresh
+                self.metrics.record('upstream', 'yahoo.download', chunk_stats['download_s'] * 1000)
+                self.metrics.record('upstream', 'yahoo.info', chunk_stats['info_s'] * 1000)
+                with self.metrics.phase('checkpoint'):
+                    save_checkpoint(supabase, key, run_id, cursor, 'running', processed, error_count)
+
+            summary = run_refresh(
+                yf, stocks, write_rows, chunk_size=chunk_size, max_workers=max_workers,
+                on_chunk=on_chunk, budget_s=budget_s
+            )
+
+            if summary['complete'] and batch:
+                # Skipped tickers after the last fetched chunk are done too
+                cursor = batch[-1]
+                processed += len(closed)
+
+            if summary['complete'] and len(pending) <= limit:
+                status = 'complete'
+            elif summary['stopped'] == 'write_failed':
+                status = 'failed'  # cursor stays before the unwritten chunk; next call retries it
+            else:
+                status = 'running'
+            save_checkpoint(supabase, key, run_id, cursor, status, processed, error_count)
             
             return self.send_json({
-                'message': f'Daily refresh complete',
-                'updated': len(updated),
-                'stocks': updated,
-                'errors': errors,
+                'message': f'Daily refresh {status}',
+                'run_id': run_id,
+                'status': status,
+                'remaining': sum(1 for ticker in pending if cursor is None or ticker > cursor),
+                'fetched': summary['stats']['tickers'],
+                'skipped': {'market_closed': len(closed), 'unchanged': len(unchanged)},
+                'updated': len(summary['updated']),
+                'written': len(summary['updated']) - len(unchanged),
+                'stocks': summary['updated'],
+                'errors': summary['errors'],
+                'stats': summary['stats'],
+                'fx': fx,
                 'timestamp': datetime.now().isoformat()
             })
             
@@ -117,8 +219,14 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
     
     def send_json(self, data, status=200):
+        metrics = getattr(self, 'metrics', None)
+        body = json.dumps(data).encode()
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        if metrics:
+            self.send_header('Server-Timing', metrics.server_timing())
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
+        if metrics:
+            metrics.finish(status)
@@ -28,6 +28,9 @@ export default async function handler(request) {
         // Delete from all related tables
         await supabase.from('stock_data').delete().eq('ticker', ticker);
         await supabase.from('projections').delete().eq('ticker', ticker);
+        await supabase.from('price_history').delete().eq('ticker', ticker);
+        await supabase.from('screener').delete().eq('ticker', ticker);
+        await supabase.from('valuation_cache').delete().eq('ticker', ticker);
         await supabase.from('tickers').delete().eq('symbol', ticker);
 
         return jsonResponse({ success: true, deleted: ticker });
@@ -1,20 +1,36 @@
 import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+import { RateLimited, acquire } from './_upstream.js';
 
 export const config = { runtime: 'edge' };
 
 const FIXER_API_KEY = process.env.FIXER_API_KEY;
+const FIXER_URL = 'http://data.fixer.io/api';
+const FIXER_SYMBOLS = 'base=EUR&symbols=USD,INR';
+// Fixer serves at most a year of days per timeseries request
+const TIMESERIES_MAX_DAYS = 365;
+const RATES_TTL_MS = 10 * 60 * 1000;
+const PAGE_SIZE = 1000;
+// Fixer calls stop after this long so the response starts inside the edge
+// limit; rates fetched so far are stored and the next call resumes from them
+const BACKFILL_BUDGET_MS = 20000;
 
 /**
  * Historical Exchange Rates API
  * 
  * GET /api/exchange-history?date=2023-06-15
  *   - Returns cached rate for that date, or nearest available
+ *   - Served from a sorted in-memory copy of the table (binary search)
  * 
  * POST /api/exchange-history { mode: 'yearly' }
- *   - Backfill yearly samples (1999-2024 = ~26 calls)
+ *   - Backfill yearly samples (1999 to now, one call each). Calls stop when
+ *     the fixer bucket can't cover the next one within the time budget;
+ *     `remaining` counts the dates left, which the next call picks up
  * 
- * POST /api/exchange-history { mode: 'monthly', year: 2023 }
- *   - Backfill monthly data for a specific year (12 calls)
+ * POST /api/exchange-history { mode: 'daily', year: 2023 }
+ *   - Backfill every day of a year in one timeseries call (falls back to
+ *     mid-month samples without timeseries access). 'monthly' is an alias.
+ *
+ * Backfills check existing dates in one query and write in one bulk upsert.
  */
 
 export default async function handler(request) {
@@ -30,23 +46,23 @@ export default async function handler(request) {
 
         // If 'all' param, return all cached rates for frontend chart
         if (all === 'true') {
-            const { data, error } = await supabase
-                .from('exchange_rates')
-                .select('date, rate')
-                .order('date', { ascending: true });
-
-            if (error) {
+            try {
+                return jsonResponse({ rates: await getRates() });
+            } catch (error) {
                 return jsonResponse({ error: error.message }, 500);
             }
-            return jsonResponse({ rates: data || [] });
         }
 
         if (!date) {
             return jsonResponse({ error: 'Date required (YYYY-MM-DD) or use ?all=true' }, 400);
         }
 
-        const rate = await getRateForDate(date);
-        return jsonResponse({ date, rate, source: 'cached' });
+        try {
+            const rate = await getRateForDate(date);
+            return jsonResponse({ date, rate, source: 'cached' });
+        } catch (error) {
+            return jsonResponse({ error: error.message }, 500);
+        }
     }
 
     // POST: Admin backfill operations
@@ -56,9 +72,9 @@ export default async function handler(request) {
 
         if (mode === 'yearly') {
             return await backfillYearly();
-        } else if (mode === 'monthly') {
+        } else if (mode === 'daily' || mode === 'monthly') {
             const year = body.year || new Date().getFullYear();
-            return await backfillMonthly(year);
+            return await backfillDaily(year);
         } else if (mode === 'status') {
             return await getBackfillStatus();
         }
@@ -69,38 +85,131 @@ export default async function handler(request) {
     return jsonResponse({ error: 'Method not allowed' }, 405);
 }
 
+// Sorted rate table per isolate, so nearest-date lookups and ?all=true don't
+// query the database each time: { loadedAt, rows: [{date, rate}] }
+let cachedRates = null;
+
+// Load every stored rate, ascending by date. PostgREST caps a response at
+// 1000 rows, so daily history is read in pages.
+async function getRates() {
+    if (cachedRates && Date.now() - cachedRates.loadedAt < RATES_TTL_MS) {
+        return cachedRates.rows;
+    }
+    const rows = [];
+    for (let from = 0; ; from += PAGE_SIZE) {
+        const { data, error } = await supabase
+            .from('exchange_rates')
+            .select('date, rate')
+            .order('date', { ascending: true })
+            .range(from, from + PAGE_SIZE - 1);
+        if (error) throw error;
+        rows.push(...(data || []));
+        if (!data || data.length < PAGE_SIZE) break;
+    }
+    cachedRates = { loadedAt: Date.now(), rows };
+    return rows;
+}
+
+// Rate on the date, else the closest date before it, else the first after it
+function nearestRate(rows, targetDate) {
+    let lo = 0;
+    let hi = rows.length - 1;
+    let found = -1;
+    while (lo <= hi) {
+        const mid = (lo + hi) >> 1;
+        if (rows[mid].date <= targetDate) {
+            found = mid;
+            lo = mid + 1;
+        } else {
+            hi = mid - 1;
+        }
+    }
+    if (found >= 0) return rows[found].rate;
+    return rows.length ? rows[0].rate : null;
+}
+
 // Get rate for a specific date, with fallback to nearest available
 async function getRateForDate(targetDate) {
-    // First try exact match
-    const { data: exact } = await supabase
-        .from('exchange_rates')
-        .select('rate')
-        .eq('date', targetDate)
-        .single();
+    const rate = nearestRate(await getRates(), targetDate);
+    return rate || 83.5; // Fallback to reasonable default
+}
+
+// Dates already stored between two dates (inclusive), in one query
+async function existingDates(start, end) {
+    const dates = new Set();
+    for (let from = 0; ; from += PAGE_SIZE) {
+        const { data, error } = await supabase
+            .from('exchange_rates')
+            .select('date')
+            .gte('date', start)
+            .lte('date', end)
+            .order('date', { ascending: true })
+            .range(from, from + PAGE_SIZE - 1);
+        if (error) throw error;
+        for (const row of data || []) dates.add(row.date);
+        if (!data || data.length < PAGE_SIZE) break;
+    }
+    return dates;
+}
 
-    if (exact?.rate) return exact.rate;
+// Fixer quotes against EUR on the free tier, so USD/INR is INR / USD
+function usdInr(rates) {
+    return rates?.INR && rates?.USD ? rates.INR / rates.USD : null;
+}
 
-    // Fallback: find closest date before target
-    const { data: before } = await supabase
-        .from('exchange_rates')
-        .select('date, rate')
-        .lte('date', targetDate)
-        .order('date', { ascending: false })
-        .limit(1)
-        .single();
+// One Fixer call per date, until the deadline. Returns { rows, failed, remaining }.
+async function fetchHistorical(dates, deadline) {
+    const rows = [];
+    let failed = 0;
+    for (const [i, date] of dates.entries()) {
+        try {
+            await acquire('fixer', 1, deadline);
+            const res = await fetch(`${FIXER_URL}/${date}?access_key=${FIXER_API_KEY}&${FIXER_SYMBOLS}`);
+            const data = await res.json();
+            const rate = data.success ? usdInr(data.rates) : null;
+            if (rate) {
+                rows.push({ date, rate, source: 'fixer' });
+            } else {
+                failed++;
+            }
+        } catch (e) {
+            if (e instanceof RateLimited) return { rows, failed, remaining: dates.length - i };
+            failed++;
+        }
+    }
+    return { rows, failed, remaining: 0 };
+}
 
-    if (before?.rate) return before.rate;
+// One Fixer timeseries call for up to a year of daily rates. Returns the
+// rows, or null when the plan doesn't include the timeseries endpoint.
+async function fetchTimeseries(start, end, deadline) {
+    await acquire('fixer', 1, deadline);
+    const res = await fetch(`${FIXER_URL}/timeseries?access_key=${FIXER_API_KEY}&start_date=${start}&end_date=${end}&${FIXER_SYMBOLS}`);
+    const data = await res.json();
+    if (!data.success) return null;
+    return Object.entries(data.rates || {})
+        .map(([date, rates]) => ({ date, rate: usdInr(rates), source: 'fixer' }))
+        .filter(row => row.rate);
+}
 
-    // Last resort: find any closest date after target
-    const { data: after } = await supabase
+// Write all fetched rates in one request and drop the cached table
+async function storeRates(rows) {
+    if (rows.length === 0) return;
+    const { error } = await supabase
         .from('exchange_rates')
-        .select('date, rate')
-        .gt('date', targetDate)
-        .order('date', { ascending: true })
-        .limit(1)
-        .single();
+        .upsert(rows, { onConflict: 'date' });
+    if (error) throw error;
+    cachedRates = null;
+}
 
-    return after?.rate || 83.5; // Fallback to reasonable default
+function isoDate(d) {
+    return d.toISOString().slice(0, 10);
+}
+
+function addDays(date, days) {
+    const d = new Date(`${date}T00:00:00Z`);
+    d.setUTCDate(d.getUTCDate() + days);
+    return isoDate(d);
 }
 
 // Backfill yearly samples (Jan 1 of each year from 1999 to current)
@@ -110,120 +219,94 @@ async function backfillYearly() {
     }
 
     const currentYear = new Date().getFullYear();
-    const years = [];
+    const dates = [];
     for (let y = 1999; y <= currentYear; y++) {
-        years.push(y);
+        dates.push(`${y}-01-01`);
     }
 
-    const results = { success: 0, failed: 0, skipped: 0, rates: [] };
-
-    for (const year of years) {
-        const date = `${year}-01-01`;
-
-        // Check if already exists
-        const { data: existing } = await supabase
-            .from('exchange_rates')
-            .select('rate')
-            .eq('date', date)
-            .single();
-
-        if (existing?.rate) {
-            results.skipped++;
-            continue;
-        }
-
-        // Fetch from Fixer.io
-        try {
-            const res = await fetch(`http://data.fixer.io/api/${date}?access_key=${FIXER_API_KEY}&base=EUR&symbols=USD,INR`);
-            const data = await res.json();
-
-            if (data.success && data.rates) {
-                // Fixer free tier uses EUR as base, so we calculate USD/INR
-                const usdInr = data.rates.INR / data.rates.USD;
-
-                await supabase.from('exchange_rates').upsert({
-                    date,
-                    rate: usdInr,
-                    source: 'fixer'
-                }, { onConflict: 'date' });
-
-                results.success++;
-                results.rates.push({ date, rate: usdInr });
-            } else {
-                results.failed++;
-            }
-        } catch (e) {
-            results.failed++;
-        }
-
-        // Rate limit: 100ms delay between calls
-        await new Promise(r => setTimeout(r, 100));
-    }
+    // Samples are a year apart, so each needs its own historical call
+    const existing = await existingDates(dates[0], dates[dates.length - 1]);
+    const missing = dates.filter(date => !existing.has(date));
+    const { rows, failed, remaining } = await fetchHistorical(missing, Date.now() + BACKFILL_BUDGET_MS);
+    await storeRates(rows);
 
     return jsonResponse({
-        message: `Yearly backfill complete`,
-        ...results
+        message: remaining ? `Yearly backfill paused; call again for the remaining ${remaining}` : `Yearly backfill complete`,
+        complete: remaining === 0,
+        success: rows.length,
+        failed,
+        remaining,
+        skipped: dates.length - missing.length,
+        rates: rows.map(({ date, rate }) => ({ date, rate }))
     });
 }
 
-// Backfill monthly data for a specific year
-async function backfillMonthly(year) {
+// Backfill every day of a year (up to today). Missing days are fetched with
+// timeseries calls of at most a year each; plans without the timeseries
+// endpoint fall back to one mid-month sample per missing month.
+async function backfillDaily(year) {
     if (!FIXER_API_KEY) {
         return jsonResponse({ error: 'FIXER_API_KEY not configured' }, 500);
     }
 
-    const months = [];
-    for (let m = 1; m <= 12; m++) {
-        months.push(m);
+    const today = isoDate(new Date());
+    const start = `${year}-01-01`;
+    const end = `${year}-12-31` < today ? `${year}-12-31` : today;
+    if (start > end) {
+        return jsonResponse({ error: `${year} is in the future` }, 400);
     }
 
-    const results = { year, success: 0, failed: 0, skipped: 0 };
-
-    for (const month of months) {
-        const date = `${year}-${String(month).padStart(2, '0')}-15`; // Mid-month
-
-        // Skip future dates
-        if (new Date(date) > new Date()) continue;
+    const existing = await existingDates(start, end);
+    const missing = [];
+    for (let date = start; date <= end; date = addDays(date, 1)) {
+        if (!existing.has(date)) missing.push(date);
+    }
 
-        // Check if already exists
-        const { data: existing } = await supabase
-            .from('exchange_rates')
-            .select('rate')
-            .eq('date', date)
-            .single();
+    const deadline = Date.now() + BACKFILL_BUDGET_MS;
+    const results = { year, resolution: 'daily', success: 0, failed: 0, remaining: 0, skipped: existing.size };
+    const rows = [];
 
-        if (existing?.rate) {
-            results.skipped++;
-            continue;
-        }
+    for (let i = 0; i < missing.length;) {
+        // Window from the first missing day, capped at the timeseries limit
+        const windowEnd = addDays(missing[i], TIMESERIES_MAX_DAYS - 1);
+        let j = i;
+        while (j + 1 < missing.length && missing[j + 1] <= windowEnd) j++;
 
-        // Fetch from Fixer.io
+        let fetched;
         try {
-            const res = await fetch(`http://data.fixer.io/api/${date}?access_key=${FIXER_API_KEY}&base=EUR&symbols=USD,INR`);
-            const data = await res.json();
-
-            if (data.success && data.rates) {
-                const usdInr = data.rates.INR / data.rates.USD;
-
-                await supabase.from('exchange_rates').upsert({
-                    date,
-                    rate: usdInr,
-                    source: 'fixer'
-                }, { onConflict: 'date' });
-
-                results.success++;
-            } else {
-                results.failed++;
-            }
+            fetched = await fetchTimeseries(missing[i], missing[j], deadline);
         } catch (e) {
-            results.failed++;
+            if (!(e instanceof RateLimited)) throw e;
+            results.remaining = missing.length - i;
+            break;
+        }
+        if (fetched === null) {
+            // No timeseries on this plan: sample the missing months instead
+            const samples = [...new Set(missing.slice(i).map(date => `${date.slice(0, 7)}-15`))]
+                .filter(date => date <= end && !existing.has(date));
+            const fallback = await fetchHistorical(samples, deadline);
+            rows.push(...fallback.rows);
+            results.failed += fallback.failed;
+            results.remaining = fallback.remaining;
+            results.resolution = 'monthly';
+            break;
         }
 
-        await new Promise(r => setTimeout(r, 100));
+        // The window can include days already stored; keep only the missing
+        // ones. Days Fixer has no rate for are simply absent.
+        const wanted = new Set(missing.slice(i, j + 1));
+        rows.push(...fetched.filter(row => wanted.has(row.date)));
+        i = j + 1;
     }
 
+    await storeRates(rows);
+    results.success = rows.length;
+
     return jsonResponse({
-        message: `Monthly backfill for ${year} complete`,
+        message: results.remaining
+            ? `Daily backfill for ${year} paused; call again to continue`
+            : `Daily backfill for ${year} complete`,
+        complete: results.remaining === 0,
         ...results
     });
 }
@@ -1,17 +1,51 @@
-import { jsonResponse, corsHeaders } from './_utils.js';
+import { supabase, jsonResponse, corsHeaders } from './_utils.js';
 
 export const config = { runtime: 'edge' };
 
+const DEFAULT_RATE = 83.50;
+const LIVE_TIMEOUT_MS = 3000;
+
+/**
+ * Current USD/INR rate
+ *
+ * GET /api/exchange-rate
+ *   - Returns the latest rate in exchange_rates (kept current by the daily
+ *     refresh cron). Only if no rate has been stored yet does it ask the
+ *     provider, with a short timeout, and store the answer.
+ */
 export default async function handler(request) {
     if (request.method === 'OPTIONS') {
         return new Response(null, { status: 204, headers: corsHeaders });
     }
 
+    const { data: latest } = await supabase
+        .from('exchange_rates')
+        .select('date, rate')
+        .order('date', { ascending: false })
+        .limit(1)
+        .maybeSingle();
+
+    if (latest?.rate) {
+        return jsonResponse({ rate: latest.rate, date: latest.date, source: 'cached' });
+    }
+
     try {
-        const res = await fetch('https://api.exchangerate-api.com/v4/latest/USD');
+        const res = await fetch('https://api.exchangerate-api.com/v4/latest/USD', {
+            signal: AbortSignal.timeout(LIVE_TIMEOUT_MS)
+        });
         const data = await res.json();
-        return jsonResponse({ rate: data.rates?.INR || 83.50 });
+        const rate = data.rates?.INR;
+        if (!rate) throw new Error('INR rate missing');
+
+        const date = new Date().toISOString().slice(0, 10);
+        await supabase.from('exchange_rates').upsert({
+            date,
+            rate,
+            source: 'exchangerate-api'
+        }, { onConflict: 'date' });
+
+        return jsonResponse({ rate, date, source: 'live' });
     } catch {
-        return jsonResponse({ rate: 83.50 });
+        return jsonResponse({ rate: DEFAULT_RATE, date: null, source: 'default' });
     }
 }
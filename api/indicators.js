@@ -0,0 +1,52 @@
+import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+
+export const config = { runtime: 'edge' };
+
+const COLUMNS = [
+    'ticker', 'as_of', 'price', 'sma_50', 'sma_200', 'ema_20', 'ema_50',
+    'vol_1m', 'vol_3m', 'vol_1y', 'vol_monthly', 'high_52w', 'low_52w',
+    'drawdown', 'max_drawdown', 'returns', 'beta', 'benchmark', 'updated_at'
+];
+
+/**
+ * Indicators API
+ *
+ * GET /api/indicators?ticker=TCS.NS
+ *   - Moving averages, realized volatility (annualized), 52-week range,
+ *     drawdowns, range returns (YTD simple, 1Y-10Y CAGR) and beta against
+ *     the market's benchmark index, as of the last refreshed bar
+ *   - Values the stored history can't support yet are null
+ *
+ * Reads the `indicators` table the Python refresh routes keep current.
+ */
+export default async function handler(request) {
+    if (request.method === 'OPTIONS') {
+        return new Response(null, { status: 204, headers: corsHeaders });
+    }
+
+    if (request.method !== 'GET') {
+        return jsonResponse({ error: 'Method not allowed' }, 405);
+    }
+
+    const ticker = (new URL(request.url).searchParams.get('ticker') || '').toUpperCase().trim();
+    if (!ticker) {
+        return jsonResponse({ error: 'Ticker parameter required' }, 400);
+    }
+
+    try {
+        const { data, error } = await supabase
+            .from('indicators')
+            .select(COLUMNS.join(', '))
+            .eq('ticker', ticker)
+            .maybeSingle();
+
+        if (error) throw error;
+        if (!data) {
+            return jsonResponse({ error: `No indicators for ${ticker} yet` }, 404);
+        }
+        return jsonResponse(data);
+    } catch (error) {
+        console.error('Indicators error:', error);
+        return jsonResponse({ error: error.message }, 500);
+    }
+}
@@ -0,0 +1,83 @@
+import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+
+export const config = { runtime: 'edge' };
+
+const PAGE_SIZE = 1000;
+const COLUMNS = { open: 'o', high: 'h', low: 'l', close: 'c', adj_close: 'adj_c', volume: 'v', dividend: 'div' };
+
+/**
+ * Price History API
+ *
+ * GET /api/price-history?ticker=TCS.NS&interval=1mo&from=2019-01-01&to=2024-12-31
+ *   - Returns bars in the date range as parallel numeric arrays:
+ *     { ticker, interval, count, dates: [...], open: [...], close: [...], ... }
+ *   - fields=adj_close,volume limits which arrays are returned
+ *   - extend=1d appends bars of that interval dated after the last bar
+ *     (e.g. daily points since the last monthly close); ignored when the
+ *     requested interval has no bars
+ */
+export default async function handler(request) {
+    if (request.method === 'OPTIONS') {
+        return new Response(null, { status: 204, headers: corsHeaders });
+    }
+
+    if (request.method !== 'GET') {
+        return jsonResponse({ error: 'Method not allowed' }, 405);
+    }
+
+    const url = new URL(request.url);
+    const ticker = (url.searchParams.get('ticker') || '').toUpperCase().trim();
+    const interval = url.searchParams.get('interval') || '1mo';
+    const from = url.searchParams.get('from');
+    const to = url.searchParams.get('to');
+    const extend = url.searchParams.get('extend');
+    const fields = (url.searchParams.get('fields') || Object.keys(COLUMNS).join(','))
+        .split(',')
+        .filter(f => COLUMNS[f]);
+
+    if (!ticker) {
+        return jsonResponse({ error: 'Ticker parameter required' }, 400);
+    }
+
+    try {
+        const select = ['date', ...fields.map(f => COLUMNS[f])].join(', ');
+        const rows = await selectRange(ticker, interval, select, from, to);
+
+        if (extend && extend !== interval && rows.length) {
+            const after = rows[rows.length - 1].date;
+            const tail = await selectRange(ticker, extend, select, after, to);
+            rows.push(...tail.filter(r => r.date > after));
+        }
+
+        const body = { ticker, interval, count: rows.length, dates: rows.map(r => r.date) };
+        for (const field of fields) {
+            const column = COLUMNS[field];
+            body[field] = rows.map(r => r[column]);
+        }
+        return jsonResponse(body);
+    } catch (error) {
+        console.error('Price history error:', error);
+        return jsonResponse({ error: error.message }, 500);
+    }
+}
+
+// Page through the (ticker, interval, date) range past the 1000-row select cap
+async function selectRange(ticker, interval, select, from, to) {
+    const rows = [];
+    for (let start = 0; ; start += PAGE_SIZE) {
+        let query = supabase
+            .from('price_history')
+            .select(select)
+            .eq('ticker', ticker)
+            .eq('interval', interval)
+            .order('date', { ascending: true })
+            .range(start, start + PAGE_SIZE - 1);
+        if (from) query = query.gte('date', from);
+        if (to) query = query.lte('date', to);
+
+        const { data, error } = await query;
+        if (error) throw error;
+        rows.push(...data);
+        if (data.length < PAGE_SIZE) return rows;
+    }
+}
@@ -0,0 +1,34 @@
+import { jsonResponse, corsHeaders } from './_utils.js';
+import { processQueue, purgeFinishedJobs } from './_queue.js';
+
+export const config = { runtime: 'edge' };
+
+const MAX_BUDGET_MS = 22000;
+
+/**
+ * Refresh queue worker
+ *
+ * GET /api/process-queue?budget=20000
+ *   - Runs queued refresh jobs until the queue is empty or no job fits in
+ *     the time budget left (ms, max 22s); a provider whose quota defers a
+ *     job is skipped for the rest of the run
+ *   - Called by cron every minute and kicked by /api/admin-refresh
+ */
+export default async function handler(request) {
+    if (request.method === 'OPTIONS') {
+        return new Response(null, { status: 204, headers: corsHeaders });
+    }
+
+    try {
+        const url = new URL(request.url);
+        const budgetMs = Math.min(parseInt(url.searchParams.get('budget')) || 20000, MAX_BUDGET_MS);
+
+        const summary = await processQueue({ origin: url.origin, budgetMs });
+        await purgeFinishedJobs();
+
+        return jsonResponse({ success: true, ...summary });
+    } catch (error) {
+        console.error('Queue worker error:', error);
+        return jsonResponse({ error: error.message }, 500);
+    }
+}
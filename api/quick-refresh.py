@@ -1,9 +1,22 @@
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-from datetime import datetime
+import sys
 from urllib.parse import parse_qs, urlparse
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _patch import build_patch, history_point, quote_fields, overview_fields, derived_overview_fields, write_patches
+from _history import history_rows, append_bars, rollup_weekly
+from _info_cache import info_cache
+from _quote import fetch_chart, chart_bars, quote_info
+from _screener import rescore
+from _ai_context import refresh_cards
+from _gate import load_refresh_state, due_tickers, changed_patches, record_checks
+from _metrics import RequestMetrics
+
+# A quick refresh is an explicit request for a current price
+QUICK_REFRESH_MAX_AGE = 60
+
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
         self.send_response(200)
@@ -13,6 +26,7 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
 
     def do_GET(self):
+        self.metrics = RequestMetrics('quick-refresh')
         try:
             query = parse_qs(urlparse(self.path).query)
             ticker = query.get('ticker', [''])[0].upper().strip()
@@ -21,7 +35,12 @@ class handler(BaseHTTPRequestHandler):
                 self.send_json({'error': 'Ticker parameter required'}, 400)
                 return
 
-            import yfinance as yf
+            # mode=full uses yfinance `info` for every overview metric; the default
+            # light path reads the chart endpoint and never imports pandas
+            full = query.get('mode', [''])[0] == 'full'
+            # Skips no upstream call or write; see _gate.py
+            force = query.get('force', [''])[0] in ('1', 'true')
+
             from supabase import create_client
             
             supabase_url = os.environ.get('SUPABASE_URL', '')
@@ -32,96 +51,114 @@ class handler(BaseHTTPRequestHandler):
             
             supabase = create_client(supabase_url, supabase_key)
 
-            # Get existing data
-            result = supabase.table('stock_data').select('data').eq('ticker', ticker).execute()
+            # Only the market flag and per-share figures are read; the stored document is patched server-side
+            with self.metrics.phase('read'):
+                result = supabase.table('stock_data').select(
+                    'market:data->>market, eps:data->overview->>EPS, '
+                    'shares:data->overview->>SharesOutstanding, book_value:data->overview->>BookValue'
+                ).eq('ticker', ticker).execute()
             if not result.data or len(result.data) == 0:
                 return self.send_json({'error': f'Ticker {ticker} not found in database. Load it first.'}, 404)
             
-            existing_data = result.data[0]['data']
+            stored = result.data[0]
+            market = stored['market']
+
+            # No session since the last check: the quote can't have moved
+            with self.metrics.phase('gate'):
+                states = load_refresh_state(supabase, [ticker])
+            if not force and not due_tickers(states, [ticker], markets={ticker: market})[0]:
+                return self.send_json({
+                    'success': True,
+                    'skipped': 'market_closed',
+                    'message': f'{ticker} is up to date; no session has closed since '
+                               f"{states[ticker]['checked_at']}",
+                })
 
             # Encode special characters for yfinance (e.g., M&M.NS -> M%26M.NS)
             yf_ticker_symbol = ticker.replace('&', '%26')
             
             # If it's an Indian stock without .NS or .BO suffix, append .NS for yfinance
-            if existing_data.get('market') == 'IN' and not yf_ticker_symbol.endswith('.NS') and not yf_ticker_symbol.endswith('.BO'):
+            if market == 'IN' and not yf_ticker_symbol.endswith('.NS') and not yf_ticker_symbol.endswith('.BO'):
                 yf_ticker_symbol += '.NS'
 
-            # Fetch latest data from yfinance
-            yf_stock = yf.Ticker(yf_ticker_symbol)
-            info = yf_stock.info
-            
-            current_price = info.get('currentPrice') or info.get('regularMarketPrice')
-            if not current_price:
-                return self.send_json({'error': f'No price data available for {ticker} from yfinance'}, 404)
-
-            # Get today's OHLC for chart
-            hist = yf_stock.history(period='5d')
-            if not hist.empty:
-                latest = hist.iloc[-1]
-                latest_date = hist.index[-1].strftime('%Y-%m-%d')
+            history = None
+            if full:
+                with self.metrics.phase('import'):
+                    import yfinance as yf
+
+                # Fetch latest data from yfinance
+                yf_stock = yf.Ticker(yf_ticker_symbol)
+                info = info_cache.get(yf_ticker_symbol, fetch=lambda _: self.fetch_info(yf_stock),
+                                      max_age=QUICK_REFRESH_MAX_AGE)
                 
-                history_key = 'Monthly Adjusted Time Series'
-                if 'history' not in existing_data:
-                    existing_data['history'] = {history_key: {}}
-                if history_key not in existing_data['history']:
-                    existing_data['history'][history_key] = {}
-                    
-                # Add/update today's data point
-                existing_data['history'][history_key][latest_date] = {
-                    '1. open': str(latest.get('Open', current_price)),
-                    '2. high': str(latest.get('High', current_price)),
-                    '3. low': str(latest.get('Low', current_price)),
-                    '4. close': str(latest.get('Close', current_price)),
-                    '5. adjusted close': str(latest.get('Close', current_price)),
-                    '6. volume': str(int(latest.get('Volume', 0))),
-                }
+                current_price = info.get('currentPrice') or info.get('regularMarketPrice')
+                if not current_price:
+                    return self.send_json({'error': f'No price data available for {ticker} from yfinance'}, 404)
 
-            # Update quote
-            if 'quote' not in existing_data:
-                existing_data['quote'] = {'Global Quote': {}}
-            
-            prev_close = info.get('previousClose', current_price)
-            change = current_price - prev_close if current_price and prev_close else 0
-            change_pct = (change / prev_close * 100) if prev_close else 0
-            
-            existing_data['quote']['Global Quote']['05. price'] = str(current_price)
-            existing_data['quote']['Global Quote']['08. previous close'] = str(prev_close)
-            existing_data['quote']['Global Quote']['09. change'] = f"{change:.4f}"
-            existing_data['quote']['Global Quote']['10. change percent'] = f"{change_pct:.4f}%"
-
-            # Update derived metrics in overview
-            if 'overview' in existing_data:
-                def safe_str(key, default='N/A'):
-                    val = info.get(key)
-                    return str(val) if val is not None else default
+                # Get today's OHLC for chart
+                with self.metrics.upstream('yahoo.history'):
+                    hist = yf_stock.history(period='5d')
+                if not hist.empty:
+                    latest_date = hist.index[-1].strftime('%Y-%m-%d')
+                    history = {latest_date: history_point(hist.iloc[-1], current_price)}
+                overview = overview_fields(info)
+            else:
+                with self.metrics.upstream('yahoo.chart'):
+                    chart = fetch_chart(yf_ticker_symbol)
+                info = quote_info(yf_ticker_symbol, chart)
                 
-                # Update key valuation & status metrics that might change with price
-                metrics_to_update = {
-                    'TrailingPE': safe_str('trailingPE', existing_data['overview'].get('TrailingPE')),
-                    'ForwardPE': safe_str('forwardPE', existing_data['overview'].get('ForwardPE')),
-                    'MarketCapitalization': safe_str('marketCap', existing_data['overview'].get('MarketCapitalization')),
-                    'EPS': safe_str('trailingEps', existing_data['overview'].get('EPS')),
-                    '52WeekHigh': safe_str('fiftyTwoWeekHigh', existing_data['overview'].get('52WeekHigh')),
-                    '52WeekLow': safe_str('fiftyTwoWeekLow', existing_data['overview'].get('52WeekLow')),
-                    'DividendYield': safe_str('dividendYield', existing_data['overview'].get('DividendYield')),
-                    'Beta': safe_str('beta', existing_data['overview'].get('Beta')),
-                    'PriceToBookRatio': safe_str('priceToBook', existing_data['overview'].get('PriceToBookRatio')),
+                current_price = info.get('regularMarketPrice')
+                if not current_price:
+                    return self.send_json({'error': f'No price data available for {ticker} from yfinance'}, 404)
+
+                bars = chart_bars(chart)
+                if bars:
+                    latest_date, bar = bars[-1]
+                    history = {latest_date: history_point(bar, current_price)}
+                overview = {
+                    **overview_fields(info),
+                    **derived_overview_fields(current_price, stored['eps'], stored['shares'], stored['book_value']),
                 }
-                
-                for k, v in metrics_to_update.items():
-                    if v != 'N/A':
-                        existing_data['overview'][k] = v
-                        # Update PERatio if TrailingPE changes since some UI might use PERatio
-                        if k == 'TrailingPE':
-                            existing_data['overview']['PERatio'] = v
-
-            # Update last_updated timestamp
-            existing_data['last_updated'] = datetime.now().isoformat()
-            
-            # Save to Supabase
-            supabase.table('stock_data').update({
-                'data': existing_data
-            }).eq('ticker', ticker).execute()
+
+            # Quote, price-dependent overview metrics and the new history point
+            patch = build_patch(
+                ticker,
+                quote=quote_fields(info, current_price, with_change=True),
+                overview=overview,
+                history=history,
+            )
+            if not force and not changed_patches(states, [patch]):
+                record_checks(supabase, states, [patch])
+                return self.send_json({
+                    'success': True,
+                    'skipped': 'unchanged',
+                    'message': f'{ticker} is unchanged since the last refresh',
+                })
+
+            with self.metrics.phase('write'):
+                write_patches(supabase, [patch])
+                if history:
+                    append_bars(supabase, history_rows(ticker, history, '1d'))
+                    rollup_weekly(supabase, [ticker], min(history))
+                record_checks(supabase, states, [patch])
+            try:
+                with self.metrics.phase('rescore'):
+                    rescore(supabase, [ticker])
+            except Exception as e:
+                print(f"[screener] Rescore failed for {ticker}: {e}")
+            if history:
+                try:
+                    # Imported here so the light path only loads numpy when there is a bar to add
+                    from _indicators import update_indicators, closes_from_points
+                    with self.metrics.phase('indicators'):
+                        update_indicators(supabase, daily={ticker: closes_from_points(history)})
+                except Exception as e:
+                    print(f"[indicators] Update failed for {ticker}: {e}")
+            try:
+                with self.metrics.phase('context'):
+                    refresh_cards(supabase, [ticker])
+            except Exception as e:
+                print(f"[ai_context] Card refresh failed for {ticker}: {e}")
             
             return self.send_json({
                 'success': True,
@@ -131,9 +168,20 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             return self.send_json({'error': str(e)}, 500)
 
+    def fetch_info(self, yf_stock):
+        # Cache misses only, so hits aren't timed as upstream calls
+        with self.metrics.upstream('yahoo.info'):
+            return yf_stock.info
+
     def send_json(self, data, status=200):
+        metrics = getattr(self, 'metrics', None)
+        body = json.dumps(data).encode()
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        if metrics:
+            self.send_header('Server-Timing', metrics.server_timing())
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
+        if metrics:
+            metrics.finish(status)
@@ -0,0 +1,71 @@
+"""
+Python API route that rebuilds the rows derived from stored documents.
+
+POST /api/rescore {"tickers": ["TCS.NS", "AAPL"]}
+    Recomputes the screener rows and AI context cards from the documents as
+    stored, so a refresh that kept sections from the previous document (see
+    keepStoredSections in _utils.js) or merged a history tail is scored and
+    described from the merged result, not the raw fetch. The refresh queue
+    calls it after storeStockData.
+"""
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _db import client_from_env
+from _screener import rescore
+from _ai_context import refresh_cards
+from _metrics import RequestMetrics
+
+MAX_BATCH = 100
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def do_POST(self):
+        self.metrics = RequestMetrics('rescore')
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            tickers = list(dict.fromkeys(
+                str(t).upper().strip() for t in body.get('tickers', []) if str(t).strip()
+            ))
+
+            if not tickers:
+                return self.send_json({'error': 'tickers required'}, 400)
+            if len(tickers) > MAX_BATCH:
+                return self.send_json({'error': f'At most {MAX_BATCH} tickers per call'}, 400)
+
+            supabase = client_from_env()
+            if not supabase:
+                return self.send_json({'error': 'Supabase credentials not configured'}, 500)
+
+            with self.metrics.phase('rescore'):
+                scored = rescore(supabase, tickers)
+            with self.metrics.phase('context'):
+                cards = refresh_cards(supabase, tickers)
+            return self.send_json({'tickers': len(tickers), 'scored': scored, 'cards': cards})
+
+        except Exception as e:
+            return self.send_json({'error': str(e)}, 500)
+
+    def send_json(self, data, status=200):
+        metrics = getattr(self, 'metrics', None)
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if metrics:
+            self.send_header('Server-Timing', metrics.server_timing())
+        self.end_headers()
+        self.wfile.write(body)
+        if metrics:
+            metrics.finish(status)
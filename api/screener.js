@@ -0,0 +1,73 @@
+import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+
+export const config = { runtime: 'edge' };
+
+const MAX_LIMIT = 200;
+const TEXT_FILTERS = ['sector', 'industry', 'market'];
+const NUMERIC = [
+    'price', 'market_cap', 'pe', 'pb', 'ps', 'peg', 'eps', 'roe', 'roa', 'profit_margin', 'operating_margin',
+    'revenue_growth', 'earnings_growth', 'dividend_yield', 'beta',
+    'score_value', 'score_future', 'score_past', 'score_health', 'score_dividend', 'score_total'
+];
+const COLUMNS = ['ticker', 'name', ...TEXT_FILTERS, 'currency', ...NUMERIC, 'updated_at'];
+
+/**
+ * Screener API
+ *
+ * GET /api/screener?sector=Technology&sort=score_value&order=desc&limit=20
+ *   - sector / industry / market: exact match
+ *   - min_<column> / max_<column>: numeric range, e.g. min_roe=0.15&max_pe=30
+ *   - sort: any numeric column (default score_total), order: asc | desc
+ *   - limit (max 200) / offset for paging; count is the total match count
+ *   - fields=ticker,name,pe limits the returned columns
+ *
+ * Reads the typed `screener` table the Python refresh routes keep current,
+ * never the stock_data documents.
+ */
+export default async function handler(request) {
+    if (request.method === 'OPTIONS') {
+        return new Response(null, { status: 204, headers: corsHeaders });
+    }
+
+    if (request.method !== 'GET') {
+        return jsonResponse({ error: 'Method not allowed' }, 405);
+    }
+
+    const params = new URL(request.url).searchParams;
+    const sort = params.get('sort') || 'score_total';
+    const ascending = params.get('order') === 'asc';
+    const limit = Math.min(parseInt(params.get('limit')) || 50, MAX_LIMIT);
+    const offset = Math.max(parseInt(params.get('offset')) || 0, 0);
+    const fields = params.get('fields')
+        ? params.get('fields').split(',').filter(f => COLUMNS.includes(f))
+        : COLUMNS;
+
+    if (!NUMERIC.includes(sort)) {
+        return jsonResponse({ error: `sort must be one of: ${NUMERIC.join(', ')}` }, 400);
+    }
+
+    let query = supabase
+        .from('screener')
+        .select(fields.join(', '), { count: 'exact' });
+
+    for (const column of TEXT_FILTERS) {
+        if (params.get(column)) query = query.eq(column, params.get(column));
+    }
+    for (const column of NUMERIC) {
+        const min = parseFloat(params.get(`min_${column}`));
+        const max = parseFloat(params.get(`max_${column}`));
+        if (Number.isFinite(min)) query = query.gte(column, min);
+        if (Number.isFinite(max)) query = query.lte(column, max);
+    }
+
+    const { data, count, error } = await query
+        .order(sort, { ascending, nullsFirst: false })
+        .order('ticker', { ascending: true })
+        .range(offset, offset + limit - 1);
+
+    if (error) {
+        return jsonResponse({ error: error.message }, 500);
+    }
+
+    return jsonResponse({ count, offset, limit, sort, order: ascending ? 'asc' : 'desc', rows: data });
+}
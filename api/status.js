@@ -1,16 +1,56 @@
 import { jsonResponse, corsHeaders } from './_utils.js';
+import { queueStatus } from './_queue.js';
+import { metricsSummary } from './_metrics.js';
 
 export const config = { runtime: 'edge' };
 
+/**
+ * Refresh queue status
+ *
+ * GET /api/status
+ *   - status: Processing (a worker holds a job), Waiting (jobs queued for
+ *     quota or retry backoff) or Idle
+ *   - queue_length: queued + running jobs
+ *   - batch: progress of the latest admin batch
+ *   - buckets: current tokens per upstream provider
+ *   - metrics: p50/p95/p99 latency (ms) and error counts per Python route,
+ *     route phase and upstream call over the last `hours` (default 24, max
+ *     168; hours=0 skips them for cheap polling)
+ */
 export default async function handler(request) {
     if (request.method === 'OPTIONS') {
         return new Response(null, { status: 204, headers: corsHeaders });
     }
 
-    // In serverless mode, operations complete within the request
-    return jsonResponse({
-        status: 'Idle',
-        queue_length: 0,
-        mode: 'serverless'
-    });
+    try {
+        const param = parseInt(new URL(request.url).searchParams.get('hours'));
+        const hours = Number.isNaN(param) ? 24 : Math.min(Math.max(param, 0), 168);
+        const [queue, metrics] = await Promise.all([
+            queueStatus(),
+            hours > 0 ? metricsSummary(hours) : null
+        ]);
+        const now = Date.now();
+        const buckets = queue.buckets.map(b => ({
+            provider: b.provider,
+            capacity: b.capacity,
+            // Stored level plus the refill since it was last touched
+            tokens: Math.min(b.capacity, b.tokens + (now - Date.parse(b.updated_at)) / 1000 * b.refill_per_sec),
+            per_minute: b.refill_per_sec * 60
+        }));
+
+        return jsonResponse({
+            status: queue.running > 0 ? 'Processing' : queue.queued > 0 ? 'Waiting' : 'Idle',
+            queue_length: queue.queued + queue.running,
+            queued: queue.queued,
+            running: queue.running,
+            errors: queue.errors,
+            next_run_after: queue.next_run_after,
+            batch: queue.batch,
+            buckets,
+            metrics,
+            mode: 'queue'
+        });
+    } catch (error) {
+        return jsonResponse({ error: error.message }, 500);
+    }
 }
@@ -2,7 +2,29 @@ import { supabase, jsonResponse, corsHeaders } from './_utils.js';
 
 export const config = { runtime: 'edge' };
 
-export default async function handler(request) {
+// Top-level document sections that `fields=` can select
+const FIELDS = new Set([
+    'overview', 'quote', 'income', 'balance_sheet', 'cashflow', 'history',
+    'analyst_yf', 'market', 'currency', 'last_updated'
+]);
+
+// The validators' column, aliased so it can't collide with a `fields=last_updated` projection
+const ROW_UPDATED = 'row_updated:last_updated';
+
+// Compressing tiny bodies costs more than it saves
+const MIN_COMPRESS_BYTES = 1024;
+
+/**
+ * Stock data
+ *
+ * GET /api/stock-data?ticker=AAPL&fields=overview,quote
+ *   - The stored document, or only the listed sections when `fields` is set
+ *   - ETag/Last-Modified come from `last_updated`; If-None-Match or
+ *     If-Modified-Since get a 304 after reading only that column
+ *   - Bodies are gzip-compressed when the client accepts it (brotli by the CDN)
+ *   - The access_log write runs after the response is sent
+ */
+export default async function handler(request, context) {
     if (request.method === 'OPTIONS') {
         return new Response(null, { status: 204, headers: corsHeaders });
     }
@@ -18,34 +40,136 @@ export default async function handler(request) {
         return jsonResponse({ error: 'Ticker parameter required' }, 400);
     }
 
+    const fields = parseFields(url.searchParams.get('fields'));
+    if (fields.error) {
+        return jsonResponse({ error: fields.error }, 400);
+    }
+
     try {
-        // Log access
-        await supabase
-            .from('access_log')
-            .upsert(
-                { ticker, last_accessed: new Date().toISOString() },
-                { onConflict: 'ticker' }
-            );
-
-        // Fetch stock data
+        logAccess(ticker, context);
+
+        const ifNoneMatch = request.headers.get('if-none-match');
+        const ifModifiedSince = request.headers.get('if-modified-since');
+
+        // Revalidation: check the timestamp before reading the document
+        if (ifNoneMatch || ifModifiedSince) {
+            const { data: stamp, error } = await supabase
+                .from('stock_data')
+                .select(ROW_UPDATED)
+                .eq('ticker', ticker)
+                .maybeSingle();
+            if (error) throw error;
+            if (!stamp) {
+                return jsonResponse({ error: 'Data not found locally.' }, 404);
+            }
+            const headers = validatorHeaders(ticker, stamp.row_updated, fields.list);
+            if (notModified(headers, ifNoneMatch, ifModifiedSince)) {
+                return new Response(null, { status: 304, headers });
+            }
+        }
+
+        // Only the requested sections leave the database
+        const columns = fields.list
+            ? [ROW_UPDATED, ...fields.list.map(f => `${f}:data->${f}`)].join(', ')
+            : `data, ${ROW_UPDATED}`;
         const { data, error } = await supabase
             .from('stock_data')
-            .select('data, last_updated')
+            .select(columns)
             .eq('ticker', ticker)
-            .single();
+            .maybeSingle();
 
-        if (error && error.code !== 'PGRST116') {
-            throw error;
-        }
+        if (error) throw error;
 
         if (!data) {
             return jsonResponse({ error: 'Data not found locally.' }, 404);
         }
 
-        // Return the stored JSON data
-        return jsonResponse(data.data);
+        let body;
+        if (fields.list) {
+            body = {};
+            for (const f of fields.list) {
+                if (data[f] !== null && data[f] !== undefined) body[f] = data[f];
+            }
+        } else {
+            body = data.data;
+        }
+
+        const headers = validatorHeaders(ticker, data.row_updated, fields.list);
+        return compressedJson(request, body, headers);
     } catch (error) {
         console.error('Stock data error:', error);
         return jsonResponse({ error: error.message }, 500);
     }
 }
+
+// `fields` query param -> { list } (null for the whole document) or { error }
+function parseFields(param) {
+    if (!param) return { list: null };
+    const list = [...new Set(param.split(',').map(f => f.trim()).filter(Boolean))].sort();
+    const unknown = list.filter(f => !FIELDS.has(f));
+    if (unknown.length) {
+        return { error: `Unknown fields: ${unknown.join(', ')}` };
+    }
+    return { list: list.length ? list : null };
+}
+
+// Upsert the access time without holding up the response. Without
+// waitUntil the write is still started, just not awaited.
+function logAccess(ticker, context) {
+    const write = supabase
+        .from('access_log')
+        .upsert(
+            { ticker, last_accessed: new Date().toISOString() },
+            { onConflict: 'ticker' }
+        )
+        .then(({ error }) => {
+            if (error) console.error('Access log error:', error);
+        });
+    if (context?.waitUntil) context.waitUntil(write);
+}
+
+// ETag per ticker, document version and projection
+function validatorHeaders(ticker, lastUpdated, fieldList) {
+    const modified = new Date(lastUpdated);
+    const version = Number.isNaN(modified.getTime()) ? 0 : modified.getTime();
+    const projection = fieldList ? fieldList.join('+') : 'all';
+    return {
+        ETag: `"${ticker}-${version}-${projection}"`,
+        'Last-Modified': Number.isNaN(modified.getTime()) ? new Date(0).toUTCString() : modified.toUTCString(),
+        // Always revalidate; an unchanged document then costs a 304
+        'Cache-Control': 'no-cache',
+        Vary: 'Accept-Encoding',
+        ...corsHeaders
+    };
+}
+
+function notModified(headers, ifNoneMatch, ifModifiedSince) {
+    if (ifNoneMatch) {
+        // Ignore weak prefixes added by proxies that recompress the body
+        const tags = ifNoneMatch.split(',').map(t => t.trim().replace(/^W\//, ''));
+        return tags.includes('*') || tags.includes(headers.ETag);
+    }
+    const since = Date.parse(ifModifiedSince);
+    // HTTP dates have one-second resolution
+    return Number.isFinite(since) && Date.parse(headers['Last-Modified']) <= since;
+}
+
+// JSON response, gzip-compressed when the client accepts it and the body is
+// big enough to benefit. Clients that accept brotli get the plain body,
+// which the CDN brotli-encodes; CompressionStream only offers gzip/deflate.
+function compressedJson(request, body, headers) {
+    const json = JSON.stringify(body);
+    const accepts = (request.headers.get('accept-encoding') || '').toLowerCase();
+    const responseHeaders = { 'Content-Type': 'application/json', ...headers };
+
+    const gzip = accepts.includes('gzip') && !accepts.includes('br');
+    if (json.length < MIN_COMPRESS_BYTES || !gzip || typeof CompressionStream === 'undefined') {
+        return new Response(json, { status: 200, headers: responseHeaders });
+    }
+
+    const stream = new Blob([json]).stream().pipeThrough(new CompressionStream('gzip'));
+    return new Response(stream, {
+        status: 200,
+        headers: { ...responseHeaders, 'Content-Encoding': 'gzip' }
+    });
+}
@@ -1,38 +1,146 @@
 import { supabase, jsonResponse, corsHeaders } from './_utils.js';
+import { buildIndex, searchIndex } from '../public/search.js';
 
 export const config = { runtime: 'edge' };
 
+const PAGE_SIZE = 1000;
+const MAX_LIMIT = 50;
+// How long an isolate trusts its index before re-checking its version
+const VERSION_TTL_MS = 30 * 1000;
+
+// Per-isolate index: { version, checkedAt, stocks, index }
+let cached = null;
+
+/**
+ * Stock Search API
+ *
+ * GET /api/stocks-search
+ *   - Full search index { version, count, stocks: [{symbol, name, market, sector}] }
+ *   - ETag is the index version, which changes only when the ticker set or
+ *     a stored name or sector does (not on price refreshes); send
+ *     If-None-Match to get a 304 instead of the index
+ *
+ * GET /api/stocks-search?q=infos&market=IN&limit=10
+ *   - Ranked matches (symbol exact/prefix, name word prefix, substring,
+ *     then trigram fuzzy matches) from the same index
+ */
 export default async function handler(request) {
     if (request.method === 'OPTIONS') {
         return new Response(null, { status: 204, headers: corsHeaders });
     }
 
-    // Return list of available tickers with basic info
-    const { data, error } = await supabase
-        .from('tickers')
-        .select('symbol, market')
-        .order('symbol');
+    try {
+        const url = new URL(request.url);
+        const query = url.searchParams.get('q');
+        const index = await getIndex();
 
-    if (error) {
+        if (query !== null) {
+            const limit = Math.min(parseInt(url.searchParams.get('limit')) || 10, MAX_LIMIT);
+            const results = searchIndex(index.index, query, {
+                market: url.searchParams.get('market'),
+                limit
+            });
+            return jsonResponse({ query, version: index.version, count: results.length, results });
+        }
+
+        const etag = `"${index.version}"`;
+        const headers = { ETag: etag, 'Cache-Control': 'no-cache', ...corsHeaders };
+        if (request.headers.get('if-none-match') === etag) {
+            return new Response(null, { status: 304, headers });
+        }
+        return new Response(
+            JSON.stringify({ version: index.version, count: index.stocks.length, stocks: index.stocks }),
+            { status: 200, headers: { 'Content-Type': 'application/json', ...headers } }
+        );
+    } catch (error) {
+        console.error('Stock search error:', error);
         return jsonResponse({ error: error.message }, 500);
     }
+}
 
-    // Format for search dropdown
-    const stocks = await Promise.all(data.map(async (t) => {
-        const { data: stockData } = await supabase
-            .from('stock_data')
-            .select('data')
-            .eq('ticker', t.symbol)
-            .single();
+// Ticker count, newest ticker and newest name/sector change; three tiny
+// queries instead of reading the set
+async function indexVersion() {
+    const { count, error } = await supabase
+        .from('tickers')
+        .select('symbol', { count: 'exact', head: true });
+    if (error) throw error;
 
-        const name = stockData?.data?.overview?.Name || t.symbol;
+    const { data: newest } = await supabase
+        .from('tickers')
+        .select('symbol, created_at')
+        .order('created_at', { ascending: false })
+        .limit(1)
+        .maybeSingle();
+
+    // search_updated_at moves only when a document's name or sector changes
+    // (touch_search_fields in supabase-schema.sql)
+    const { data: updated } = await supabase
+        .from('stock_data')
+        .select('search_updated_at')
+        .order('search_updated_at', { ascending: false, nullsFirst: false })
+        .limit(1)
+        .maybeSingle();
 
-        return {
-            symbol: t.symbol,
-            name: name,
-            market: t.market
-        };
-    }));
+    const stamp = [
+        newest ? `${newest.symbol}@${Date.parse(newest.created_at) || 0}` : '',
+        updated ? Date.parse(updated.search_updated_at) || 0 : 0
+    ].join('|');
+    return `${count || 0}-${hash(stamp)}`;
+}
 
-    return jsonResponse({ stocks });
+async function getIndex() {
+    const now = Date.now();
+    if (cached && now - cached.checkedAt < VERSION_TTL_MS) return cached;
+
+    const version = await indexVersion();
+    if (cached && cached.version === version) {
+        cached.checkedAt = now;
+        return cached;
+    }
+
+    const stocks = await buildStocks();
+    cached = { version, checkedAt: now, stocks, index: buildIndex(stocks) };
+    return cached;
+}
+
+// One projection of name/sector per page instead of a full document per ticker
+async function buildStocks() {
+    const tickers = await selectAll('tickers', 'symbol, market', 'symbol');
+    const details = await selectAll(
+        'stock_data',
+        'ticker, name:data->overview->>Name, sector:data->overview->>Sector',
+        'ticker'
+    );
+    const byTicker = new Map(details.map(d => [d.ticker, d]));
+
+    return tickers.map(t => {
+        const detail = byTicker.get(t.symbol) || {};
+        const sector = detail.sector && detail.sector !== 'N/A' && detail.sector !== 'None' ? detail.sector : null;
+        return { symbol: t.symbol, name: detail.name || t.symbol, market: t.market, sector };
+    });
+}
+
+async function selectAll(table, select, orderBy) {
+    const rows = [];
+    for (let start = 0; ; start += PAGE_SIZE) {
+        const { data, error } = await supabase
+            .from(table)
+            .select(select)
+            .order(orderBy)
+            .range(start, start + PAGE_SIZE - 1);
+        if (error) throw error;
+        rows.push(...data);
+        if (data.length < PAGE_SIZE) return rows;
+    }
+}
+
+// Short, stable string hash (FNV-1a) for the ETag
+function hash(text) {
+    let h = 0x811c9dc5;
+    for (let i = 0; i < text.length; i++) {
+        h ^= text.charCodeAt(i);
+        h = Math.imul(h, 0x01000193);
+    }
+    return (h >>> 0).toString(36);
 }
@@ -2,12 +2,60 @@
 Python API route to validate if a stock ticker exists using yfinance.
 Returns basic info (name, price) if valid, or error if not found.
 Used before Alpha Vantage calls to avoid wasting API quota.
+
+GET  /api/validate-ticker?ticker=MSFT
+POST /api/validate-ticker {"tickers": ["TCS.NS", "INFY.NS", ...], "stream": true}
+    Validates a whole watchlist in one call with concurrent quote lookups.
+    With `stream` (the default) results are written as NDJSON lines as they
+    complete.
+
+Both paths use the light chart-endpoint quote (see _quote.py), so neither
+imports yfinance or pandas.
 """
 from http.server import BaseHTTPRequestHandler
 import json
-import yfinance as yf
+import os
+import sys
 from urllib.parse import parse_qs, urlparse
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _quote import quote_cache, quote_info
+from _metrics import RequestMetrics
+
+MAX_BATCH = 500
+BATCH_WORKERS = 8
+
+
+def validation_result(ticker, info):
+    # Check if we got valid data with an actual price
+    info = info or {}
+    price = info.get('regularMarketPrice') or info.get('currentPrice')
+    if not price or price == 0:
+        # yfinance returns empty info or 0 price for invalid tickers
+        return {
+            'valid': False,
+            'ticker': ticker,
+            'error': f'Ticker "{ticker}" not found or has no price data'
+        }
+
+    return {
+        'valid': True,
+        'ticker': ticker,
+        'name': info.get('longName') or info.get('shortName') or ticker,
+        'price': price,
+        'currency': info.get('currency', 'USD'),
+        'exchange': info.get('exchange', 'Unknown')
+    }
+
+
+def validate_batch(tickers):
+    """Yield one validation result per ticker, in completion order."""
+    for ticker, info, error in quote_cache.iter_many(tickers, fetch=quote_info, max_workers=BATCH_WORKERS):
+        if error:
+            yield {'valid': False, 'ticker': ticker, 'error': error}
+        else:
+            yield validation_result(ticker, info)
+
 
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
@@ -18,6 +66,7 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
 
     def do_GET(self):
+        self.metrics = RequestMetrics('validate-ticker')
         try:
             query = parse_qs(urlparse(self.path).query)
             ticker = query.get('ticker', [''])[0].upper().strip()
@@ -27,36 +76,72 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             print(f"[validate] Checking if {ticker} exists...")
-            stock = yf.Ticker(ticker)
-            info = stock.info
+            info = quote_cache.get(ticker, fetch=self.fetch_quote)
+            self.send_json(validation_result(ticker, info))
             
-            # Check if we got valid data with an actual price
-            price = info.get('regularMarketPrice') or info.get('currentPrice')
-            if not info or not price or price == 0:
-                # yfinance returns empty info or 0 price for invalid tickers
+        except Exception as e:
+            print(f"[validate] Error: {str(e)}")
+            self.send_json({'valid': False, 'error': str(e)}, 500)
+
+    def fetch_quote(self, symbol):
+        # Cache misses only, so hits aren't timed as upstream calls
+        with self.metrics.upstream('yahoo.chart'):
+            return quote_info(symbol)
+
+    def do_POST(self):
+        self.metrics = RequestMetrics('validate-ticker-batch')
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            tickers = list(dict.fromkeys(
+                str(t).upper().strip() for t in body.get('tickers', []) if str(t).strip()
+            ))
+
+            if not tickers:
+                self.send_json({'error': 'Tickers required'}, 400)
+                return
+            if len(tickers) > MAX_BATCH:
+                self.send_json({'error': f'At most {MAX_BATCH} tickers per request'}, 400)
+                return
+
+            print(f"[validate] Checking {len(tickers)} tickers...")
+            results = validate_batch(tickers)
+
+            if not body.get('stream', True):
+                with self.metrics.phase('validate'):
+                    results = list(results)
                 self.send_json({
-                    'valid': False, 
-                    'error': f'Ticker "{ticker}" not found or has no price data'
+                    'results': results,
+                    'valid': sum(1 for r in results if r['valid']),
+                    'total': len(results)
                 })
                 return
-            
-            # Return basic validation info
-            self.send_json({
-                'valid': True,
-                'ticker': ticker,
-                'name': info.get('longName') or info.get('shortName') or ticker,
-                'price': info.get('regularMarketPrice') or info.get('currentPrice'),
-                'currency': info.get('currency', 'USD'),
-                'exchange': info.get('exchange', 'Unknown')
-            })
-            
+
+            # Stream one JSON line per ticker as it completes
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            with self.metrics.phase('validate'):
+                for result in results:
+                    self.wfile.write((json.dumps(result) + '\n').encode())
+                    self.wfile.flush()
+            self.metrics.finish(200)
+
         except Exception as e:
             print(f"[validate] Error: {str(e)}")
-            self.send_json({'valid': False, 'error': str(e)}, 500)
+            self.send_json({'error': str(e)}, 500)
 
     def send_json(self, data, status=200):
+        metrics = getattr(self, 'metrics', None)
+        body = json.dumps(data).encode()
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self.send_header('Access-Control-Allow-Origin', '*')
+        if metrics:
+            self.send_header('Server-Timing', metrics.server_timing())
         self.end_headers()
-        self.wfile.write(json.dumps(data).encode())
+        self.wfile.write(body)
+        if metrics:
+            metrics.finish(status)
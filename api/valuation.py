@@ -0,0 +1,198 @@
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _valuation import INPUT_SELECT, valuation_inputs, value_ticker, input_hash
+from _checkpoint import list_tickers
+from _refresh import chunked
+
+# Grid axes in UI units: percentages for rates, whole years. 'a:b:step' is an
+# inclusive range, 'a,b,c' a list.
+DEFAULT_AXES = {
+    'growth': '0:25:2.5',
+    'discount': '8:16:1',
+    'terminal': '2:4:1',
+    'years': '5,10',
+    'pat_growth': '-10:30:5',
+    'exit_pe': '10:40:5',
+    'proj_years': '1:5:1',
+}
+DEFAULT_MC = {'mc': '5000', 'mc_growth': '10,5', 'mc_discount': '12,2', 'mc_terminal': '3,1', 'mc_years': '10'}
+MAX_GRID_CELLS = 50000
+MAX_DRAWS = 100000
+BATCH_PAGE = 200
+CACHE_RETENTION_DAYS = 30
+
+# Process-wide results cache: (ticker, input_hash) -> result
+_results = OrderedDict()
+_RESULTS_MAXSIZE = 256
+
+
+def parse_axis(text):
+    values = []
+    for part in text.split(','):
+        if ':' in part:
+            start, stop, step = (float(v) for v in part.split(':'))
+            if step <= 0:
+                raise ValueError(f'Bad range step in {part!r}')
+            values.extend(round(start + i * step, 6) for i in range(int((stop - start) / step + 1e-9) + 1))
+        elif part.strip():
+            values.append(float(part))
+    if not values:
+        raise ValueError('Empty axis')
+    return values
+
+
+def build_params(query):
+    """Normalized valuation parameters (rates as decimals) from query args."""
+    arg = lambda name, defaults: query.get(name, [defaults[name]])[0]
+    pct = lambda name: [round(v / 100, 6) for v in parse_axis(arg(name, DEFAULT_AXES))]
+    years = lambda name: [int(v) for v in parse_axis(arg(name, DEFAULT_AXES))]
+    pair = lambda name: tuple(v / 100 for v in parse_axis(arg(name, DEFAULT_MC))[:2])
+
+    params = {
+        'dcf': {'growth': pct('growth'), 'discount': pct('discount'),
+                'terminal': pct('terminal'), 'years': years('years')},
+        'monte_carlo': {'draws': min(int(arg('mc', DEFAULT_MC)), MAX_DRAWS),
+                        'growth': pair('mc_growth'), 'discount': pair('mc_discount'),
+                        'terminal': pair('mc_terminal'), 'years': int(arg('mc_years', DEFAULT_MC)),
+                        'seed': int(query.get('seed', ['42'])[0])},
+        'projection': {'pat_growth': pct('pat_growth'), 'exit_pe': parse_axis(arg('exit_pe', DEFAULT_AXES)),
+                       'years': years('proj_years')},
+    }
+    cells = 1
+    for axis in params['dcf'].values():
+        cells *= len(axis)
+    if cells > MAX_GRID_CELLS or min(params['dcf']['years'] + params['projection']['years']) < 1:
+        raise ValueError(f'Grid must have at most {MAX_GRID_CELLS} cells and years >= 1')
+    return params
+
+
+def _remember(key, result):
+    _results[key] = result
+    _results.move_to_end(key)
+    while len(_results) > _RESULTS_MAXSIZE:
+        _results.popitem(last=False)
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+
+    def do_GET(self):
+        """DCF sensitivity grid, Monte Carlo bands and P/E projections.
+
+        GET /api/valuation?ticker=TCS.NS[&growth=0:25:2.5&discount=8:16:1&terminal=2:4:1&years=5,10]
+            [&mc=5000&mc_growth=10,5&mc_discount=12,2&mc_terminal=3,1&mc_years=10&seed=42]
+            [&pat_growth=-10:30:5&exit_pe=10:40:5&proj_years=1:5:1]
+        GET /api/valuation?batch=1
+            Values every stored ticker with the given (or default) parameters
+            into valuation_cache; run by the overnight cron.
+
+        Results are cached per ticker and hash of (stored inputs, parameters),
+        in process and in the valuation_cache table.
+        """
+        try:
+            query = parse_qs(urlparse(self.path).query)
+            ticker = query.get('ticker', [''])[0].upper().strip()
+            batch = query.get('batch', ['0'])[0] in ('1', 'true')
+
+            if not ticker and not batch:
+                return self.send_json({'error': 'Ticker parameter required'}, 400)
+
+            try:
+                params = build_params(query)
+            except ValueError as e:
+                return self.send_json({'error': f'Invalid parameters: {e}'}, 400)
+
+            from supabase import create_client
+
+            supabase_url = os.environ.get('SUPABASE_URL', '')
+            supabase_key = os.environ.get('SUPABASE_SERVICE_KEY', os.environ.get('SUPABASE_KEY', ''))
+
+            if not supabase_url or not supabase_key:
+                return self.send_json({'error': 'Supabase credentials not configured'}, 500)
+
+            supabase = create_client(supabase_url, supabase_key)
+
+            if batch:
+                return self.send_json(self.value_all(supabase, params))
+
+            result = supabase.table('stock_data').select(INPUT_SELECT).eq('ticker', ticker).execute()
+            if not result.data:
+                return self.send_json({'error': f'Ticker {ticker} not found in database. Load it first.'}, 404)
+
+            inputs = valuation_inputs(result.data[0])
+            key = input_hash(inputs, params)
+            cached = 'memory'
+            valuation = _results.get((ticker, key))
+
+            if valuation is None:
+                cached = 'store'
+                stored = supabase.table('valuation_cache').select('result') \
+                    .eq('ticker', ticker).eq('input_hash', key).execute()
+                valuation = stored.data[0]['result'] if stored.data else None
+
+            if valuation is None:
+                cached = None
+                valuation = dict(value_ticker(inputs, params), computed_at=datetime.now().isoformat())
+                supabase.table('valuation_cache').upsert(
+                    {'ticker': ticker, 'input_hash': key, 'result': valuation, 'computed_at': valuation['computed_at']},
+                    on_conflict='ticker,input_hash'
+                ).execute()
+
+            _remember((ticker, key), valuation)
+            return self.send_json({'ticker': ticker, 'input_hash': key, 'cached': cached, **valuation})
+
+        except Exception as e:
+            return self.send_json({'error': str(e)}, 500)
+
+    def value_all(self, supabase, params):
+        """Value every ticker, one select and one cache upsert per page."""
+        start = time.perf_counter()
+        tickers = sorted(list_tickers(supabase))
+        computed_at = datetime.now().isoformat()
+        valued = skipped = 0
+
+        for page in chunked(tickers, BATCH_PAGE):
+            result = supabase.table('stock_data').select(INPUT_SELECT).in_('ticker', page).execute()
+            rows = []
+            for row in result.data or []:
+                inputs = valuation_inputs(row)
+                valuation = dict(value_ticker(inputs, params), computed_at=computed_at)
+                if 'intrinsic' not in valuation['dcf']:
+                    skipped += 1
+                rows.append({'ticker': row['ticker'], 'input_hash': input_hash(inputs, params),
+                             'result': valuation, 'computed_at': computed_at})
+            if rows:
+                supabase.table('valuation_cache').upsert(rows, on_conflict='ticker,input_hash').execute()
+            valued += len(rows)
+
+        # Results for inputs that have since changed are never looked up again
+        cutoff = (datetime.now() - timedelta(days=CACHE_RETENTION_DAYS)).isoformat()
+        supabase.table('valuation_cache').delete().lt('computed_at', cutoff).execute()
+
+        return {
+            'message': f'Valued {valued} tickers',
+            'valued': valued,
+            'no_dcf': skipped,
+            'elapsed_s': round(time.perf_counter() - start, 2),
+            'timestamp': computed_at,
+        }
+
+    def send_json(self, data, status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(json.dumps(data).encode())
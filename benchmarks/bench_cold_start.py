@@ -0,0 +1,85 @@
+"""
+Startup benchmark: import cost of each Python route on a cold interpreter.
+
+For every route this starts a fresh Python process with `-X importtime`,
+loads the route module (what Vercel does before the first request), then
+imports the heavy modules its main request path pulls in lazily. It reports
+wall time for both stages, the heaviest top-level imports, and whether the
+route stays within its startup budget.
+
+    python benchmarks/bench_cold_start.py [--top 5]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+
+# (label, route file, modules imported lazily on the main request path, budget in ms)
+ROUTES = [
+    ('validate-ticker', 'validate-ticker.py', [], 150),
+    ('quick-refresh', 'quick-refresh.py', ['supabase', 'numpy'], 1000),
+    ('quick-refresh mode=full', 'quick-refresh.py', ['supabase', 'yfinance'], 3000),
+    ('fetch-indian-stock', 'fetch-indian-stock.py', ['yfinance'], 3000),
+    ('daily-refresh', 'daily-refresh.py', ['yfinance', 'supabase'], 3000),
+]
+
+SNIPPET = '''
+import importlib, importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("route", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+loaded = time.perf_counter()
+for name in sys.argv[2:]:
+    importlib.import_module(name)
+done = time.perf_counter()
+print(json.dumps({"load_ms": (loaded - start) * 1000, "path_ms": (done - loaded) * 1000}))
+'''
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+
+def measure(route_file, lazy_modules):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SNIPPET, os.path.join(API_DIR, route_file), *lazy_modules],
+        capture_output=True, text=True, check=True, cwd=API_DIR,
+    )
+    timings = json.loads(proc.stdout.strip().splitlines()[-1])
+    top_level = {}
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match and len(match.group(3)) == 0:
+            # A package's submodules can also show at level 0; keep the largest per root package
+            root = match.group(4).split('.')[0]
+            top_level[root] = max(top_level.get(root, 0), int(match.group(2)) / 1000)
+    return timings, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    over_budget = []
+    print(f"{'route':<26} {'load_ms':>8} {'path_ms':>8} {'total_ms':>9} {'budget':>7}  heaviest imports (cumulative ms)")
+    for label, route_file, lazy_modules, budget in ROUTES:
+        timings, top_level = measure(route_file, lazy_modules)
+        total = timings['load_ms'] + timings['path_ms']
+        heaviest = sorted(top_level.items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        status = 'ok' if total <= budget else 'OVER'
+        if status == 'OVER':
+            over_budget.append(label)
+        print(f"{label:<26} {timings['load_ms']:>8.1f} {timings['path_ms']:>8.1f} {total:>9.1f} {budget:>5} {status:<4} "
+              + ', '.join(f'{name} {ms:.0f}' for name, ms in heaviest))
+
+    if over_budget:
+        print(f"\nOver budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: daily refresh wall time against universe size.
+
+Compares the old one-ticker-at-a-time loop (info + history + update per
+ticker) with the batched engine in api/_refresh.py, using a fake yfinance
+module whose calls sleep for a fixed simulated network latency.
+
+    python benchmarks/bench_daily_refresh.py [sizes...]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from _info_cache import InfoCache  # noqa: E402
+from _refresh import run_refresh, to_yf_symbol  # noqa: E402
+
+INFO_LATENCY = 0.02      # per Ticker.info call
+HISTORY_LATENCY = 0.02   # per Ticker.history call
+DOWNLOAD_LATENCY = 0.2   # per yf.download call, plus a small per-symbol cost
+DOWNLOAD_PER_SYMBOL = 0.001
+WRITE_LATENCY = 0.02     # per Supabase request
+
+
+def _frame(days=5):
+    index = pd.date_range(end='2024-06-28', periods=days, freq='B')
+    close = np.linspace(100, 110, days)
+    return pd.DataFrame({
+        'Open': close - 1, 'High': close + 2, 'Low': close - 2,
+        'Close': close, 'Volume': np.full(days, 1_000_000),
+    }, index=index)
+
+
+class FakeTicker:
+    def __init__(self, symbol):
+        self.symbol = symbol
+
+    @property
+    def info(self):
+        time.sleep(INFO_LATENCY)
+        return {'symbol': self.symbol, 'currentPrice': 110.0, 'previousClose': 109.0}
+
+    def history(self, period='5d', interval='1d'):
+        time.sleep(HISTORY_LATENCY)
+        return _frame()
+
+
+class FakeYF:
+    Ticker = FakeTicker
+
+    @staticmethod
+    def download(symbols, **kwargs):
+        time.sleep(DOWNLOAD_LATENCY + DOWNLOAD_PER_SYMBOL * len(symbols))
+        return pd.concat({symbol: _frame() for symbol in symbols}, axis=1)
+
+
+def universe(size):
+    return [{'ticker': f'SYM{i}.NS', 'data': {}} for i in range(size)]
+
+
+def run_legacy(stocks):
+    # The original route: modify each stored document in place, one update per ticker
+    for stock in stocks:
+        yf_stock = FakeYF.Ticker(to_yf_symbol(stock['ticker']))
+        info = yf_stock.info
+        current_price = info.get('currentPrice') or info.get('regularMarketPrice')
+        hist = yf_stock.history(period='5d')
+        latest = hist.iloc[-1]
+        latest_date = hist.index[-1].strftime('%Y-%m-%d')
+
+        existing_data = stock['data']
+        if 'quote' not in existing_data:
+            existing_data['quote'] = {'Global Quote': {}}
+        existing_data['quote']['Global Quote']['05. price'] = str(current_price)
+        existing_data['quote']['Global Quote']['08. previous close'] = str(info.get('previousClose', current_price))
+
+        history_key = 'Monthly Adjusted Time Series'
+        if 'history' not in existing_data:
+            existing_data['history'] = {history_key: {}}
+        if history_key not in existing_data['history']:
+            existing_data['history'][history_key] = {}
+        existing_data['history'][history_key][latest_date] = {
+            '1. open': str(latest.get('Open', current_price)),
+            '2. high': str(latest.get('High', current_price)),
+            '3. low': str(latest.get('Low', current_price)),
+            '4. close': str(latest.get('Close', current_price)),
+            '5. adjusted close': str(latest.get('Close', current_price)),
+            '6. volume': str(int(latest.get('Volume', 0))),
+        }
+        existing_data['last_updated'] = datetime.now().isoformat()
+        time.sleep(WRITE_LATENCY)  # update({'data': existing_data})
+
+
+def run_batched(stocks):
+    # Fresh, memory-only cache so every run measures upstream fetches
+    cache = InfoCache(store_factory=None)
+    return run_refresh(FakeYF, stocks, lambda rows: time.sleep(WRITE_LATENCY), cache=cache)
+
+
+def main(sizes):
+    print(f"{'tickers':>8} {'legacy_s':>10} {'batched_s':>10} {'speedup':>8} {'tickers/s':>10}")
+    for size in sizes:
+        start = time.perf_counter()
+        run_legacy(universe(size))
+        legacy = time.perf_counter() - start
+
+        start = time.perf_counter()
+        summary = run_batched(universe(size))
+        batched = time.perf_counter() - start
+        assert len(summary['updated']) == size, summary['errors'][:5]
+
+        print(f"{size:>8} {legacy:>10.2f} {batched:>10.2f} {legacy / batched:>7.1f}x "
+              f"{summary['stats']['tickers_per_s']:>10}")
+
+
+if __name__ == '__main__':
+    main([int(s) for s in sys.argv[1:]] or [10, 50, 100, 250, 500])
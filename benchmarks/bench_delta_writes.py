@@ -0,0 +1,103 @@
+"""
+Benchmark: bytes transferred and latency per ticker for a quick refresh,
+full-document rewrite vs. delta patch.
+
+The full path reads the stored document, updates it and writes it back with
+`.update({'data': ...})`. The delta path reads only the market flag and sends
+a patch to `patch_stock_data`. Latency is CPU time for (de)serialization plus
+a modelled network cost of RTT + bytes / bandwidth per request.
+
+    python benchmarks/bench_delta_writes.py [--rtt-ms 40] [--mbps 20]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from _patch import HISTORY_KEY, apply_patch, build_patch, history_point, overview_fields, quote_fields  # noqa: E402
+
+INFO = {
+    'currentPrice': 3812.5, 'previousClose': 3790.1, 'trailingPE': 29.4, 'forwardPE': 26.1,
+    'marketCap': 13800000000000, 'trailingEps': 129.7, 'fiftyTwoWeekHigh': 4254.0,
+    'fiftyTwoWeekLow': 3311.0, 'dividendYield': 1.4, 'beta': 0.52, 'priceToBook': 14.2,
+}
+BAR = {'Open': 3795.0, 'High': 3820.0, 'Low': 3780.5, 'Close': 3812.5, 'Volume': 2134500}
+
+
+def synthetic_document(years):
+    history = {}
+    for i in range(years * 12):
+        year, month = 2024 - i // 12, 12 - i % 12
+        price = 1000 + i
+        history[f'{year}-{month:02d}-01'] = {
+            '1. open': str(price * 0.98), '2. high': str(price * 1.05), '3. low': str(price * 0.95),
+            '4. close': str(float(price)), '5. adjusted close': str(float(price)),
+            '6. volume': str(12345678 + i), '7. dividend amount': '0.0',
+        }
+    report = lambda n, fields: [{'fiscalDateEnding': f'{2024 - k}-03-31', **{f: str(1.2345e11 * (k + 1)) for f in fields}}
+                                for k in range(n)]
+    income_fields = ['totalRevenue', 'grossProfit', 'operatingIncome', 'netIncome', 'ebitda']
+    balance_fields = ['totalAssets', 'totalLiabilities', 'totalShareholderEquity', 'shortTermDebt', 'longTermDebt']
+    return {
+        'overview': {f'Field{k}': 'x' * 20 for k in range(40)} | {'Description': 'Lorem ipsum ' * 120},
+        'quote': {'Global Quote': {f'0{k}. field': '123.45' for k in range(1, 10)}},
+        'income': {'annualReports': report(4, income_fields), 'quarterlyReports': report(5, income_fields)},
+        'balance_sheet': {'annualReports': report(4, balance_fields), 'quarterlyReports': report(5, balance_fields)},
+        'history': {HISTORY_KEY: history},
+        'analyst_yf': {'recommendationKey': 'buy'},
+        'market': 'IN', 'currency': 'INR', 'usd_inr_rate': 83.2,
+        'last_updated': '2024-06-27T09:00:00',
+    }
+
+
+def make_patch():
+    return build_patch(
+        'TCS.NS',
+        quote=quote_fields(INFO, INFO['currentPrice'], with_change=True),
+        overview=overview_fields(INFO),
+        history={'2024-06-28': history_point(BAR, INFO['currentPrice'])},
+    )
+
+
+def full_rewrite(stored):
+    start = time.perf_counter()
+    data = json.loads(stored)                       # select('data')
+    apply_patch(data, make_patch())
+    body = json.dumps({'data': data})               # update({'data': ...})
+    return len(stored), len(body), time.perf_counter() - start
+
+
+def delta_patch():
+    start = time.perf_counter()
+    read = json.dumps([{'market': 'IN'}])           # select('market:data->>market')
+    json.loads(read)
+    body = json.dumps({'patches': [make_patch()]})  # rpc('patch_stock_data')
+    return len(read), len(body), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rtt-ms', type=float, default=40.0)
+    parser.add_argument('--mbps', type=float, default=20.0)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    def latency_ms(read, written, cpu):
+        transfer = (read + written) * 8 / (args.mbps * 1e6)
+        return (cpu + transfer) * 1000 + 2 * args.rtt_ms
+
+    print(f"{'years':>5} {'path':>6} {'read_B':>9} {'write_B':>9} {'cpu_ms':>8} {'latency_ms':>11}")
+    for years in (5, 10, 20, 30):
+        stored = json.dumps(synthetic_document(years))
+        for name, fn in (('full', lambda: full_rewrite(stored)), ('delta', delta_patch)):
+            runs = [fn() for _ in range(args.repeat)]
+            read, written = runs[0][0], runs[0][1]
+            cpu = min(r[2] for r in runs)
+            print(f"{years:>5} {name:>6} {read:>9} {written:>9} {cpu * 1000:>8.3f} "
+                  f"{latency_ms(read, written, cpu):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Micro-benchmark: DataFrame -> JSON conversion in fetch-indian-stock.py.
+
+Runs the previous row-by-row builders (iterrows / per-cell df.loc) and the
+vectorized ones over synthetic 30-year monthly and daily histories and
+statement frames, checks the JSON output is byte-for-byte identical, and
+reports the time per call.
+
+    python benchmarks/bench_fetch_builders.py
+"""
+import importlib.util
+import json
+import os
+import timeit
+
+import numpy as np
+import pandas as pd
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+spec = importlib.util.spec_from_file_location('fetch_indian_stock', os.path.join(API_DIR, 'fetch-indian-stock.py'))
+fetch = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fetch)
+
+
+# --- Previous implementations, kept here as the reference output ---
+
+def legacy_history(hist):
+    monthly_data = {}
+    try:
+        for date, row in hist.iterrows():
+            date_str = date.strftime('%Y-%m-%d')
+            monthly_data[date_str] = {
+                '1. open': str(row.get('Open', 0)),
+                '2. high': str(row.get('High', 0)),
+                '3. low': str(row.get('Low', 0)),
+                '4. close': str(row.get('Close', 0)),
+                '5. adjusted close': str(row.get('Close', 0)),
+                '6. volume': str(int(row.get('Volume', 0))),
+                '7. dividend amount': str(row.get('Dividends', 0))
+            }
+    except Exception as e:
+        print(f"[legacy] History error: {e}")
+    return monthly_data
+
+
+def legacy_income(df):
+    reports = []
+    for col in df.columns:
+        def safe_get(key):
+            try:
+                return str(df.loc[key, col])
+            except:  # noqa: E722
+                return '0'
+        reports.append({
+            'fiscalDateEnding': col.strftime('%Y-%m-%d') if hasattr(col, 'strftime') else str(col),
+            'totalRevenue': safe_get('Total Revenue'),
+            'grossProfit': safe_get('Gross Profit'),
+            'operatingIncome': safe_get('Operating Income'),
+            'netIncome': safe_get('Net Income'),
+            'ebitda': safe_get('EBITDA'),
+        })
+    return reports
+
+
+def legacy_balance_sheet(df):
+    reports = []
+    for col in df.columns:
+        def safe_get(key):
+            try:
+                return str(df.loc[key, col])
+            except:  # noqa: E722
+                return '0'
+        total_liabilities = '0'
+        for key in ['Total Liabilities Net Minority Interest', 'Total Liabilities']:
+            try:
+                total_liabilities = str(df.loc[key, col])
+                break
+            except:  # noqa: E722
+                continue
+        reports.append({
+            'fiscalDateEnding': col.strftime('%Y-%m-%d') if hasattr(col, 'strftime') else str(col),
+            'totalAssets': safe_get('Total Assets'),
+            'totalLiabilities': total_liabilities,
+            'totalShareholderEquity': safe_get('Stockholders Equity'),
+            'shortTermDebt': safe_get('Current Debt'),
+            'longTermDebt': safe_get('Long Term Debt'),
+        })
+    return reports
+
+
+# --- Synthetic inputs ---
+
+def synthetic_history(years, freq):
+    rng = np.random.default_rng(years)
+    index = pd.date_range(end='2024-06-01', periods=years * (12 if freq == 'MS' else 252), freq=freq,
+                          tz='Asia/Kolkata')
+    close = 100 * np.exp(np.cumsum(rng.normal(0.005, 0.06, len(index))))
+    dividends = np.where(rng.random(len(index)) < 0.05, rng.random(len(index)) * 10, 0.0)
+    return pd.DataFrame({
+        'Open': close * rng.uniform(0.95, 1.05, len(index)),
+        'High': close * 1.08, 'Low': close * 0.92, 'Close': close,
+        'Volume': rng.integers(1e5, 1e8, len(index)),
+        'Dividends': dividends, 'Stock Splits': 0.0,
+    }, index=index)
+
+
+def synthetic_statement(periods, with_total_liabilities=False):
+    rng = np.random.default_rng(periods)
+    items = [f'Line Item {i}' for i in range(60)] + [
+        'Total Revenue', 'Gross Profit', 'Operating Income', 'Net Income', 'Total Assets',
+        'Stockholders Equity', 'Current Debt',
+    ] + (['Total Liabilities'] if with_total_liabilities else [])
+    columns = pd.date_range(end='2024-03-31', periods=periods, freq='YE-MAR')[::-1]
+    values = rng.normal(1e10, 3e9, (len(items), periods))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    return pd.DataFrame(values, index=items, columns=columns)
+
+
+def check(name, old, new):
+    old_json, new_json = json.dumps(old, default=str), json.dumps(new, default=str)
+    assert old_json == new_json, f'{name}: output differs'
+    return len(new_json)
+
+
+def bench(name, old_fn, new_fn, number):
+    size = check(name, old_fn(), new_fn())
+    old_t = min(timeit.repeat(old_fn, number=number, repeat=3)) / number
+    new_t = min(timeit.repeat(new_fn, number=number, repeat=3)) / number
+    print(f"{name:<28} {size:>10} {old_t * 1000:>10.3f} {new_t * 1000:>10.3f} {old_t / new_t:>8.1f}x")
+
+
+def main():
+    print(f"{'case':<28} {'json_B':>10} {'old_ms':>10} {'new_ms':>10} {'speedup':>9}")
+    monthly = synthetic_history(30, 'MS')
+    daily = synthetic_history(30, 'B')
+    bench('history 30y monthly', lambda: legacy_history(monthly), lambda: fetch.history_points(monthly), 20)
+    bench('history 30y daily', lambda: legacy_history(daily), lambda: fetch.history_points(daily), 2)
+
+    annual, quarterly = synthetic_statement(4), synthetic_statement(5, with_total_liabilities=True)
+    income_fields = {'totalRevenue': ['Total Revenue'], 'grossProfit': ['Gross Profit'],
+                     'operatingIncome': ['Operating Income'], 'netIncome': ['Net Income'], 'ebitda': ['EBITDA']}
+    balance_fields = {'totalAssets': ['Total Assets'],
+                      'totalLiabilities': ['Total Liabilities Net Minority Interest', 'Total Liabilities'],
+                      'totalShareholderEquity': ['Stockholders Equity'], 'shortTermDebt': ['Current Debt'],
+                      'longTermDebt': ['Long Term Debt']}
+    bench('income annual', lambda: legacy_income(annual),
+          lambda: fetch.statement_reports(annual, income_fields), 200)
+    bench('balance sheet quarterly', lambda: legacy_balance_sheet(quarterly),
+          lambda: fetch.statement_reports(quarterly, balance_fields), 200)
+
+    # Edge cases: missing columns, a NaN volume, mixed dtypes
+    sparse = monthly.drop(columns=['Dividends', 'High']).astype({'Close': 'int64'})
+    sparse.iloc[100, sparse.columns.get_loc('Volume')] = np.nan
+    check('history edge cases', legacy_history(sparse), fetch.history_points(sparse))
+    mixed = annual.astype({annual.columns[0]: object})
+    check('statement mixed dtypes', legacy_income(mixed), fetch.statement_reports(mixed, income_fields))
+
+
+if __name__ == '__main__':
+    main()
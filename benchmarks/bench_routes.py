@@ -0,0 +1,173 @@
+"""
+Benchmark suite: the Python routes end to end, offline.
+
+Drives the real handlers through synthetic universes with the replay
+harness in benchmarks/replay.py (no Yahoo, exchangerate-api or Supabase
+traffic) and reports, per route and universe size, wall time, CPU time,
+peak Python memory, Supabase requests, bytes written to Supabase and
+response bytes. Each run starts from a seeded universe (documents, monthly
+bars and indicator state already stored) with empty caches.
+
+    daily-refresh        one invocation covering the whole universe
+    quick-refresh        one light refresh per ticker
+    quick-refresh-full   one mode=full refresh per ticker
+    fetch-indian-stock   one full fetch per ticker
+    validate-ticker      POST batches of up to 500, streamed
+
+Latency is off by default so the numbers are our own CPU cost; --latency 1
+adds the recorded (or synthetic) per-call latency. --save writes the
+results as JSON and --compare fails when a route got slower or heavier than
+a saved baseline:
+
+    python benchmarks/bench_routes.py --sizes 10 100 1000 5000
+    python benchmarks/bench_routes.py --save baseline.json
+    python benchmarks/bench_routes.py --compare baseline.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from replay import Cassette, Harness, SyntheticMarket
+
+ROUTES = ('daily-refresh', 'quick-refresh', 'quick-refresh-full', 'fetch-indian-stock', 'validate-ticker')
+VALIDATE_BATCH = 500
+
+# Compared against the baseline by --compare
+GATED = ('cpu_s', 'peak_mb', 'db_written_kb', 'db_requests')
+
+
+def universe(size):
+    # Mostly NSE listings, with US tickers mixed in for the routes that serve both
+    return [f'SYM{i:04d}' if i % 4 == 3 else f'SYM{i:04d}.NS' for i in range(size)]
+
+
+def drive(harness, route, tickers):
+    """Run `route` over `tickers`; returns (responses, response bytes, failures)."""
+    if route == 'daily-refresh':
+        calls = [lambda: harness.get(route, f'limit={len(tickers)}&budget=3600&reset=1')]
+    elif route == 'validate-ticker':
+        calls = [lambda batch=tickers[i:i + VALIDATE_BATCH]: harness.post(route, {'tickers': batch})
+                 for i in range(0, len(tickers), VALIDATE_BATCH)]
+    elif route == 'fetch-indian-stock':
+        calls = [lambda t=t: harness.get(route, f'ticker={t.split(".")[0]}') for t in tickers]
+    else:
+        mode = '&mode=full' if route == 'quick-refresh-full' else ''
+        calls = [lambda t=t: harness.get('quick-refresh', f'ticker={t}{mode}') for t in tickers]
+
+    size = failures = 0
+    for call in calls:
+        status, body = call()
+        size += len(body)
+        failures += status != 200
+    return len(calls), size, failures
+
+
+def seeded(source, tickers):
+    """A store holding the seeded universe; each run works on a copy."""
+    with Harness(source) as harness:
+        harness.seed(tickers)
+        return harness.db
+
+
+def measure(source, db, route, tickers, latency, memory):
+    with Harness(source, db=db.copy(), latency_scale=latency) as harness:
+        if memory:
+            tracemalloc.start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        responses, response_bytes, failures = drive(harness, route, tickers)
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+        peak = 0
+        if memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        stats = harness.db.stats
+        return {
+            'route': route,
+            'tickers': len(tickers),
+            'responses': responses,
+            'failures': failures,
+            'wall_s': round(wall, 3),
+            'cpu_s': round(cpu, 3),
+            'ms_per_ticker': round(wall * 1000 / len(tickers), 2),
+            'peak_mb': round(peak / 2 ** 20, 2) if memory else None,
+            'db_requests': stats['requests'],
+            'db_written_kb': round(stats['bytes_written'] / 1024, 1),
+            'db_read_kb': round(stats['bytes_read'] / 1024, 1),
+            'response_kb': round(response_bytes / 1024, 1),
+            'upstream_calls': sum(harness.yf.calls.values()),
+        }
+
+
+def run(source, routes, sizes, latency, memory):
+    results = []
+    print(f"{'route':<20} {'tickers':>7} {'wall_s':>8} {'cpu_s':>8} {'ms/tkr':>7} {'peak_mb':>8} "
+          f"{'db_req':>7} {'db_wr_kb':>9} {'resp_kb':>8} {'upstream':>8} {'fail':>5}")
+    for size in sizes:
+        tickers = universe(size)
+        db = seeded(source, tickers)
+        for route in routes:
+            # Timed without tracemalloc, which slows allocation-heavy code
+            # severalfold; a second pass measures peak memory
+            result = measure(source, db, route, tickers, latency, memory=False)
+            if memory:
+                result['peak_mb'] = measure(source, db, route, tickers, 0, memory=True)['peak_mb']
+            results.append(result)
+            print(f"{route:<20} {size:>7} {result['wall_s']:>8.2f} {result['cpu_s']:>8.2f} "
+                  f"{result['ms_per_ticker']:>7.2f} {result['peak_mb'] if memory else '-':>8} "
+                  f"{result['db_requests']:>7} {result['db_written_kb']:>9.1f} {result['response_kb']:>8.1f} "
+                  f"{result['upstream_calls']:>8} {result['failures']:>5}")
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Regressions beyond `threshold` (a fraction) against a saved run."""
+    with open(baseline_path) as f:
+        baseline = {(r['route'], r['tickers']): r for r in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        before = baseline.get((result['route'], result['tickers']))
+        if not before:
+            continue
+        for metric in GATED:
+            old, new = before.get(metric), result.get(metric)
+            # Ignore sub-100ms / sub-1MB noise on tiny runs
+            floor = {'cpu_s': 0.1, 'peak_mb': 1}.get(metric, 0)
+            if old is None or new is None or new <= floor:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(f"{result['route']} x{result['tickers']}: {metric} {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(ROUTES))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000])
+    parser.add_argument('--latency', type=float, default=0.0, help='scale for replayed call latency (0 = none)')
+    parser.add_argument('--cassette', help='replay recorded calls (see replay.py record); synthetic otherwise')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak-memory pass')
+    parser.add_argument('--save', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON from --save; exit 1 on regressions')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed growth for --compare (fraction)')
+    args = parser.parse_args()
+
+    synthetic = SyntheticMarket()
+    source = Cassette(args.cassette, fallback=synthetic) if args.cassette else synthetic
+    results = run(source, args.routes, args.sizes, args.latency, memory=not args.no_memory)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'latency': args.latency, 'cassette': args.cassette, 'results': results}, f, indent=2)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+/**
+ * Micro-benchmark: ticker search, substring filter vs public/search.js.
+ *
+ * Builds a synthetic universe, then times the old client-side substring
+ * filter (unranked, first 10 in table order) against the ranked prefix /
+ * trigram index, and reports the index payload per stock.
+ *
+ *     node benchmarks/bench_search.mjs [universe size]
+ */
+import { buildIndex, searchIndex } from '../public/search.js';
+
+const SIZE = parseInt(process.argv[2]) || 5000;
+const WORDS = ['Tata', 'Reliance', 'Infosys', 'Bharat', 'Power', 'Motors', 'Steel', 'Bank', 'Finance',
+    'Industries', 'Pharma', 'Energy', 'Global', 'Capital', 'Consumer', 'Apple', 'Micro', 'Systems'];
+const SECTORS = ['Technology', 'Energy', 'Financial Services', 'Healthcare', 'Industrials'];
+
+function synthStock(i) {
+    const a = WORDS[i % WORDS.length];
+    const b = WORDS[(i * 7 + 3) % WORDS.length];
+    const market = i % 3 ? 'IN' : 'US';
+    const base = `${a.slice(0, 4)}${b.slice(0, 3)}${i}`.toUpperCase();
+    return {
+        symbol: market === 'IN' ? `${base}.NS` : base,
+        name: `${a} ${b} ${i % 2 ? 'Limited' : 'Inc.'}`,
+        market,
+        sector: SECTORS[i % SECTORS.length]
+    };
+}
+
+function substringFilter(stocks, query) {
+    const q = query.toLowerCase();
+    return stocks.filter(s => s.symbol.toLowerCase().includes(q) || s.name.toLowerCase().includes(q)).slice(0, 10);
+}
+
+function time(fn, rounds = 200) {
+    fn();
+    const start = process.hrtime.bigint();
+    for (let i = 0; i < rounds; i++) fn();
+    return Number(process.hrtime.bigint() - start) / 1e6 / rounds;
+}
+
+const stocks = Array.from({ length: SIZE }, (_, i) => synthStock(i));
+let index;
+const buildMs = time(() => { index = buildIndex(stocks); }, 5);
+
+console.log(`Universe: ${SIZE} stocks, index build ${buildMs.toFixed(1)} ms`);
+console.log(`Payload: ${(JSON.stringify({ stocks }).length / SIZE).toFixed(0)} bytes/stock`);
+console.log('');
+console.log('query        substring ms  ranked ms  top ranked result');
+for (const query of ['t', 'tata', 'RELI', 'infosis', 'bharat pow', 'zzz']) {
+    const plain = time(() => substringFilter(stocks, query));
+    const ranked = time(() => searchIndex(index, query, { limit: 10 }));
+    const top = searchIndex(index, query, { limit: 1 })[0];
+    console.log(`${query.padEnd(12)} ${plain.toFixed(3).padStart(12)} ${ranked.toFixed(3).padStart(10)}  ` +
+        (top ? `${top.symbol} (${top.score})` : '-'));
+}
@@ -0,0 +1,125 @@
+"""
+Benchmark: single-ticker latency of fetch-indian-stock.py.
+
+Drives the real handler against a fake yfinance module whose Ticker calls
+sleep for simulated per-call latencies, and compares the wall time with the
+sum of the per-call latencies (what the old sequential fetch paid). A second
+run makes one statement hang past the per-call timeout to show the partial
+response and its per-section status.
+
+    python benchmarks/bench_single_fetch.py
+"""
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+sys.path.insert(0, API_DIR)
+spec = importlib.util.spec_from_file_location('fetch_indian_stock', os.path.join(API_DIR, 'fetch-indian-stock.py'))
+fetch = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(fetch)
+
+from _info_cache import info_cache  # noqa: E402
+
+# Simulated Yahoo latency per Ticker call, in seconds
+LATENCY = {
+    'info': 0.6,
+    'income_stmt': 0.5,
+    'quarterly_income_stmt': 0.5,
+    'balance_sheet': 0.5,
+    'quarterly_balance_sheet': 0.5,
+    'history': 0.9,
+}
+
+
+def _statement(rows):
+    columns = pd.to_datetime(['2024-03-31', '2023-03-31', '2022-03-31', '2021-03-31'])
+    return pd.DataFrame(np.random.default_rng(0).uniform(1e9, 1e11, (len(rows), 4)), index=rows, columns=columns)
+
+
+def _history():
+    index = pd.date_range(end='2024-06-01', periods=360, freq='MS')
+    close = np.linspace(100, 2000, len(index))
+    return pd.DataFrame({
+        'Open': close, 'High': close * 1.05, 'Low': close * 0.95, 'Close': close,
+        'Volume': np.full(len(index), 1_000_000), 'Dividends': np.zeros(len(index)),
+    }, index=index)
+
+
+def fake_yfinance(latency):
+    def slow(name, value):
+        def get(self):
+            time.sleep(latency[name])
+            return value
+        return property(get)
+
+    income = _statement(['Total Revenue', 'Gross Profit', 'Operating Income', 'Net Income', 'EBITDA'])
+    balance = _statement(['Total Assets', 'Total Liabilities Net Minority Interest', 'Stockholders Equity',
+                          'Current Debt', 'Long Term Debt'])
+    history = _history()
+
+    class FakeTicker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+
+        @property
+        def info(self):
+            time.sleep(latency['info'])
+            return {'symbol': self.symbol, 'longName': 'Fake Ltd', 'currentPrice': 2000.0, 'previousClose': 1990.0}
+
+        income_stmt = slow('income_stmt', income)
+        quarterly_income_stmt = slow('quarterly_income_stmt', income)
+        balance_sheet = slow('balance_sheet', balance)
+        quarterly_balance_sheet = slow('quarterly_balance_sheet', balance)
+
+        def history(self, period='max', interval='1mo'):
+            time.sleep(latency['history'])
+            return history
+
+    return types.SimpleNamespace(Ticker=FakeTicker)
+
+
+def call(symbol):
+    h = fetch.handler.__new__(fetch.handler)
+    h.path = f'/api/fetch-indian-stock?ticker={symbol}'
+    h.wfile = io.BytesIO()
+    h.send_response = h.send_header = h.end_headers = lambda *a, **k: None
+    h.do_GET()
+    return json.loads(h.wfile.getvalue())
+
+
+def run(label, latency, symbol):
+    sys.modules['yfinance'] = fake_yfinance(latency)
+    start = time.perf_counter()
+    data = call(symbol)
+    wall = time.perf_counter() - start
+    print(f"{label}: wall {wall * 1000:.0f}ms, sequential sum {sum(latency.values()) * 1000:.0f}ms, "
+          f"slowest call {max(latency.values()) * 1000:.0f}ms")
+    print(f"  timings_ms:   {data.get('timings_ms')}")
+    print(f"  fetch_status: {data.get('fetch_status')}")
+    return data
+
+
+def main():
+    # Keep the shared info cache in memory and empty so `info` is really fetched
+    info_cache._store_factory = None
+    fetch.usd_inr = lambda: {'rate': 83.5, 'date': None, 'source': 'default'}
+
+    run('all calls healthy', LATENCY, 'FAST')
+
+    fetch.CALL_TIMEOUT = 1.5
+    hung = dict(LATENCY, quarterly_balance_sheet=5.0)
+    data = run(f'quarterly balance sheet hangs (timeout {fetch.CALL_TIMEOUT}s)', hung, 'SLOW')
+    assert data['fetch_status']['balance_sheet'] == 'timeout'
+    assert data['history']['Monthly Adjusted Time Series']
+
+
+if __name__ == '__main__':
+    main()
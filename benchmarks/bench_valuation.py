@@ -0,0 +1,63 @@
+"""
+Micro-benchmark: DCF sensitivity grid, per-cell loop vs api/_valuation.py.
+
+The loop is a direct port of `calculateDCF` in public/index.html (one input
+set at a time, one iteration per projected year); the vectorized engine
+values the whole grid with one broadcast expression. Checks both agree and
+times the default grid, a dense grid and a Monte Carlo run.
+
+    python benchmarks/bench_valuation.py
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+from _valuation import dcf_grid, monte_carlo  # noqa: E402
+
+INPUTS = {'fcf': 5e10, 'shares': 3.6e9, 'price': 3900.0, 'pat': 4.5e10}
+
+
+def loop_dcf(fcf, shares, growth, discount, terminal, years):
+    if discount <= terminal:
+        return float('nan')
+    current, total = fcf, 0.0
+    for i in range(1, years + 1):
+        current *= 1 + growth
+        total += current / (1 + discount) ** i
+    terminal_value = current * (1 + terminal) / (discount - terminal)
+    return (total + terminal_value / (1 + discount) ** years) / shares
+
+
+def loop_grid(growth, discount, terminal, years):
+    return np.array([[[[loop_dcf(INPUTS['fcf'], INPUTS['shares'], g, r, t, n) for n in years]
+                       for t in terminal] for r in discount] for g in growth])
+
+
+def compare(label, growth, discount, terminal, years, number):
+    expected = loop_grid(growth, discount, terminal, years)
+    actual = dcf_grid(INPUTS, growth, discount, terminal, years)
+    assert np.allclose(expected, actual, rtol=1e-9, equal_nan=True)
+
+    loop_ms = timeit.timeit(lambda: loop_grid(growth, discount, terminal, years), number=number) / number * 1000
+    vec_ms = timeit.timeit(lambda: dcf_grid(INPUTS, growth, discount, terminal, years), number=number) / number * 1000
+    print(f"{label:<28} {expected.size:>7} cells  loop {loop_ms:9.2f}ms  numpy {vec_ms:7.2f}ms  "
+          f"{loop_ms / vec_ms:6.1f}x")
+
+
+def main():
+    compare('default grid', np.arange(0, 0.2501, 0.025), np.arange(0.08, 0.1601, 0.01), [0.02, 0.03, 0.04], [5, 10],
+            number=20)
+    compare('dense grid', np.arange(0, 0.30, 0.005), np.arange(0.06, 0.20, 0.0025), np.arange(0.01, 0.05, 0.005),
+            list(range(3, 16)), number=2)
+
+    draws = 100_000
+    ms = timeit.timeit(lambda: monte_carlo(INPUTS, draws, (0.10, 0.05), (0.12, 0.02), (0.03, 0.01), 10, seed=1),
+                       number=5) / 5 * 1000
+    print(f"{'monte carlo':<28} {draws:>7} draws  numpy {ms:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
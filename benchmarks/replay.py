@@ -0,0 +1,914 @@
+"""
+Offline record/replay harness for the Python routes.
+
+Drives the real handler classes with every network dependency replaced:
+
+    ReplayYF        stands in for the `yfinance` module (`Ticker.info`, the
+                    statements, `Ticker.history`, `yf.download`) and also
+                    answers the stdlib chart lookups in _quote.py and the FX
+                    provider call in _fx.py
+    MemorySupabase  an in-memory stand-in for the `table().select/update/
+                    upsert/delete` and `rpc('patch_stock_data' /
+                    'rollup_weekly_bars')` calls,
+                    counting requests and JSON bytes in each direction
+
+Responses come from a source: `SyntheticMarket` generates deterministic
+data for any symbol (so universes of thousands of tickers need no
+recording), and a `Cassette` replays calls recorded from live Yahoo,
+mapping symbols it never saw onto recorded ones. Replayed calls sleep for
+the recorded (or synthetic) latency times `latency_scale`; 0 measures our
+own CPU cost only.
+
+Record a cassette by running the routes against live Yahoo once:
+
+    python benchmarks/replay.py record benchmarks/cassettes/sample.pkl.gz TCS.NS INFY.NS AAPL MSFT
+
+bench_routes.py runs the benchmark suite on top of this.
+"""
+import gzip
+import importlib.util
+import io
+import json
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+import types
+import zlib
+from collections import Counter
+from contextlib import contextmanager, redirect_stdout
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+API_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api'))
+sys.path.insert(0, API_DIR)
+import _fx  # noqa: E402
+import _metrics  # noqa: E402
+import _quote  # noqa: E402
+from _info_cache import info_cache, SupabaseInfoStore  # noqa: E402
+from _patch import apply_patch  # noqa: E402
+
+STATEMENTS = ('income_stmt', 'quarterly_income_stmt', 'balance_sheet', 'quarterly_balance_sheet')
+
+# Simulated per-call latency (seconds) for synthetic data, close to what
+# the live endpoints take from a Vercel region
+SYNTHETIC_LATENCY = {
+    'info': 0.35,
+    'statement': 0.3,
+    'history': 0.4,
+    'download': 0.6,
+    'chart': 0.15,
+    'fx': 0.2,
+}
+
+
+def args_key(kwargs):
+    """Hashable, order-independent key for a call's keyword arguments."""
+    return tuple(sorted((k, v) for k, v in kwargs.items() if v is not None))
+
+
+def _seed(*parts):
+    return zlib.crc32(':'.join(parts).encode())
+
+
+# --- Response sources -------------------------------------------------------
+
+class SyntheticMarket:
+    """Deterministic Yahoo-shaped responses for any symbol.
+
+    Prices follow a seeded random walk ending at a per-symbol price, so a
+    symbol returns the same data on every call and every run. Generating the
+    frames stands in for yfinance parsing Yahoo's JSON into them.
+    """
+
+    def __init__(self, as_of=None, latency=None):
+        self.as_of = pd.Timestamp(as_of) if as_of else pd.bdate_range(end=pd.Timestamp.today().normalize(),
+                                                                       periods=1)[0]
+        self.latency = dict(SYNTHETIC_LATENCY, **(latency or {}))
+        self._periods = {
+            'annual': pd.date_range(end=self.as_of, periods=4, freq='YE-MAR')[::-1],
+            'quarterly': pd.date_range(end=self.as_of, periods=5, freq='QE')[::-1],
+        }
+
+    def lookup(self, call, symbol, args):
+        """(value, latency_s) for one call."""
+        kwargs = dict(args)
+        if call == 'info':
+            return self.info(symbol), self.latency['info']
+        if call in STATEMENTS:
+            return self.statement(symbol, call), self.latency['statement']
+        if call == 'history':
+            return self.history(symbol, **kwargs), self.latency['history']
+        if call == 'download':
+            frame = self.history(symbol, period=kwargs.get('period', '5d'), interval=kwargs.get('interval', '1d'))
+            return frame.drop(columns=['Dividends', 'Stock Splits']), self.latency['download']
+        if call == 'chart':
+            return self.chart(symbol), self.latency['chart']
+        if call == 'fx':
+            return 83.0 + (_seed(str(self.as_of.date())) % 150) / 100, self.latency['fx']
+        raise KeyError(call)
+
+    def lookup_many(self, call, symbols, args):
+        return {symbol: self.lookup(call, symbol, args) for symbol in symbols}
+
+    def price(self, symbol):
+        return round(50 + _seed(symbol) % 300000 / 100, 2)
+
+    def _closes(self, symbol, interval, n):
+        monthly = interval == '1mo'
+        rng = np.random.default_rng(_seed(symbol, interval))
+        steps = rng.normal(0.008, 0.07, n) if monthly else rng.normal(0.0004, 0.015, n)
+        close = np.exp(np.cumsum(steps))
+        return close * (self.price(symbol) / close[-1])
+
+    def history(self, symbol, period=None, interval='1d', start=None, **_):
+        if interval == '1mo':
+            end = self.as_of.to_period('M').to_timestamp()
+            if start:
+                index = pd.date_range(start=start, end=end, freq='MS')
+            else:
+                years = {'1y': 1, '2y': 2, '5y': 5, '10y': 10}.get(period, 30)
+                index = pd.date_range(end=end, periods=12 * years, freq='MS')
+        elif start:
+            index = pd.bdate_range(start=start, end=self.as_of)
+        else:
+            days = {'5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504, '5y': 1260}.get(period, 2520)
+            index = pd.bdate_range(end=self.as_of, periods=days)
+        n = len(index)
+        close = self._closes(symbol, interval, max(n, 1))[-n:] if n else np.array([])
+        rng = np.random.default_rng(_seed(symbol, interval, 'ohlv'))
+        spread = np.abs(rng.normal(0, 0.01, n))
+        return pd.DataFrame({
+            'Open': np.round(close * (1 + rng.normal(0, 0.005, n)), 2),
+            'High': np.round(close * (1 + spread), 2),
+            'Low': np.round(close * (1 - spread), 2),
+            'Close': np.round(close, 2),
+            'Volume': rng.integers(100_000, 5_000_000, n),
+            'Dividends': np.zeros(n),
+            'Stock Splits': np.zeros(n),
+        }, index=index)
+
+    def info(self, symbol):
+        price = self.price(symbol)
+        seed = _seed(symbol, 'info')
+        shares = 10 ** 8 + seed % (5 * 10 ** 9)
+        eps = round(price / (8 + seed % 40), 2)
+        indian = symbol.endswith(('.NS', '.BO'))
+        return {
+            'symbol': symbol,
+            'longName': f'{symbol.split(".")[0]} Industries Limited',
+            'shortName': f'{symbol.split(".")[0]} IND',
+            'longBusinessSummary': f'{symbol} makes and sells things. ' * 20,
+            'sector': ('Technology', 'Financial Services', 'Energy', 'Healthcare')[seed % 4],
+            'industry': ('Software', 'Banks', 'Oil & Gas', 'Drug Manufacturers')[seed % 4],
+            'country': 'India' if indian else 'United States',
+            'currency': 'INR' if indian else 'USD',
+            'exchange': 'NSI' if indian else 'NMS',
+            'currentPrice': price,
+            'regularMarketPrice': price,
+            'previousClose': round(price * 0.99, 2),
+            'open': round(price * 0.995, 2),
+            'dayHigh': round(price * 1.01, 2),
+            'dayLow': round(price * 0.98, 2),
+            'volume': 1_000_000 + seed % 9_000_000,
+            'marketCap': int(price * shares),
+            'sharesOutstanding': shares,
+            'trailingPE': round(price / eps, 2),
+            'forwardPE': round(price / eps * 0.9, 2),
+            'trailingEps': eps,
+            'bookValue': round(price / (1 + seed % 9), 2),
+            'priceToBook': round(1 + seed % 9, 2),
+            'pegRatio': 1.4,
+            'beta': round(0.5 + seed % 100 / 100, 2),
+            'dividendYield': round(seed % 300 / 100, 2),
+            'dividendRate': round(price * 0.01, 2),
+            'exDividendDate': 1719792000,
+            'profitMargins': 0.12,
+            'operatingMargins': 0.18,
+            'returnOnAssets': 0.07,
+            'returnOnEquity': 0.16,
+            'totalRevenue': int(shares * eps * 8),
+            'grossProfits': int(shares * eps * 3),
+            'ebitda': int(shares * eps * 2),
+            'revenueGrowth': 0.11,
+            'earningsGrowth': 0.09,
+            'fiftyTwoWeekHigh': round(price * 1.2, 2),
+            'fiftyTwoWeekLow': round(price * 0.7, 2),
+            'targetMeanPrice': round(price * 1.1, 2),
+            'targetMedianPrice': round(price * 1.1, 2),
+            'targetHighPrice': round(price * 1.3, 2),
+            'targetLowPrice': round(price * 0.9, 2),
+            'recommendationKey': 'buy',
+            'recommendationMean': 2.1,
+            'numberOfAnalystOpinions': 20 + seed % 20,
+        }
+
+    def statement(self, symbol, name):
+        if 'income' in name:
+            rows = ['Total Revenue', 'Cost Of Revenue', 'Gross Profit', 'Operating Income', 'EBITDA',
+                    'Interest Expense', 'Net Income', 'Basic EPS', 'Diluted EPS']
+        else:
+            rows = ['Total Assets', 'Current Assets', 'Cash And Cash Equivalents',
+                    'Total Liabilities Net Minority Interest', 'Current Liabilities', 'Current Debt',
+                    'Long Term Debt', 'Stockholders Equity']
+        columns = self._periods['quarterly' if name.startswith('quarterly') else 'annual']
+        rng = np.random.default_rng(_seed(symbol, name))
+        return pd.DataFrame(np.round(rng.uniform(1e9, 1e11, (len(rows), len(columns)))), index=rows, columns=columns)
+
+    def chart(self, symbol):
+        frame = self.history(symbol, period='5d', interval='1d')
+        info = self.info(symbol)
+        return {
+            'meta': {
+                'symbol': symbol, 'longName': info['longName'], 'shortName': info['shortName'],
+                'currency': info['currency'], 'exchangeName': info['exchange'],
+                'regularMarketPrice': info['currentPrice'], 'chartPreviousClose': info['previousClose'],
+                'fiftyTwoWeekHigh': info['fiftyTwoWeekHigh'], 'fiftyTwoWeekLow': info['fiftyTwoWeekLow'],
+                'regularMarketDayHigh': info['dayHigh'], 'regularMarketDayLow': info['dayLow'],
+                'regularMarketVolume': info['volume'], 'gmtoffset': 0,
+            },
+            'timestamp': [int(ts.timestamp()) for ts in frame.index],
+            'indicators': {'quote': [{
+                'open': frame['Open'].tolist(), 'high': frame['High'].tolist(), 'low': frame['Low'].tolist(),
+                'close': frame['Close'].tolist(), 'volume': frame['Volume'].tolist(),
+            }]},
+        }
+
+
+class Cassette:
+    """Recorded calls, keyed by (call, symbol, args_key(kwargs)).
+
+    A symbol that was never recorded is answered with a recorded symbol's
+    response for the same call (picked by hash, with its symbol swapped in),
+    so a handful of real recordings can drive a synthetic universe. Calls
+    with no recording at all go to `fallback`, or raise KeyError when there
+    is none.
+    """
+
+    def __init__(self, path=None, fallback=None):
+        self.path = path
+        self.fallback = fallback
+        self.entries = {}  # key -> (value, latency_s)
+        if path and os.path.exists(path):
+            with gzip.open(path, 'rb') as f:
+                self.entries = pickle.load(f)
+        self._symbols = None
+
+    def save(self, path=None):
+        path = path or self.path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with gzip.open(path, 'wb') as f:
+            pickle.dump(self.entries, f)
+
+    def record(self, call, symbol, args, value, latency):
+        self.entries[(call, symbol, args)] = (value, latency)
+        self._symbols = None
+
+    def _templates(self, call, args):
+        if self._symbols is None:
+            self._symbols = {}
+            for c, symbol, a in self.entries:
+                self._symbols.setdefault((c, a), []).append(symbol)
+            for symbols in self._symbols.values():
+                symbols.sort()
+        return self._symbols.get((call, args), [])
+
+    def lookup(self, call, symbol, args):
+        entry = self.entries.get((call, symbol, args))
+        if entry is None:
+            templates = self._templates(call, args)
+            if templates:
+                value, latency = self.entries[(call, templates[_seed(symbol) % len(templates)], args)]
+                entry = (_with_symbol(value, symbol), latency)
+        if entry is None:
+            if self.fallback is None:
+                raise KeyError(f'No recording for {call} {symbol} {args}')
+            return self.fallback.lookup(call, symbol, args)
+        value, latency = entry
+        return (value.copy() if isinstance(value, pd.DataFrame) else value), latency
+
+    def lookup_many(self, call, symbols, args):
+        return {symbol: self.lookup(call, symbol, args) for symbol in symbols}
+
+
+def _with_symbol(value, symbol):
+    if isinstance(value, dict) and 'symbol' in value:
+        return dict(value, symbol=symbol)
+    if isinstance(value, dict) and 'meta' in value:
+        return dict(value, meta=dict(value['meta'], symbol=symbol))
+    return value
+
+
+class Recorder:
+    """A source that makes the real calls and records them in a cassette."""
+
+    def __init__(self, yf, cassette, fetch_chart, fetch_live_rate):
+        self.yf = yf
+        self.cassette = cassette
+        self._fetch_chart = fetch_chart
+        self._fetch_live_rate = fetch_live_rate
+
+    def _call(self, call, symbol, kwargs):
+        if call == 'info' or call in STATEMENTS:
+            return getattr(self.yf.Ticker(symbol), call)
+        if call == 'history':
+            return self.yf.Ticker(symbol).history(**kwargs)
+        if call == 'chart':
+            return self._fetch_chart(symbol, kwargs.get('range', '5d'), kwargs.get('interval', '1d'))
+        if call == 'fx':
+            return self._fetch_live_rate()
+        raise KeyError(call)
+
+    def lookup(self, call, symbol, args):
+        start = time.perf_counter()
+        try:
+            value = self._call(call, symbol, dict(args))
+        except Exception as e:
+            value = RuntimeError(str(e))
+        # Latency was already paid live; replays sleep for the recorded value
+        self.cassette.record(call, symbol, args, value, time.perf_counter() - start)
+        return value, 0
+
+    def lookup_many(self, call, symbols, args):
+        if call != 'download':
+            return {symbol: self.lookup(call, symbol, args) for symbol in symbols}
+        start = time.perf_counter()
+        frame = self.yf.download(list(symbols), **dict(args))
+        latency = time.perf_counter() - start
+        found = {}
+        multi = frame is not None and frame.columns.nlevels > 1
+        for symbol in symbols:
+            if frame is None or frame.empty or (multi and symbol not in frame.columns.get_level_values(0)):
+                continue
+            sub = frame[symbol] if multi else frame
+            self.cassette.record(call, symbol, args, sub, latency)
+            found[symbol] = (sub, 0)
+        return found
+
+
+# --- yfinance stand-in ------------------------------------------------------
+
+class ReplayYF:
+    """Module-like stand-in for `yfinance`, answered from a source."""
+
+    def __init__(self, source, latency_scale=0.0):
+        self.source = source
+        self.latency_scale = latency_scale
+        self.calls = Counter()
+        self.Ticker = self._ticker_class()
+
+    def _wait(self, latency):
+        if latency and self.latency_scale:
+            time.sleep(latency * self.latency_scale)
+
+    def get(self, call, symbol, **kwargs):
+        self.calls[call] += 1
+        value, latency = self.source.lookup(call, symbol, args_key(kwargs))
+        self._wait(latency)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def _ticker_class(self):
+        replay = self
+
+        def statement(name):
+            return property(lambda ticker: replay.get(name, ticker.symbol))
+
+        class Ticker:
+            def __init__(self, symbol):
+                self.symbol = symbol
+
+            info = property(lambda ticker: replay.get('info', ticker.symbol))
+
+            def history(self, period=None, interval='1d', start=None, **kwargs):
+                return replay.get('history', self.symbol, period=period, interval=interval, start=start)
+
+        for name in STATEMENTS:
+            setattr(Ticker, name, statement(name))
+        return Ticker
+
+    def download(self, symbols, **kwargs):
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        self.calls['download'] += 1
+        found = self.source.lookup_many('download', symbols, args_key(kwargs))
+        # One request for the whole batch
+        self._wait(max((latency for _, latency in found.values()), default=0))
+        frames = {symbol: value for symbol, (value, _) in found.items() if isinstance(value, pd.DataFrame)}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+    def fetch_chart(self, symbol, range_='5d', interval='1d', timeout=None):
+        return self.get('chart', symbol, range=range_, interval=interval)
+
+    def fetch_live_rate(self, timeout=None):
+        return self.get('fx', 'USDINR')
+
+
+# --- Supabase stand-in ------------------------------------------------------
+
+# Upsert conflict keys, as declared in supabase-schema.sql
+PRIMARY_KEYS = {
+    'stock_data': ('ticker',),
+    'price_history': ('ticker', 'interval', 'date'),
+    'screener': ('ticker',),
+    'indicators': ('ticker',),
+    'info_cache': ('symbol',),
+    'refresh_checkpoints': ('shard_key',),
+    'refresh_state': ('ticker',),
+    'exchange_rates': ('date',),
+    'access_log': ('ticker',),
+    'valuation_cache': ('ticker', 'input_hash'),
+    'ai_context': ('ticker',),
+    'ai_responses': ('cache_key',),
+}
+
+_COLUMN = re.compile(r'^(?:(\w+):)?(\w+)((?:->>?[^,>]+?)*)$')
+_STEP = re.compile(r'(->>?)([^->]+)')
+
+
+def _parse_select(columns):
+    """PostgREST select list -> [(name, column, [(text, key), ...])], or None for '*'."""
+    if columns.strip() == '*':
+        return None
+    parsed = []
+    for item in columns.split(','):
+        match = _COLUMN.match(item.strip())
+        if not match:
+            raise ValueError(f'Unsupported select column: {item!r}')
+        alias, column, path = match.groups()
+        steps = [(arrow == '->>', int(key) if key.isdigit() else key) for arrow, key in _STEP.findall(path)]
+        name = alias or (str(steps[-1][1]) if steps else column)
+        parsed.append((name, column, steps))
+    return parsed
+
+
+def _project(row, select):
+    if select is None:
+        return dict(row)
+    out = {}
+    for name, column, steps in select:
+        value = row.get(column)
+        text = False
+        for text, key in steps:
+            if isinstance(value, dict):
+                value = value.get(key)
+            elif isinstance(value, list) and isinstance(key, int) and key < len(value):
+                value = value[key]
+            else:
+                value = None
+        if text and value is not None and not isinstance(value, str):
+            value = json.dumps(value)
+        out[name] = value
+    return out
+
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+        self.count = len(data) if isinstance(data, list) else None
+
+
+class Table:
+    def __init__(self, name):
+        self.name = name
+        self.key = PRIMARY_KEYS.get(name, ('id',))
+        self.rows = {}   # key tuple -> row
+        self.index = {}  # first key column value -> {key tuple: None}
+        self._next_id = 1
+
+    def put(self, row, key_columns=None):
+        key_columns = key_columns or self.key
+        if key_columns == ('id',) and 'id' not in row:
+            row['id'] = self._next_id
+            self._next_id += 1
+        key = tuple(row.get(c) for c in key_columns)
+        existing = self.rows.get(key)
+        if existing is not None:
+            existing.update(row)  # PostgREST merge-duplicates: only the sent columns change
+        else:
+            self.rows[key] = row
+            self.index.setdefault(row.get(key_columns[0]), {})[key] = None
+
+    def remove(self, key):
+        row = self.rows.pop(key)
+        self.index.get(row.get(self.key[0]), {}).pop(key, None)
+
+    def candidates(self, filters):
+        """Keys that can match `filters`, narrowed by the index when the first
+        key column is filtered on."""
+        first = self.key[0]
+        for op, column, value in filters:
+            if column != first:
+                continue
+            if op == 'eq':
+                return list(self.index.get(value, {}))
+            if op == 'in':
+                return [key for v in value for key in self.index.get(v, {})]
+        return list(self.rows)
+
+
+def _matches(row, filters):
+    for op, column, value in filters:
+        v = row.get(column)
+        if op == 'eq' and v != value:
+            return False
+        if op == 'neq' and v == value:
+            return False
+        if op == 'in' and v not in value:
+            return False
+        if op in ('lt', 'lte', 'gt', 'gte'):
+            if v is None:
+                return False
+            if (op == 'lt' and not v < value) or (op == 'lte' and not v <= value) \
+                    or (op == 'gt' and not v > value) or (op == 'gte' and not v >= value):
+                return False
+    return True
+
+
+class Query:
+    """The subset of the postgrest query builder the routes use."""
+
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.action = 'select'
+        self.columns = '*'
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+        self.orders = []
+        self.bounds = None
+        self.max_rows = None
+
+    def select(self, columns='*', **_):
+        self.columns = columns
+        return self
+
+    def upsert(self, rows, on_conflict='', **_):
+        self.action, self.payload = 'upsert', rows
+        self.on_conflict = tuple(c.strip() for c in on_conflict.split(',') if c.strip()) or None
+        return self
+
+    def insert(self, rows, **_):
+        self.action, self.payload = 'insert', rows
+        return self
+
+    def update(self, values, **_):
+        self.action, self.payload = 'update', values
+        return self
+
+    def delete(self, **_):
+        self.action = 'delete'
+        return self
+
+    def _filter(self, op, column, value):
+        self.filters.append((op, column, value))
+        return self
+
+    def eq(self, column, value):
+        return self._filter('eq', column, value)
+
+    def neq(self, column, value):
+        return self._filter('neq', column, value)
+
+    def in_(self, column, values):
+        return self._filter('in', column, set(values))
+
+    def lt(self, column, value):
+        return self._filter('lt', column, value)
+
+    def lte(self, column, value):
+        return self._filter('lte', column, value)
+
+    def gt(self, column, value):
+        return self._filter('gt', column, value)
+
+    def gte(self, column, value):
+        return self._filter('gte', column, value)
+
+    def order(self, column, desc=False, **_):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, n, **_):
+        self.max_rows = n
+        return self
+
+    def range(self, start, end, **_):
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        table = self.db.tables.setdefault(self.table, Table(self.table))
+        with self.db.request():
+            payload = self.db.sent(self.payload) if self.payload is not None else None
+            if self.action in ('upsert', 'insert'):
+                for row in payload if isinstance(payload, list) else [payload]:
+                    table.put(row, self.on_conflict)
+                return Response([])
+            keys = [key for key in table.candidates(self.filters) if _matches(table.rows[key], self.filters)]
+            if self.action == 'update':
+                for key in keys:
+                    table.rows[key].update(payload)
+                return Response([])
+            if self.action == 'delete':
+                for key in keys:
+                    table.remove(key)
+                return Response([])
+            rows = [table.rows[key] for key in keys]
+            for column, desc in reversed(self.orders):
+                rows.sort(key=lambda r: (r.get(column) is None, r.get(column)), reverse=desc)
+            if self.bounds:
+                rows = rows[self.bounds[0]:self.bounds[1] + 1]
+            if self.max_rows is not None:
+                rows = rows[:self.max_rows]
+            select = _parse_select(self.columns)
+            return Response(self.db.received([_project(row, select) for row in rows]))
+
+
+def _monday(date_str):
+    day = date.fromisoformat(date_str)
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+
+def _rollup_weekly_bars(table, tickers, since=None):
+    """In-memory `rollup_weekly_bars`: Monday-dated weekly bars from daily ones."""
+    start = _monday(since) if since else ''
+    weeks = {}
+    for key in [key for ticker in tickers for key in table.index.get(ticker, {})]:
+        row = table.rows[key]
+        if row['interval'] == '1d' and row['date'] >= start:
+            weeks.setdefault((row['ticker'], _monday(row['date'])), []).append(row)
+    for (ticker, monday), bars in weeks.items():
+        bars.sort(key=lambda r: r['date'])
+        table.put({
+            'ticker': ticker, 'date': monday, 'interval': '1wk',
+            'o': bars[0]['o'], 'h': max(b['h'] for b in bars), 'l': min(b['l'] for b in bars),
+            'c': bars[-1]['c'], 'adj_c': bars[-1]['adj_c'],
+            'v': sum(b['v'] or 0 for b in bars), 'div': sum(b['div'] or 0 for b in bars),
+        })
+    return len(weeks)
+
+
+class RPC:
+    def __init__(self, db, name, params):
+        self.db, self.name, self.params = db, name, params
+
+    def execute(self):
+        with self.db.request():
+            params = self.db.sent(self.params)
+            if self.name == 'patch_stock_data':
+                table = self.db.tables.setdefault('stock_data', Table('stock_data'))
+                changed = 0
+                for patch in params['patches']:
+                    row = table.rows.get((patch['ticker'],))
+                    if row is not None:
+                        apply_patch(row['data'], patch)
+                        row['last_updated'] = datetime.now(timezone.utc).isoformat()
+                        changed += 1
+                return Response(changed)
+            if self.name == 'rollup_weekly_bars':
+                table = self.db.tables.setdefault('price_history', Table('price_history'))
+                return Response(_rollup_weekly_bars(table, params['p_tickers'], params.get('p_since')))
+            if self.name == 'record_metrics':
+                return Response(None)
+            raise NotImplementedError(f'rpc {self.name} has no in-memory implementation')
+
+
+class MemorySupabase:
+    """In-memory stand-in for a supabase-py client.
+
+    Payloads and results go through JSON like they do over HTTP, so callers
+    can't share state with the store and the byte counts match what the real
+    client would send and receive.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def table(self, name):
+        return Query(self, name)
+
+    def rpc(self, name, params=None):
+        return RPC(self, name, params or {})
+
+    @contextmanager
+    def request(self):
+        # One request at a time, like a single connection
+        with self._lock:
+            self.stats['requests'] += 1
+            yield
+
+    def sent(self, payload):
+        raw = json.dumps(payload, default=str)
+        self.stats['bytes_written'] += len(raw)
+        return json.loads(raw)
+
+    def received(self, rows):
+        raw = json.dumps(rows, default=str)
+        self.stats['bytes_read'] += len(raw)
+        return json.loads(raw)
+
+    def reset_stats(self):
+        self.stats.clear()
+
+    def copy(self):
+        """An independent client with the same rows and zeroed counters."""
+        clone = MemorySupabase()
+        clone.tables = pickle.loads(pickle.dumps(self.tables))
+        return clone
+
+    def rows(self, name):
+        table = self.tables.get(name)
+        return list(table.rows.values()) if table else []
+
+
+# --- Driving the handlers ---------------------------------------------------
+
+_routes = {}
+
+
+def load_route(name):
+    """Import api/<name>.py once (the file names aren't valid module names)."""
+    if name not in _routes:
+        spec = importlib.util.spec_from_file_location(name.replace('-', '_'), os.path.join(API_DIR, f'{name}.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _routes[name] = module
+    return _routes[name]
+
+
+class _Discard(io.TextIOBase):
+    def write(self, s):
+        return len(s)
+
+
+class Harness:
+    """Installs the stand-ins for the duration of a `with` block.
+
+        with Harness(SyntheticMarket()) as h:
+            status, body = h.get('quick-refresh', 'ticker=TCS.NS')
+    """
+
+    def __init__(self, source, db=None, latency_scale=0.0, quiet=True):
+        self.yf = ReplayYF(source, latency_scale)
+        self.db = db if db is not None else MemorySupabase()
+        self.quiet = quiet
+        self._saved = []
+        self._patched_routes = set()
+
+    def _patch(self, target, name, value):
+        self._saved.append((target, name, getattr(target, name, None)))
+        setattr(target, name, value)
+
+    def __enter__(self):
+        supabase = types.ModuleType('supabase')
+        supabase.create_client = lambda url, key: self.db
+        self._modules = {name: sys.modules.get(name) for name in ('yfinance', 'supabase')}
+        sys.modules['yfinance'] = self.yf
+        sys.modules['supabase'] = supabase
+        self._env = {name: os.environ.get(name) for name in ('SUPABASE_URL', 'SUPABASE_SERVICE_KEY')}
+        os.environ['SUPABASE_URL'] = 'http://replay.invalid'
+        os.environ['SUPABASE_SERVICE_KEY'] = 'replay'
+
+        self._patch(_quote, 'fetch_chart', self.yf.fetch_chart)
+        self._patch(_fx, 'fetch_live_rate', self.yf.fetch_live_rate)
+        self._patch(_metrics, 'flush', lambda samples, timeout=None: self.db.rpc(
+            'record_metrics', {'p_window': _metrics.window_start(), 'p_samples': samples}).execute())
+        self.reset_caches()
+        return self
+
+    def __exit__(self, *exc):
+        for target, name, value in reversed(self._saved):
+            setattr(target, name, value)
+        self._saved = []
+        self._patched_routes = set()
+        for name, module in self._modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        for name, value in self._env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        return False
+
+    def reset_caches(self):
+        """Empty the per-process caches so the next call goes upstream."""
+        for cache in (info_cache, _quote.quote_cache):
+            with cache._lock:
+                cache._memory.clear()
+                cache.counters = {key: 0 for key in cache.counters}
+        info_cache._store_factory = None
+        info_cache._store = SupabaseInfoStore(self.db)
+        self.db.tables.pop('info_cache', None)
+        _fx._cached = None
+
+    def route(self, name):
+        module = load_route(name)
+        # Routes that imported fetch_chart by name hold their own reference
+        if name not in self._patched_routes and hasattr(module, 'fetch_chart'):
+            self._patch(module, 'fetch_chart', self.yf.fetch_chart)
+        self._patched_routes.add(name)
+        return module
+
+    def _call(self, name, path, body=None):
+        module = self.route(name)
+        h = module.handler.__new__(module.handler)
+        h.path = path
+        h.wfile = io.BytesIO()
+        status = []
+        h.send_response = lambda code, message=None: status.append(code)
+        h.send_header = lambda *args: None
+        h.end_headers = lambda: None
+        with redirect_stdout(_Discard() if self.quiet else sys.stdout):
+            if body is None:
+                h.do_GET()
+            else:
+                raw = json.dumps(body).encode()
+                h.headers = {'Content-Length': str(len(raw))}
+                h.rfile = io.BytesIO(raw)
+                h.do_POST()
+        return (status[0] if status else None), h.wfile.getvalue()
+
+    def get(self, name, query=''):
+        """(status, body bytes) of a GET to the route."""
+        return self._call(name, f'/api/{name}?{query}')
+
+    def post(self, name, body):
+        return self._call(name, f'/api/{name}', body)
+
+    def seed(self, tickers):
+        """Store documents, monthly bars and indicator state for `tickers`
+        (the state a universe is in after its first fetch), without timing
+        or counting any of it."""
+        from _history import history_rows
+        from _indicators import update_indicators, refresh_benchmarks
+        fetch = load_route('fetch-indian-stock')
+        builder = fetch.handler.__new__(fetch.handler)
+        scale, self.yf.latency_scale = self.yf.latency_scale, 0
+        try:
+            documents, bars, monthly = [], [], {}
+            for ticker in tickers:
+                stock = self.yf.Ticker(ticker.replace('&', '%26'))
+                info = stock.info
+                indian = ticker.endswith(('.NS', '.BO'))
+                documents.append({'ticker': ticker, 'data': {
+                    'overview': builder.build_overview(info),
+                    'quote': builder.build_quote(info),
+                    'income': builder.build_income(stock.income_stmt, stock.quarterly_income_stmt),
+                    'balance_sheet': builder.build_balance_sheet(stock.balance_sheet, stock.quarterly_balance_sheet),
+                    'history': {'Monthly Adjusted Time Series': {}},
+                    'market': 'IN' if indian else 'US',
+                    'currency': 'INR' if indian else 'USD',
+                }})
+                points = builder.build_history(stock.history(period='10y', interval='1mo'))
+                points = points['Monthly Adjusted Time Series']
+                bars.extend(history_rows(ticker, points, '1mo'))
+                monthly[ticker] = {date: float(point['4. close']) for date, point in points.items()}
+            self.db.table('stock_data').upsert(documents, on_conflict='ticker').execute()
+            self.db.table('price_history').upsert(bars, on_conflict='ticker,interval,date').execute()
+            refresh_benchmarks(self.yf, self.db)
+            update_indicators(self.db, monthly=monthly, full_monthly=set(tickers))
+        finally:
+            self.yf.latency_scale = scale
+        self.yf.calls.clear()
+        self.db.reset_stats()
+
+
+def record(path, tickers):
+    """Run every route once for `tickers` against live Yahoo and save the
+    calls they made to a cassette."""
+    import yfinance
+    cassette = Cassette(path)
+    source = Recorder(yfinance, cassette, _quote.fetch_chart, _fx.fetch_live_rate)
+    with Harness(source, quiet=False) as h:
+        indian = [t for t in tickers if t.endswith(('.NS', '.BO'))]
+        h.post('validate-ticker', {'tickers': tickers, 'stream': False})
+        for ticker in tickers:
+            h.get('validate-ticker', f'ticker={ticker}')
+        for ticker in indian:
+            h.get('fetch-indian-stock', f'ticker={ticker}')
+        h.seed(tickers)
+        for ticker in tickers:
+            h.get('quick-refresh', f'ticker={ticker}')
+            h.get('quick-refresh', f'ticker={ticker}&mode=full')
+        h.get('daily-refresh', f'limit={len(tickers)}&reset=1')
+    cassette.save()
+    print(f"Recorded {len(cassette.entries)} calls to {path}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 4 or sys.argv[1] != 'record':
+        sys.exit('usage: python benchmarks/replay.py record CASSETTE TICKER [TICKER ...]')
+    record(sys.argv[2], [t.upper() for t in sys.argv[3:]])
@@ -0,0 +1,95 @@
+// Ranked ticker search over a (symbol, name, market, sector) index.
+// Shared by api/stocks-search.js and the page, which imports it as a static
+// module and ranks the downloaded index locally.
+
+// Share of the query's trigrams an entry must contain to count as a fuzzy match
+const MIN_TRIGRAM_OVERLAP = 0.5;
+
+// Trigrams of a padded, lower-cased string ("tcs" -> "  t", " tc", "tcs", "cs ")
+export function trigrams(text) {
+    const padded = `  ${text.toLowerCase()} `;
+    const grams = new Set();
+    for (let i = 0; i < padded.length - 2; i++) grams.add(padded.slice(i, i + 3));
+    return grams;
+}
+
+// Add the lower-cased fields searchScore needs
+export function prepareEntry(stock) {
+    const symbol = stock.symbol.toLowerCase();
+    const name = (stock.name || '').toLowerCase();
+    return {
+        ...stock,
+        _symbol: symbol,
+        _base: symbol.replace(/\.(ns|bo)$/, ''),
+        // "symbol name" and " word word ..." let one includes() per tier
+        // replace per-word and per-field checks
+        _text: `${symbol} ${name}`,
+        _wordStarts: ` ${name.split(/[\s.&()-]+/).filter(Boolean).join(' ')}`
+    };
+}
+
+// Prepared entries plus a trigram -> entry positions map, so fuzzy matching
+// only touches entries that share a trigram with the query
+export function buildIndex(stocks) {
+    const entries = stocks.map(prepareEntry);
+    const postings = new Map();
+    entries.forEach((entry, i) => {
+        for (const gram of trigrams(entry._text)) {
+            if (!postings.has(gram)) postings.set(gram, []);
+            postings.get(gram).push(i);
+        }
+    });
+    return { entries, postings };
+}
+
+// 0 means no match. Exact symbol > symbol prefix > name word prefix >
+// substring > fuzzy (share of query trigrams found); shorter symbols win ties.
+export function searchScore(entry, q, fuzzy = 0) {
+    let score = 0;
+    if (!entry._text.includes(q)) {
+        if (q.length >= 3 && fuzzy >= MIN_TRIGRAM_OVERLAP) score = 30 * fuzzy;
+    }
+    else if (entry._symbol === q || entry._base === q) score = 100;
+    else if (entry._symbol.startsWith(q)) score = 80;
+    else if (entry._wordStarts.includes(` ${q}`)) score = 60;
+    else score = 40;
+    return score ? score - entry._symbol.length / 100 : 0;
+}
+
+function ranksBefore(a, b) {
+    return a.score > b.score || (a.score === b.score && a.entry.symbol < b.entry.symbol);
+}
+
+export function searchIndex(index, query, { market = null, limit = 10 } = {}) {
+    const q = query.trim().toLowerCase();
+    if (!q) return [];
+    const { entries, postings } = index;
+
+    const shared = new Uint16Array(entries.length);
+    const queryGrams = trigrams(q);
+    for (const gram of queryGrams) {
+        for (const i of postings.get(gram) || []) shared[i]++;
+    }
+
+    // Keep only the best `limit` matches, sorted, instead of sorting them all
+    const results = [];
+    for (let i = 0; i < entries.length; i++) {
+        const entry = entries[i];
+        if (market && market !== 'GLOBAL' && entry.market !== market) continue;
+        const score = searchScore(entry, q, shared[i] / queryGrams.size);
+        if (!score) continue;
+        const match = { entry, score };
+        if (results.length === limit && ranksBefore(results[limit - 1], match)) continue;
+        let at = results.length;
+        while (at > 0 && ranksBefore(match, results[at - 1])) at--;
+        results.splice(at, 0, match);
+        if (results.length > limit) results.pop();
+    }
+    return results.map(({ entry, score }) => ({
+        symbol: entry.symbol,
+        name: entry.name,
+        market: entry.market,
+        sector: entry.sector,
+        score: Math.round(score * 100) / 100
+    }));
+}
@@ -14,7 +14,9 @@ CREATE TABLE IF NOT EXISTS stock_data (
     id SERIAL PRIMARY KEY,
     ticker VARCHAR(20) NOT NULL UNIQUE,
     data JSONB NOT NULL,
-    last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    last_updated TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    -- Last change to the fields the search index reads (see touch_search_fields)
+    search_updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
 -- Projections table
@@ -32,24 +34,500 @@ CREATE TABLE IF NOT EXISTS access_log (
     last_accessed TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Price history, one row per bar (interval: '1mo' monthly, '1d' daily, '1wk' weekly
+-- rolled up from the daily bars by rollup_weekly_bars)
+CREATE TABLE IF NOT EXISTS price_history (
+    ticker VARCHAR(20) NOT NULL,
+    date DATE NOT NULL,
+    interval VARCHAR(4) NOT NULL,
+    o DOUBLE PRECISION,
+    h DOUBLE PRECISION,
+    l DOUBLE PRECISION,
+    c DOUBLE PRECISION,
+    adj_c DOUBLE PRECISION,
+    v BIGINT,
+    div DOUBLE PRECISION,
+    PRIMARY KEY (ticker, interval, date)  -- also serves (ticker, interval, date) range queries
+);
+
+-- USD/INR rates by date (backfilled by api/exchange-history.js, kept current by api/daily-refresh.py)
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    id SERIAL PRIMARY KEY,
+    date DATE NOT NULL UNIQUE,
+    rate DOUBLE PRECISION NOT NULL,
+    source VARCHAR(30),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Shared cache of yfinance Ticker.info lookups (see api/_info_cache.py)
+CREATE TABLE IF NOT EXISTS info_cache (
+    symbol VARCHAR(20) PRIMARY KEY,
+    info JSONB NOT NULL,
+    fetched_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Valuation results per ticker and hash of (stored inputs, parameters) (see api/valuation.py)
+CREATE TABLE IF NOT EXISTS valuation_cache (
+    ticker VARCHAR(20) NOT NULL,
+    input_hash VARCHAR(40) NOT NULL,
+    result JSONB NOT NULL,
+    computed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (ticker, input_hash)
+);
+
+-- Screener: Snowflake scores and key ratios per ticker, written by the Python
+-- refresh routes (see api/_screener.py) and queried by api/screener.js
+CREATE TABLE IF NOT EXISTS screener (
+    ticker VARCHAR(20) PRIMARY KEY,
+    name TEXT,
+    sector VARCHAR(60),
+    industry VARCHAR(100),
+    market VARCHAR(10),
+    currency VARCHAR(10),
+    price DOUBLE PRECISION,
+    market_cap DOUBLE PRECISION,
+    pe DOUBLE PRECISION,
+    pb DOUBLE PRECISION,
+    ps DOUBLE PRECISION,
+    peg DOUBLE PRECISION,
+    eps DOUBLE PRECISION,
+    roe DOUBLE PRECISION,
+    roa DOUBLE PRECISION,
+    profit_margin DOUBLE PRECISION,
+    operating_margin DOUBLE PRECISION,
+    revenue_growth DOUBLE PRECISION,
+    earnings_growth DOUBLE PRECISION,
+    dividend_yield DOUBLE PRECISION,
+    beta DOUBLE PRECISION,
+    score_value SMALLINT NOT NULL DEFAULT 0,
+    score_future SMALLINT NOT NULL DEFAULT 0,
+    score_past SMALLINT NOT NULL DEFAULT 0,
+    score_health SMALLINT NOT NULL DEFAULT 0,
+    score_dividend SMALLINT NOT NULL DEFAULT 0,
+    score_total SMALLINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Technical indicators and range returns per ticker (and benchmark index),
+-- written by the Python refresh routes (see api/_indicators.py). `state` holds
+-- the recent closes the next refresh appends to.
+CREATE TABLE IF NOT EXISTS indicators (
+    ticker VARCHAR(20) PRIMARY KEY,
+    as_of DATE,
+    price DOUBLE PRECISION,
+    sma_50 DOUBLE PRECISION,
+    sma_200 DOUBLE PRECISION,
+    ema_20 DOUBLE PRECISION,
+    ema_50 DOUBLE PRECISION,
+    vol_1m DOUBLE PRECISION,
+    vol_3m DOUBLE PRECISION,
+    vol_1y DOUBLE PRECISION,
+    vol_monthly DOUBLE PRECISION,
+    high_52w DOUBLE PRECISION,
+    low_52w DOUBLE PRECISION,
+    drawdown DOUBLE PRECISION,
+    max_drawdown DOUBLE PRECISION,
+    returns JSONB,
+    beta DOUBLE PRECISION,
+    benchmark VARCHAR(20),
+    state JSONB NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Compact prompt context per ticker for the AI routes, rendered from the stored
+-- document after each refresh (see api/_ai_context.py). `version` is the
+-- document's last_updated when the card was rendered.
+CREATE TABLE IF NOT EXISTS ai_context (
+    ticker VARCHAR(20) PRIMARY KEY,
+    version TEXT NOT NULL,
+    card TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- AI responses per hash of (route, model, tickers and their stock_data
+-- last_updated, question) (see api/_ai_context.js)
+CREATE TABLE IF NOT EXISTS ai_responses (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    response JSONB NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Latency histograms per hourly window for Python routes, their phases and
+-- upstream calls (see api/_metrics.py); summarized by api/status.js
+CREATE TABLE IF NOT EXISTS route_metrics (
+    window_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    kind VARCHAR(10) NOT NULL,
+    name VARCHAR(80) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    sum_ms DOUBLE PRECISION NOT NULL DEFAULT 0,
+    buckets INTEGER[] NOT NULL,
+    PRIMARY KEY (window_start, kind, name)
+);
+
+-- Daily refresh progress, one row per cron shard (e.g. '0/1')
+CREATE TABLE IF NOT EXISTS refresh_checkpoints (
+    id SERIAL PRIMARY KEY,
+    shard_key VARCHAR(20) NOT NULL UNIQUE,
+    run_id VARCHAR(40) NOT NULL,
+    cursor VARCHAR(20),
+    status VARCHAR(20) NOT NULL DEFAULT 'running',
+    processed INTEGER DEFAULT 0,
+    errors INTEGER DEFAULT 0,
+    started_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Last check and written-content hash per ticker, so refreshes skip closed
+-- sessions and unchanged quotes (see api/_gate.py)
+CREATE TABLE IF NOT EXISTS refresh_state (
+    ticker VARCHAR(20) PRIMARY KEY,
+    content_hash VARCHAR(32),
+    checked_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- Refresh job queue (see api/_queue.js). At most one queued/running job per
+-- ticker; `partial` keeps sections fetched before a job was deferred by quota.
+CREATE TABLE IF NOT EXISTS refresh_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    ticker VARCHAR(20) NOT NULL,
+    provider VARCHAR(20) NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'queued',
+    priority INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_at TIMESTAMP WITH TIME ZONE,
+    batch_id VARCHAR(60),
+    partial JSONB,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Token bucket per upstream provider (see api/_upstream.js)
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    provider VARCHAR(20) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    capacity DOUBLE PRECISION NOT NULL,
+    refill_per_sec DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Fold a daily bar into its month's point of a monthly series, so the series
+-- keeps one point per month: open from the month's earliest point, high/low
+-- across its points and the bar, close from the bar. The point keeps a
+-- provider's month-start key (Yahoo); otherwise it moves to the bar's date,
+-- which is how Alpha Vantage dates the month in progress. Volume is the larger
+-- of the stored and the bar's, since a day refreshed twice can't be summed.
+-- Mirrored by roll_monthly_point in api/_patch.py.
+CREATE OR REPLACE FUNCTION roll_monthly_point(series JSONB, p_date TEXT, bar JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    keys TEXT[];
+    first_open TEXT;
+    first_div TEXT;
+    high NUMERIC;
+    low NUMERIC;
+    volume NUMERIC;
+    month_key TEXT;
+BEGIN
+    SELECT array_agg(key ORDER BY key),
+           (array_agg(value ->> '1. open' ORDER BY key))[1],
+           (array_agg(value ->> '7. dividend amount' ORDER BY key))[1],
+           max((value ->> '2. high')::NUMERIC),
+           min((value ->> '3. low')::NUMERIC),
+           max((value ->> '6. volume')::NUMERIC)
+    INTO keys, first_open, first_div, high, low, volume
+    FROM jsonb_each(COALESCE(series, '{}'::jsonb))
+    WHERE left(key, 7) = left(p_date, 7);
+
+    month_key := CASE WHEN keys[1] LIKE '%-01' THEN keys[1] ELSE p_date END;
+    RETURN (COALESCE(series, '{}'::jsonb) - COALESCE(keys, '{}'::TEXT[]))
+        || jsonb_build_object(month_key, bar || jsonb_strip_nulls(jsonb_build_object(
+            '1. open', COALESCE(first_open, bar ->> '1. open'),
+            '2. high', GREATEST(high, (bar ->> '2. high')::NUMERIC)::TEXT,
+            '3. low', LEAST(low, (bar ->> '3. low')::NUMERIC)::TEXT,
+            '6. volume', GREATEST(volume, (bar ->> '6. volume')::NUMERIC)::TEXT,
+            '7. dividend amount', first_div
+        )));
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+
+-- Merge delta patches into stock_data.data without shipping the whole document.
+-- patches: [{ticker, quote, overview, history, last_updated}, ...] (see api/_patch.py)
+-- Bumps the last_updated column too; stock-data validators and caches key on it.
+CREATE OR REPLACE FUNCTION patch_stock_data(patches JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    p RECORD;
+    bar RECORD;
+    series JSONB;
+    n INTEGER := 0;
+BEGIN
+    FOR p IN
+        SELECT * FROM jsonb_to_recordset(patches)
+            AS x(ticker TEXT, quote JSONB, overview JSONB, history JSONB, last_updated TEXT)
+    LOOP
+        SELECT data #> '{history,Monthly Adjusted Time Series}' INTO series
+        FROM stock_data WHERE ticker = p.ticker FOR UPDATE;
+        IF NOT FOUND THEN
+            CONTINUE;
+        END IF;
+        -- Patch history holds daily bars; each is folded into its month's point
+        FOR bar IN SELECT key, value FROM jsonb_each(COALESCE(p.history, '{}'::jsonb)) ORDER BY key
+        LOOP
+            series := roll_monthly_point(series, bar.key, bar.value);
+        END LOOP;
+
+        UPDATE stock_data
+        SET data = jsonb_set(
+                jsonb_set(
+                    data || jsonb_build_object(
+                        'quote', COALESCE(data -> 'quote', '{}'::jsonb),
+                        'history', COALESCE(data -> 'history', '{}'::jsonb),
+                        'last_updated', p.last_updated
+                    ),
+                    '{quote,Global Quote}',
+                    COALESCE(data #> '{quote,Global Quote}', '{}'::jsonb) || COALESCE(p.quote, '{}'::jsonb)
+                ),
+                '{history,Monthly Adjusted Time Series}',
+                COALESCE(series, '{}'::jsonb)
+            )
+            || CASE WHEN p.overview IS NOT NULL AND data ? 'overview'
+                    THEN jsonb_build_object('overview', (data -> 'overview') || p.overview)
+                    ELSE '{}'::jsonb END,
+            last_updated = NOW()
+        WHERE ticker = p.ticker;
+        n := n + 1;
+    END LOOP;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Store a fetched document. With p_history_from set, data.history holds only the
+-- bars from that date on: stored points before it are kept and the rest replaced.
+CREATE OR REPLACE FUNCTION store_stock_data(p_ticker TEXT, p_data JSONB, p_history_from TEXT DEFAULT NULL)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO stock_data (ticker, data, last_updated)
+    VALUES (p_ticker, p_data, NOW())
+    ON CONFLICT (ticker) DO UPDATE SET
+        data = CASE WHEN p_history_from IS NULL THEN EXCLUDED.data ELSE jsonb_set(
+            EXCLUDED.data,
+            '{history,Monthly Adjusted Time Series}',
+            COALESCE((
+                SELECT jsonb_object_agg(key, value)
+                FROM jsonb_each(stock_data.data #> '{history,Monthly Adjusted Time Series}')
+                WHERE key < p_history_from
+            ), '{}'::jsonb) || COALESCE(EXCLUDED.data #> '{history,Monthly Adjusted Time Series}', '{}'::jsonb)
+        ) END,
+        last_updated = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Bump search_updated_at only when a document's name or sector changes, so
+-- price refreshes don't change the stocks-search index version.
+ALTER TABLE stock_data ADD COLUMN IF NOT EXISTS search_updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW();
+
+CREATE OR REPLACE FUNCTION touch_search_fields()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT'
+       OR NEW.data #>> '{overview,Name}' IS DISTINCT FROM OLD.data #>> '{overview,Name}'
+       OR NEW.data #>> '{overview,Sector}' IS DISTINCT FROM OLD.data #>> '{overview,Sector}' THEN
+        NEW.search_updated_at := NOW();
+    ELSE
+        NEW.search_updated_at := OLD.search_updated_at;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS stock_data_search_fields ON stock_data;
+CREATE TRIGGER stock_data_search_fields
+    BEFORE INSERT OR UPDATE ON stock_data
+    FOR EACH ROW EXECUTE FUNCTION touch_search_fields();
+
+-- Weekly bars (dated the Monday) rolled up from the daily bars of each week
+-- from p_since's on, or of every week without it. Run after daily bars are
+-- written, so long chart ranges read a fifth of the rows.
+CREATE OR REPLACE FUNCTION rollup_weekly_bars(p_tickers TEXT[], p_since DATE DEFAULT NULL)
+RETURNS INTEGER AS $$
+DECLARE
+    n INTEGER;
+BEGIN
+    INSERT INTO price_history (ticker, date, interval, o, h, l, c, adj_c, v, div)
+    SELECT ticker, date_trunc('week', date)::DATE, '1wk',
+           (array_agg(o ORDER BY date))[1], max(h), min(l),
+           (array_agg(c ORDER BY date DESC))[1], (array_agg(adj_c ORDER BY date DESC))[1],
+           sum(v), sum(div)
+    FROM price_history
+    WHERE ticker = ANY(p_tickers) AND interval = '1d'
+      AND (p_since IS NULL OR date >= date_trunc('week', p_since)::DATE)
+    GROUP BY ticker, date_trunc('week', date)
+    ON CONFLICT (ticker, interval, date) DO UPDATE SET
+        o = EXCLUDED.o, h = EXCLUDED.h, l = EXCLUDED.l, c = EXCLUDED.c,
+        adj_c = EXCLUDED.adj_c, v = EXCLUDED.v, div = EXCLUDED.div;
+    GET DIAGNOSTICS n = ROW_COUNT;
+    RETURN n;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Take p_count tokens from a provider's bucket, refilled for the time since it
+-- was last touched. Returns 0 when taken, else the seconds until they would be.
+CREATE OR REPLACE FUNCTION take_tokens(p_provider TEXT, p_count DOUBLE PRECISION,
+                                       p_capacity DOUBLE PRECISION, p_refill_per_sec DOUBLE PRECISION)
+RETURNS DOUBLE PRECISION AS $$
+DECLARE
+    b rate_buckets%ROWTYPE;
+    available DOUBLE PRECISION;
+BEGIN
+    INSERT INTO rate_buckets (provider, tokens, capacity, refill_per_sec)
+    VALUES (p_provider, p_capacity, p_capacity, p_refill_per_sec)
+    ON CONFLICT (provider) DO NOTHING;
+
+    SELECT * INTO b FROM rate_buckets WHERE provider = p_provider FOR UPDATE;
+    available := LEAST(p_capacity, b.tokens + EXTRACT(EPOCH FROM NOW() - b.updated_at) * p_refill_per_sec);
+
+    IF available >= p_count THEN
+        UPDATE rate_buckets
+        SET tokens = available - p_count, capacity = p_capacity, refill_per_sec = p_refill_per_sec, updated_at = NOW()
+        WHERE provider = p_provider;
+        RETURN 0;
+    END IF;
+
+    UPDATE rate_buckets
+    SET tokens = available, capacity = p_capacity, refill_per_sec = p_refill_per_sec, updated_at = NOW()
+    WHERE provider = p_provider;
+    RETURN (p_count - available) / p_refill_per_sec;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Queue refresh jobs: p_jobs is [{ticker, provider}, ...]. A ticker that already
+-- has a queued/running job keeps it, at the higher of the two priorities.
+CREATE OR REPLACE FUNCTION enqueue_refresh_jobs(p_jobs JSONB, p_priority INTEGER DEFAULT 0, p_batch_id TEXT DEFAULT NULL)
+RETURNS SETOF refresh_jobs AS $$
+    INSERT INTO refresh_jobs (ticker, provider, priority, batch_id)
+    SELECT x.ticker, x.provider, p_priority, p_batch_id
+    FROM jsonb_to_recordset(p_jobs) AS x(ticker TEXT, provider TEXT)
+    ON CONFLICT (ticker) WHERE status IN ('queued', 'running') DO UPDATE SET
+        priority = GREATEST(refresh_jobs.priority, EXCLUDED.priority),
+        batch_id = COALESCE(EXCLUDED.batch_id, refresh_jobs.batch_id),
+        updated_at = NOW()
+    RETURNING *;
+$$ LANGUAGE sql;
+
+-- Claim due jobs for a worker: highest priority, then most recently viewed
+-- ticker (access_log), then oldest. Running jobs whose worker died (locked
+-- longer than p_stale_seconds) are claimed again. p_providers limits the claim
+-- to those providers (NULL: any), so a worker can skip a deferred provider or
+-- one whose jobs won't fit in its remaining time.
+DROP FUNCTION IF EXISTS claim_refresh_jobs(INTEGER, TEXT, INTEGER);
+CREATE OR REPLACE FUNCTION claim_refresh_jobs(p_limit INTEGER DEFAULT 1, p_ticker TEXT DEFAULT NULL,
+                                              p_stale_seconds INTEGER DEFAULT 300,
+                                              p_providers TEXT[] DEFAULT NULL)
+RETURNS SETOF refresh_jobs AS $$
+    UPDATE refresh_jobs j
+    SET status = 'running', locked_at = NOW(), attempts = j.attempts + 1, updated_at = NOW()
+    WHERE j.id IN (
+        SELECT q.id
+        FROM refresh_jobs q
+        LEFT JOIN access_log a ON a.ticker = q.ticker
+        WHERE (p_ticker IS NULL OR q.ticker = p_ticker)
+          AND (p_providers IS NULL OR q.provider = ANY(p_providers))
+          AND ((q.status = 'queued' AND q.run_after <= NOW())
+               OR (q.status = 'running' AND q.locked_at < NOW() - make_interval(secs => p_stale_seconds)))
+        ORDER BY q.priority DESC, a.last_accessed DESC NULLS LAST, q.created_at
+        LIMIT p_limit
+        FOR UPDATE OF q SKIP LOCKED
+    )
+    RETURNING j.*;
+$$ LANGUAGE sql;
+
+-- Add one request's samples to a window: p_samples is
+-- [{kind, name, count, errors, sum_ms, buckets}, ...]. Bucket counts are
+-- summed element-wise; windows older than a week are dropped.
+CREATE OR REPLACE FUNCTION record_metrics(p_window TIMESTAMP WITH TIME ZONE, p_samples JSONB)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO route_metrics (window_start, kind, name, count, errors, sum_ms, buckets)
+    SELECT p_window, x.kind, x.name, x.count, x.errors, x.sum_ms,
+           ARRAY(SELECT jsonb_array_elements_text(x.buckets)::INTEGER)
+    FROM jsonb_to_recordset(p_samples)
+        AS x(kind TEXT, name TEXT, count INTEGER, errors INTEGER, sum_ms DOUBLE PRECISION, buckets JSONB)
+    ON CONFLICT (window_start, kind, name) DO UPDATE SET
+        count = route_metrics.count + EXCLUDED.count,
+        errors = route_metrics.errors + EXCLUDED.errors,
+        sum_ms = route_metrics.sum_ms + EXCLUDED.sum_ms,
+        buckets = ARRAY(
+            SELECT COALESCE(a, 0) + COALESCE(b, 0)
+            FROM unnest(route_metrics.buckets, EXCLUDED.buckets) AS t(a, b)
+        );
+
+    DELETE FROM route_metrics WHERE window_start < NOW() - INTERVAL '7 days';
+END;
+$$ LANGUAGE plpgsql;
+
 -- Create indexes for performance
 CREATE INDEX IF NOT EXISTS idx_tickers_market ON tickers(market);
 CREATE INDEX IF NOT EXISTS idx_stock_data_ticker ON stock_data(ticker);
+CREATE INDEX IF NOT EXISTS idx_stock_data_search_updated_at ON stock_data(search_updated_at DESC NULLS LAST);
 CREATE INDEX IF NOT EXISTS idx_access_log_last_accessed ON access_log(last_accessed DESC);
+CREATE INDEX IF NOT EXISTS idx_valuation_cache_computed_at ON valuation_cache(computed_at);
+CREATE INDEX IF NOT EXISTS idx_ai_responses_created_at ON ai_responses(created_at);
+CREATE INDEX IF NOT EXISTS idx_screener_sector_value ON screener(sector, score_value DESC);
+CREATE INDEX IF NOT EXISTS idx_screener_sector_total ON screener(sector, score_total DESC);
+CREATE INDEX IF NOT EXISTS idx_screener_score_total ON screener(score_total DESC);
+CREATE INDEX IF NOT EXISTS idx_screener_market_cap ON screener(market_cap DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_refresh_jobs_active_ticker ON refresh_jobs(ticker) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_refresh_jobs_status_run_after ON refresh_jobs(status, run_after);
+CREATE INDEX IF NOT EXISTS idx_refresh_jobs_batch ON refresh_jobs(batch_id);
 
 -- Enable Row Level Security (optional but recommended)
 ALTER TABLE tickers ENABLE ROW LEVEL SECURITY;
 ALTER TABLE stock_data ENABLE ROW LEVEL SECURITY;
 ALTER TABLE projections ENABLE ROW LEVEL SECURITY;
 ALTER TABLE access_log ENABLE ROW LEVEL SECURITY;
+ALTER TABLE refresh_checkpoints ENABLE ROW LEVEL SECURITY;
+ALTER TABLE refresh_state ENABLE ROW LEVEL SECURITY;
+ALTER TABLE price_history ENABLE ROW LEVEL SECURITY;
+ALTER TABLE info_cache ENABLE ROW LEVEL SECURITY;
+ALTER TABLE exchange_rates ENABLE ROW LEVEL SECURITY;
+ALTER TABLE valuation_cache ENABLE ROW LEVEL SECURITY;
+ALTER TABLE screener ENABLE ROW LEVEL SECURITY;
+ALTER TABLE indicators ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ai_context ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ai_responses ENABLE ROW LEVEL SECURITY;
+ALTER TABLE route_metrics ENABLE ROW LEVEL SECURITY;
+ALTER TABLE refresh_jobs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE rate_buckets ENABLE ROW LEVEL SECURITY;
 
 -- Allow public read access (adjust as needed)
 CREATE POLICY "Public read access" ON tickers FOR SELECT USING (true);
 CREATE POLICY "Public read access" ON stock_data FOR SELECT USING (true);
 CREATE POLICY "Public read access" ON projections FOR SELECT USING (true);
+CREATE POLICY "Public read access" ON price_history FOR SELECT USING (true);
+CREATE POLICY "Public read access" ON exchange_rates FOR SELECT USING (true);
+CREATE POLICY "Public read access" ON valuation_cache FOR SELECT USING (true);
+CREATE POLICY "Public read access" ON screener FOR SELECT USING (true);
+CREATE POLICY "Public read access" ON indicators FOR SELECT USING (true);
 
 -- Allow service role full access
 CREATE POLICY "Service role full access" ON tickers FOR ALL USING (auth.role() = 'service_role');
 CREATE POLICY "Service role full access" ON stock_data FOR ALL USING (auth.role() = 'service_role');
 CREATE POLICY "Service role full access" ON projections FOR ALL USING (auth.role() = 'service_role');
 CREATE POLICY "Service role full access" ON access_log FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON refresh_checkpoints FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON refresh_state FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON price_history FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON info_cache FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON exchange_rates FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON valuation_cache FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON screener FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON indicators FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON ai_context FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON ai_responses FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON route_metrics FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON refresh_jobs FOR ALL USING (auth.role() = 'service_role');
+CREATE POLICY "Service role full access" ON rate_buckets FOR ALL USING (auth.role() = 'service_role');